@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+分块压缩基准测试
+
+用合成的文本存档（见save_generator）测量block_codec在不同线程数下的耗时：
+
+- compress:   压缩整个存档；
+- decompress: 解压整个存档；
+- random:     通过块索引读取存档中间的一小段内容（只解压覆盖它的块）。
+
+吞吐量应随线程数增长，直到达到CPU核数或磁盘速度的上限。
+
+用法:
+    python -m benchmarks.compression
+    python -m benchmarks.compression --size 100 --workers 1,2,4,8 --codecs zlib,lzma
+"""
+
+import os
+import sys
+import json
+import shutil
+import platform
+import argparse
+import tempfile
+from datetime import datetime
+
+from benchmarks.run import Recorder, compare_results
+from benchmarks.save_generator import SaveSeries
+from src.block_codec import CODECS, BlockReader, compress_file, decompress_file
+from src.config import LOG_DIR
+
+
+def bench_codec(recorder, root, save_path, codec, workers_list):
+    """测量一种压缩方式在各线程数下的耗时"""
+    size = os.path.getsize(save_path)
+    packed = os.path.join(root, f"save.{codec}.blk")
+    unpacked = os.path.join(root, "save.out")
+
+    for workers in workers_list:
+        recorder.measure(
+            f"compression/{codec}/compress/{workers}",
+            lambda: compress_file(save_path, packed, codec, workers),
+            size=size,
+            workers=workers,
+        )
+        recorder.measure(
+            f"compression/{codec}/decompress/{workers}",
+            lambda: decompress_file(packed, unpacked, workers),
+            size=size,
+            stored_size=os.path.getsize(packed),
+            workers=workers,
+        )
+
+    def read_middle():
+        with BlockReader(packed) as reader:
+            reader.seek(size // 2)
+            reader.read(64 * 1024)
+
+    recorder.measure(f"compression/{codec}/random", read_middle, size=size)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="分块压缩基准测试")
+    parser.add_argument("--size", type=float, default=100, help="合成存档的大小（MB）")
+    parser.add_argument("--workers", default="1,2,4,8", help="要测量的线程数")
+    parser.add_argument("--codecs", default="zlib", help="要测量的压缩方式")
+    parser.add_argument("--repeat", type=int, default=3, help="每个用例的执行次数")
+    parser.add_argument("--output", help="结果文件，默认写入logs目录")
+    parser.add_argument("--compare", help="与该基准结果比较，发现退化时返回非零值")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的相对增长比例")
+    args = parser.parse_args(argv)
+
+    workers_list = [int(item) for item in args.workers.split(",") if item.strip()]
+    codecs = [codec for codec in args.codecs.split(",") if codec in CODECS]
+
+    recorder = Recorder(args.repeat)
+    root = tempfile.mkdtemp(prefix="eu4_bench_")
+    try:
+        save_path = os.path.join(root, "save.eu4")
+        SaveSeries(args.size, "txt").write(save_path)
+        for codec in codecs:
+            bench_codec(recorder, root, save_path, codec, workers_list)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": {"size_mb": args.size, "workers": workers_list, "codecs": codecs},
+        "results": recorder.results,
+    }
+
+    output = args.output or os.path.join(
+        LOG_DIR, f"compression_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存: {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_results(report, baseline, args.tolerance)
+        for name, base, value in regressions:
+            print(f"{name}: {base * 1000:.1f} ms -> {value * 1000:.1f} ms")
+        if not regressions:
+            print("未发现性能退化")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
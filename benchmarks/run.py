@@ -0,0 +1,395 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+备份管理器基准测试
+
+在临时目录中用合成存档（见 save_generator）测量以下路径的耗时：
+
+- scan:    get_save_files 扫描不同数量存档的目录
+- create:  create_backup 备份不同大小和格式的存档（第一次和之后按变化率修改后的再次备份）
+- restore: restore_backup 恢复备份（包括恢复前自动保存当前存档）
+- catalog: 备份目录中已有10到50000个备份时，加载索引、列出、创建、删除和清理的耗时
+
+每个用例都记录 src.metrics 中的分阶段耗时（复制、解析、校验、写索引等），
+结果写入JSON文件，可与之前版本的结果比较以发现性能退化。不会读写用户的配置和备份。
+
+用法:
+    python -m benchmarks.run --quick
+    python -m benchmarks.run --sizes 10,50,200 --formats txt,zip,bin --catalogs 10,1000,50000
+    python -m benchmarks.run --compare logs/benchmark_baseline.json --tolerance 0.2
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import platform
+import argparse
+import tempfile
+import statistics
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from benchmarks.save_generator import SaveSeries
+from src import config
+from src.config import DEFAULT_CONFIG, LOG_DIR, ConfigService
+from src.metrics import metrics
+
+# 合成目录中每个存档名下的备份数
+BACKUPS_PER_SAVE = 50
+
+
+@contextmanager
+def bench_env(**overrides):
+    """
+    创建独立的临时存档目录、备份目录和配置文件
+
+    返回:
+        {"root", "save_dir", "backup_dir"}
+    """
+    root = tempfile.mkdtemp(prefix="eu4_bench_")
+    env = {
+        "root": root,
+        "save_dir": os.path.join(root, "saves"),
+        "backup_dir": os.path.join(root, "backups"),
+    }
+    os.makedirs(env["save_dir"])
+
+    settings = dict(DEFAULT_CONFIG)
+    settings.update(
+        eu4_save_dir=env["save_dir"],
+        backup_dir=env["backup_dir"],
+        max_backups_per_save=1000000,
+        first_run=False,
+    )
+    settings.update(overrides)
+    config_file = os.path.join(root, "config.json")
+    with open(config_file, "w", encoding="utf-8") as f:
+        json.dump(settings, f)
+
+    # 让BackupManager和get_save_files使用临时配置
+    previous = config._config_service
+    config._config_service = ConfigService(config_file)
+    try:
+        yield env
+    finally:
+        config._config_service = previous
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def _new_manager():
+    from src.backup_manager import BackupManager
+
+    return BackupManager()
+
+
+def _wait(manager):
+    """等待回收站清理线程结束，避免影响下一次测量"""
+    if manager._reaper is not None:
+        manager._reaper.result()
+
+
+def _stages():
+    """当前用例中各阶段的累计耗时"""
+    data = metrics.to_dict()["histograms"]
+    stages = {}
+    for name, series in data.items():
+        for item in series:
+            label = ",".join(f"{k}={v}" for k, v in sorted(item["labels"].items()))
+            stages[f"{name}{{{label}}}" if label else name] = {
+                "count": item["count"],
+                "sum": item["sum"],
+                "max": item["max"],
+            }
+    return stages
+
+
+class Recorder:
+    """收集各用例的测量结果"""
+
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = []
+
+    def record(self, name, samples, **extra):
+        result = {
+            "name": name,
+            "seconds": {
+                "min": min(samples),
+                "median": statistics.median(samples),
+                "mean": statistics.fmean(samples),
+                "max": max(samples),
+                "runs": len(samples),
+            },
+            "stages": _stages(),
+        }
+        result.update(extra)
+        self.results.append(result)
+        print(
+            f"{name:<40} median {result['seconds']['median'] * 1000:>10.1f} ms"
+            f"  (min {result['seconds']['min'] * 1000:.1f}, n={len(samples)})",
+            flush=True,
+        )
+
+    def measure(self, name, func, setup=None, **extra):
+        """执行repeat次func并记录耗时，setup在每次执行前调用且不计时"""
+        metrics.reset()
+        samples = []
+        for _ in range(self.repeat):
+            if setup:
+                setup()
+            start = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - start)
+        self.record(name, samples, **extra)
+
+
+def bench_scan(recorder, counts):
+    """扫描存档目录"""
+    for count in counts:
+        with bench_env() as env:
+            for i in range(count):
+                with open(os.path.join(env["save_dir"], f"save_{i}.eu4"), "wb") as f:
+                    f.write(b"EU4txt\ndate=1444.11.11\n")
+            recorder.measure(f"scan/{count}", config.get_save_files, files=count)
+
+
+def bench_create_restore(recorder, sizes, formats, change_rate):
+    """创建和恢复备份"""
+    for fmt in formats:
+        for size in sizes:
+            with bench_env() as env:
+                series = SaveSeries(size, fmt, change_rate)
+                save_path = os.path.join(env["save_dir"], f"bench_{fmt}.eu4")
+                file_size = series.write(save_path)
+                manager = _new_manager()
+                label = f"{fmt}/{size}MB"
+
+                metrics.reset()
+                start = time.perf_counter()
+                first_id = manager.create_backup(save_path)
+                recorder.record(
+                    f"create/{label}/first",
+                    [time.perf_counter() - start],
+                    bytes=file_size,
+                )
+
+                def advance():
+                    series.advance()
+                    series.write(save_path)
+
+                recorder.measure(
+                    f"create/{label}/changed",
+                    lambda: manager.create_backup(save_path),
+                    setup=advance,
+                    bytes=file_size,
+                    change_rate=change_rate,
+                )
+
+                # 每次恢复前修改存档，恢复时需要保存当前存档
+                recorder.measure(
+                    f"restore/{label}",
+                    lambda: manager.restore_backup(first_id),
+                    setup=advance,
+                    bytes=file_size,
+                )
+                _wait(manager)
+
+
+def populate_catalog(backup_dir, count):
+    """
+    直接写入一个包含count个备份的备份目录（每个备份只有很小的存档文件）
+
+    返回:
+        存档名称列表
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    index = {}
+    base_time = datetime(2025, 1, 1)
+    payload = b"EU4txt\ndate=1444.11.11\n"
+
+    for i in range(count):
+        save_name = f"save_{i // BACKUPS_PER_SAVE}"
+        backup_id = f"{save_name}_{i:06d}"
+        backup_time = (base_time + timedelta(minutes=i)).isoformat()
+        backup_path = os.path.join(backup_dir, backup_id)
+        os.makedirs(backup_path)
+        with open(os.path.join(backup_path, f"{save_name}.eu4"), "wb") as f:
+            f.write(payload)
+        meta = {
+            "original_file": os.path.join(backup_dir, "..", "saves", f"{save_name}.eu4"),
+            "backup_time": backup_time,
+            "description": "",
+            "tags": [],
+            "game_date": "1444.11.11",
+            "size": len(payload),
+        }
+        with open(os.path.join(backup_path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+        index.setdefault(save_name, []).append(
+            {
+                "id": backup_id,
+                "time": backup_time,
+                "description": "",
+                "tags": [],
+                "size": len(payload),
+                "game_date": "1444.11.11",
+                "player": "FRA",
+                "campaign": f"save:{save_name}",
+                "sha256": "",
+                "branch": 0,
+            }
+        )
+
+    with open(os.path.join(backup_dir, "backup_index.json"), "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    return list(index)
+
+
+def bench_catalog(recorder, counts):
+    """已有大量备份时的加载、列出、创建、删除和清理"""
+    for count in counts:
+        with bench_env() as env:
+            save_names = populate_catalog(env["backup_dir"], count)
+            save_name = save_names[-1]
+            save_path = os.path.join(env["save_dir"], f"{save_name}.eu4")
+            with open(save_path, "wb") as f:
+                f.write(b"EU4txt\ndate=1500.1.1\n")
+
+            label = f"catalog/{count}"
+            recorder.measure(f"{label}/open", _new_manager, backups=count)
+            manager = _new_manager()
+
+            recorder.measure(
+                f"{label}/list",
+                lambda: manager.get_backups_for_save(save_name),
+                backups=count,
+            )
+            recorder.measure(
+                f"{label}/create", lambda: manager.create_backup(save_path), backups=count
+            )
+
+            def delete_one():
+                oldest = manager.get_backups_for_save(save_name)[-1]["id"]
+                manager.delete_backups([oldest])
+
+            recorder.measure(f"{label}/delete", delete_one, backups=count)
+            _wait(manager)
+
+            # 每次清理前补充备份，使每次都需要删除同样数量的旧备份
+            keep = max(1, len(manager.backup_index.get(save_name, [])) // 2)
+
+            def refill():
+                _wait(manager)
+                while len(manager.backup_index.get(save_name, [])) < keep * 2:
+                    manager.create_backup(save_path)
+
+            recorder.measure(
+                f"{label}/prune",
+                lambda: manager.prune_backups(save_name, keep),
+                setup=refill,
+                backups=count,
+            )
+            _wait(manager)
+
+
+def compare_results(current, baseline, tolerance=0.2, min_seconds=0.005):
+    """
+    比较两份基准测试结果（按中位数）
+
+    返回:
+        退化的用例列表，每项为(名称, 基准耗时, 当前耗时)
+    """
+    base_values = {r["name"]: r["seconds"]["median"] for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        base = base_values.get(result["name"])
+        if base is None or base < min_seconds:
+            continue
+        value = result["seconds"]["median"]
+        if value > base * (1 + tolerance):
+            regressions.append((result["name"], base, value))
+    return regressions
+
+
+def _int_list(text):
+    return [int(float(x)) if float(x).is_integer() else float(x) for x in text.split(",") if x]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="备份管理器基准测试")
+    parser.add_argument("--quick", action="store_true", help="只运行小规模用例")
+    parser.add_argument("--sizes", type=_int_list, help="存档大小（MB），默认10,50,200")
+    parser.add_argument("--formats", default="txt,zip,bin", help="存档格式")
+    parser.add_argument("--catalogs", type=_int_list, help="备份数量，默认10,1000,10000,50000")
+    parser.add_argument("--scan", type=_int_list, help="存档目录中的文件数，默认10,100,1000")
+    parser.add_argument("--change-rate", type=float, default=0.05, help="两次备份之间变化的条目比例")
+    parser.add_argument("--repeat", type=int, default=3, help="每个用例的执行次数")
+    parser.add_argument("--only", help="只运行指定类别，例如 create,catalog")
+    parser.add_argument("--output", help="结果文件，默认写入logs目录")
+    parser.add_argument("--compare", help="与该基准结果比较，发现退化时返回非零值")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的相对增长比例")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.quick:
+        sizes = args.sizes or [10]
+        catalogs = args.catalogs or [10, 1000]
+        scans = args.scan or [10, 100]
+    else:
+        sizes = args.sizes or [10, 50, 200]
+        catalogs = args.catalogs or [10, 1000, 10000, 50000]
+        scans = args.scan or [10, 100, 1000]
+    formats = [fmt for fmt in args.formats.split(",") if fmt]
+    only = set(args.only.split(",")) if args.only else None
+
+    recorder = Recorder(args.repeat)
+    if not only or "scan" in only:
+        bench_scan(recorder, scans)
+    if not only or "create" in only:
+        bench_create_restore(recorder, sizes, formats, args.change_rate)
+    if not only or "catalog" in only:
+        bench_catalog(recorder, catalogs)
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "params": {
+            "sizes": sizes,
+            "formats": formats,
+            "catalogs": catalogs,
+            "scan": scans,
+            "change_rate": args.change_rate,
+            "repeat": args.repeat,
+        },
+        "results": recorder.results,
+    }
+
+    output = args.output or os.path.join(
+        LOG_DIR, f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存: {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_results(report, baseline, args.tolerance)
+        for name, base, value in regressions:
+            print(f"{name}: {base * 1000:.1f} ms -> {value * 1000:.1f} ms")
+        if not regressions:
+            print("未发现性能退化")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+合成存档生成器
+
+生成结构与EU4存档相似的测试存档，用于基准测试：
+
+- txt: 未压缩的EU4txt存档（date、player、countries、provinces、active_war等顶层条目）；
+- zip: 压缩存档，zip中包含meta和gamestate，gamestate为EU4txt；
+- bin: 压缩的类二进制存档，gamestate以EU4bin开头，内容为紧凑的令牌流，
+  压缩率与铁人模式存档接近（本程序无法解析，只用于测试复制和校验的开销）。
+
+同一个 SaveSeries 连续生成的存档之间只有 change_rate 比例的条目发生变化，
+可以模拟两次自动备份之间的游戏进度。
+
+用法:
+    python -m benchmarks.save_generator out.eu4 --size 50 --format zip
+"""
+
+import os
+import random
+import struct
+import zipfile
+import argparse
+
+TEXT_MAGIC = b"EU4txt"
+BINARY_MAGIC = b"EU4bin"
+
+_TAGS = [
+    a + b + c
+    for a in "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    for b in "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    for c in "ABCDEFGHIJ"
+]
+_CULTURES = ["french", "castillian", "english", "bavarian", "polish", "turkish", "han"]
+_RELIGIONS = ["catholic", "protestant", "orthodox", "sunni", "shiite", "confucianism"]
+
+
+def _country_text(tag, version, rng):
+    return (
+        f"\t{tag}={{\n"
+        f"\t\ttreasury={rng.uniform(0, 5000):.3f}\n"
+        f"\t\tstability={rng.randint(-3, 3)}\n"
+        f"\t\tprestige={rng.uniform(-100, 100):.3f}\n"
+        f"\t\tmanpower={rng.uniform(0, 200):.3f}\n"
+        f"\t\tmax_manpower={rng.uniform(10, 300):.3f}\n"
+        f"\t\tinflation={rng.uniform(0, 20):.3f}\n"
+        f"\t\tgovernment_rank={rng.randint(1, 3)}\n"
+        f"\t\tnum_of_cities={rng.randint(1, 300)}\n"
+        f"\t\tvariables={{\n"
+        f"\t\t\trevision={version}\n"
+        f"\t\t}}\n"
+        f"\t}}\n"
+    )
+
+
+def _province_text(province_id, version, rng):
+    owner = _TAGS[rng.randrange(len(_TAGS))]
+    history = "".join(
+        f"\t\t\t{1444 + year}.{rng.randint(1, 12)}.{rng.randint(1, 28)}={{\n"
+        f"\t\t\t\towner={_TAGS[rng.randrange(len(_TAGS))]}\n"
+        f"\t\t\t}}\n"
+        for year in range(rng.randint(2, 6))
+    )
+    return (
+        f"\t-{province_id}={{\n"
+        f'\t\tname="Province {province_id}"\n'
+        f"\t\towner={owner}\n"
+        f"\t\tcontroller={owner}\n"
+        f"\t\treligion={rng.choice(_RELIGIONS)}\n"
+        f"\t\tculture={rng.choice(_CULTURES)}\n"
+        f"\t\tbase_tax={rng.randint(1, 20)}.000\n"
+        f"\t\tbase_production={rng.randint(1, 20)}.000\n"
+        f"\t\tbase_manpower={rng.randint(1, 20)}.000\n"
+        f"\t\trevision={version}\n"
+        f"\t\thistory={{\n{history}\t\t}}\n"
+        f"\t}}\n"
+    )
+
+
+# 一个二进制条目：块开始、24个 令牌=整数 字段、版本号、块结束
+_BINARY_FIELDS = 24
+_BINARY_RECORD = struct.Struct("<HHH" + "HHHi" * _BINARY_FIELDS + "HHiH")
+
+
+def _binary_record(key, version, rng):
+    """类似EU4bin的令牌流：2字节令牌、等号、类型和值"""
+    values = [0x2000 + key % 0x1000, 0x0001, 0x0003]
+    for _ in range(_BINARY_FIELDS):
+        values += (0x2800 + rng.getrandbits(8), 0x0001, 0x000C, rng.getrandbits(17) - 1000)
+    values += (0x2FFF, 0x000C, version, 0x0004)
+    return _BINARY_RECORD.pack(*values)
+
+
+class SaveSeries:
+    """
+    一组连续的合成存档
+
+    参数:
+        size_mb: 每个存档的目标大小（MB，未压缩时的大小）
+        fmt: "txt"、"zip" 或 "bin"
+        change_rate: 每次advance时发生变化的条目比例
+        seed: 随机种子，相同参数和种子生成完全相同的存档
+    """
+
+    def __init__(self, size_mb, fmt="txt", change_rate=0.05, seed=0):
+        if fmt not in ("txt", "zip", "bin"):
+            raise ValueError(f"不支持的存档格式: {fmt}")
+        self.fmt = fmt
+        self.change_rate = change_rate
+        self.seed = seed
+        self.snapshot = 0
+        self.year = 1444
+
+        target = int(size_mb * 1024 * 1024)
+        self.countries = max(1, min(len(_TAGS), target // 20000))
+        # 用一个样本条目估算需要多少省份才能达到目标大小
+        sample = (
+            _binary_record(1, 0, random.Random(0))
+            if fmt == "bin"
+            else _province_text(1, 0, random.Random(0)).encode()
+        )
+        self.provinces = max(1, target // len(sample))
+        # 每个条目最近一次变化时的快照编号，条目内容只取决于(种子, 条目, 版本)
+        self.versions = [0] * (self.countries + self.provinces)
+
+    def advance(self):
+        """前进到下一个快照：随机选择 change_rate 比例的条目修改"""
+        self.snapshot += 1
+        self.year += 1
+        rng = random.Random(f"{self.seed}:advance:{self.snapshot}")
+        count = int(len(self.versions) * self.change_rate)
+        for index in rng.sample(range(len(self.versions)), count):
+            self.versions[index] = self.snapshot
+
+    def _rng(self, index):
+        return random.Random(f"{self.seed}:{index}:{self.versions[index]}")
+
+    def _header(self):
+        return (
+            f"date={self.year}.11.11\n"
+            f"player=\"FRA\"\n"
+            f"campaign_id=\"bench-{self.seed}\"\n"
+            f"start_date=1444.11.11\n"
+        )
+
+    def _text_chunks(self):
+        yield (TEXT_MAGIC.decode() + "\n" + self._header()).encode()
+        yield b"countries={\n"
+        for i in range(self.countries):
+            yield _country_text(_TAGS[i], self.versions[i], self._rng(i)).encode()
+        yield b"}\nprovinces={\n"
+        parts = []
+        for i in range(self.provinces):
+            index = self.countries + i
+            parts.append(_province_text(i + 1, self.versions[index], self._rng(index)))
+            if len(parts) >= 1000:
+                yield "".join(parts).encode()
+                parts = []
+        yield "".join(parts).encode()
+        yield b"}\n"
+        for war in range(1 + self.snapshot % 3):
+            yield f'active_war={{\n\tname="War {self.snapshot - war}"\n}}\n'.encode()
+
+    def _binary_chunks(self):
+        yield BINARY_MAGIC + self._header().encode()
+        parts = []
+        for index in range(len(self.versions)):
+            parts.append(_binary_record(index, self.versions[index], self._rng(index)))
+            if len(parts) >= 1000:
+                yield b"".join(parts)
+                parts = []
+        yield b"".join(parts)
+
+    def write(self, path):
+        """
+        把当前快照写入文件
+
+        返回:
+            写入的文件大小（字节）
+        """
+        if self.fmt == "txt":
+            with open(path, "wb") as f:
+                for chunk in self._text_chunks():
+                    f.write(chunk)
+        else:
+            chunks = self._text_chunks() if self.fmt == "zip" else self._binary_chunks()
+            magic = TEXT_MAGIC if self.fmt == "zip" else BINARY_MAGIC
+            with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+                archive.writestr("meta", magic + b"\n" + self._header().encode())
+                with archive.open("gamestate", "w", force_zip64=True) as member:
+                    for chunk in chunks:
+                        member.write(chunk)
+                archive.writestr("ai", magic + b"\nai={\n}\n")
+
+        return os.path.getsize(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成合成EU4存档")
+    parser.add_argument("output", help="输出文件路径")
+    parser.add_argument("--size", type=float, default=10, help="目标大小（MB，未压缩）")
+    parser.add_argument("--format", choices=("txt", "zip", "bin"), default="txt")
+    parser.add_argument("--snapshots", type=int, default=1, help="生成第几个快照")
+    parser.add_argument("--change-rate", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    series = SaveSeries(args.size, args.format, args.change_rate, args.seed)
+    for _ in range(args.snapshots - 1):
+        series.advance()
+    size = series.write(args.output)
+    print(f"{args.output}: {size} 字节")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+主题基准测试
+
+用一个包含存档列表和备份表格（默认5000行）的窗口，比较三种样式方案的耗时：
+
+- none:   不设置样式表和调色板（Fusion默认外观）；
+- global: 所有颜色都写在样式表中，包括匹配所有控件的 QWidget 规则和表格的
+          ::item 规则（改为调色板之前的做法）；
+- theme:  styles.apply_theme，颜色放在调色板中，样式表按控件限定范围。
+
+每种方案测量：
+- switch:  在暗色和亮色主题之间切换（重新polish所有控件并重绘窗口）；
+- repaint: 重绘备份表格的可见区域；
+- scroll:  把备份表格从头滚动到尾，每一步都重绘。
+
+需要PySide6，默认使用offscreen平台，不会显示窗口。
+
+用法:
+    python -m benchmarks.theme
+    python -m benchmarks.theme --rows 5000 --repeat 20 --compare logs/theme_baseline.json
+"""
+
+import os
+import sys
+import json
+import platform
+import argparse
+from datetime import datetime
+
+from benchmarks.run import Recorder, compare_results
+from src.config import LOG_DIR
+from src.styles import THEMES, FONT_FAMILIES, apply_theme, build_stylesheet
+
+MODES = ("none", "global", "theme")
+
+
+def global_stylesheet(theme):
+    """把调色板中的颜色也写成样式表规则，模拟改为调色板之前的样式表"""
+    colors = THEMES[theme]
+    families = ", ".join(f'"{family}"' for family in FONT_FAMILIES)
+    return (
+        f"QWidget {{ background-color: {colors['window']}; color: {colors['text']};"
+        f" font-family: {families}; }}\n"
+        f"QListWidget, QTableWidget {{ background-color: {colors['panel']};"
+        f" alternate-background-color: {colors['alternate']}; }}\n"
+        f"QTableWidget::item {{ padding: 5px; }}\n"
+        f"QTableWidget::item:selected {{ background-color: {colors['accent']};"
+        f" color: {colors['accent_text']}; }}\n"
+        f"QListWidget::item:selected {{ background-color: {colors['accent']};"
+        f" color: {colors['accent_text']}; }}\n"
+        f"QToolTip {{ background-color: {colors['popup']}; color: {colors['text']}; }}\n"
+        + build_stylesheet(theme)
+    )
+
+
+def build_window(rows):
+    """创建与主窗口结构相似的测试窗口"""
+    from PySide6.QtWidgets import (
+        QMainWindow,
+        QWidget,
+        QHBoxLayout,
+        QListWidget,
+        QTableWidget,
+        QTableWidgetItem,
+        QPushButton,
+        QVBoxLayout,
+    )
+
+    window = QMainWindow()
+    central = QWidget()
+    window.setCentralWidget(central)
+    layout = QHBoxLayout(central)
+
+    save_list = QListWidget()
+    save_list.setObjectName("saveList")
+    save_list.addItems([f"save_{i}.eu4" for i in range(200)])
+    layout.addWidget(save_list)
+
+    right = QVBoxLayout()
+    layout.addLayout(right)
+    table = QTableWidget(rows, 4)
+    table.setObjectName("backupTable")
+    table.setHorizontalHeaderLabels(["备份时间", "游戏进度", "描述", "大小"])
+    for row in range(rows):
+        time_text = f"2025-01-01 {row // 3600 % 24:02d}:{row // 60 % 60:02d}:{row % 60:02d}"
+        table.setItem(row, 0, QTableWidgetItem(time_text))
+        table.setItem(row, 1, QTableWidgetItem(f"{1444 + row // 12}.{row % 12 + 1}.1"))
+        table.setItem(row, 2, QTableWidgetItem(f"自动备份 {row}"))
+        table.setItem(row, 3, QTableWidgetItem(f"{10 + row % 40}.00 MB"))
+    table.selectRow(0)
+    right.addWidget(table)
+    for text in ("创建备份", "恢复备份", "删除备份"):
+        right.addWidget(QPushButton(text))
+
+    window.resize(1200, 800)
+    window.show()
+    return window, table
+
+
+def bench_mode(recorder, app, mode, rows, repeat):
+    """测量一种样式方案"""
+    from PySide6.QtGui import QPalette
+
+    default_palette = QPalette(app.palette())
+    window, table = build_window(rows)
+
+    def set_theme(theme):
+        if mode == "theme":
+            apply_theme(app, window, theme)
+        elif mode == "global":
+            window.setStyleSheet(global_stylesheet(theme))
+
+    state = {"theme": "dark"}
+    set_theme("dark")
+    app.processEvents()
+
+    def switch():
+        state["theme"] = "light" if state["theme"] == "dark" else "dark"
+        set_theme(state["theme"])
+        window.repaint()
+        app.processEvents()
+
+    def repaint():
+        table.viewport().repaint()
+
+    scrollbar = table.verticalScrollBar()
+
+    def scroll():
+        step = max(1, scrollbar.pageStep())
+        for value in range(scrollbar.minimum(), scrollbar.maximum() + 1, step):
+            scrollbar.setValue(value)
+            table.viewport().repaint()
+        scrollbar.setValue(0)
+
+    recorder.measure(f"theme/{mode}/switch", switch, rows=rows)
+    recorder.repeat = repeat * 5
+    recorder.measure(f"theme/{mode}/repaint", repaint, rows=rows)
+    recorder.repeat = repeat
+    recorder.measure(f"theme/{mode}/scroll", scroll, rows=rows)
+
+    window.close()
+    window.deleteLater()
+    app.processEvents()
+    app.setPalette(default_palette)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="主题样式基准测试")
+    parser.add_argument("--rows", type=int, default=5000, help="备份表格的行数")
+    parser.add_argument("--repeat", type=int, default=10, help="每个用例的执行次数")
+    parser.add_argument("--modes", default=",".join(MODES), help="要测量的样式方案")
+    parser.add_argument("--output", help="结果文件，默认写入logs目录")
+    parser.add_argument("--compare", help="与该基准结果比较，发现退化时返回非零值")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的相对增长比例")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtWidgets import QApplication
+
+    app = QApplication.instance() or QApplication([])
+    app.setStyle("Fusion")
+
+    recorder = Recorder(args.repeat)
+    modes = [mode for mode in args.modes.split(",") if mode in MODES]
+    for mode in modes:
+        bench_mode(recorder, app, mode, args.rows, args.repeat)
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "params": {"rows": args.rows, "repeat": args.repeat, "modes": modes},
+        "results": recorder.results,
+    }
+
+    output = args.output or os.path.join(
+        LOG_DIR, f"theme_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存: {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_results(report, baseline, args.tolerance, min_seconds=0.001)
+        for name, base, value in regressions:
+            print(f"{name}: {base * 1000:.1f} ms -> {value * 1000:.1f} ms")
+        if not regressions:
+            print("未发现性能退化")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,28 +9,94 @@ date: 2025-05-28
 
 import sys
 import os
-from PySide6.QtWidgets import QApplication
-from src.main_window import MainWindow
-from src.config import setup_logging, create_config_if_not_exists
+import logging
+from src.startup import startup_timer
+from src.config import LOG_DIR, setup_logging, create_config_if_not_exists
+
+
+def report_startup(print_report):
+    """记录启动耗时，需要时输出完整报告"""
+    marks = startup_timer.to_dict()["marks"]
+    logging.info(f"启动完成，耗时 {marks.get('startup finished', 0) * 1000:.0f} ms")
+
+    if print_report:
+        print(startup_timer.format_report(), file=sys.stderr)
+        startup_timer.write_report(os.path.join(LOG_DIR, "startup_report.json"))
+
+
+def run_gui(argv):
+    """启动图形界面"""
+    print_report = "--startup-report" in argv
+    argv = [arg for arg in argv if arg != "--startup-report"]
+
+    # --metrics-out <文件>: 退出时把运行指标写入JSON文件
+    metrics_out = None
+    if "--metrics-out" in argv[:-1]:
+        i = argv.index("--metrics-out")
+        metrics_out = argv[i + 1]
+        del argv[i : i + 2]
+
+    # --profile cpu|memory|all: 对各项操作做性能分析（也可以在配置文件中开启）
+    profile_mode = None
+    if "--profile" in argv[:-1]:
+        i = argv.index("--profile")
+        profile_mode = argv[i + 1]
+        del argv[i : i + 2]
+
+    # 只有启动图形界面时才导入Qt，命令行模式不依赖PySide6
+    with startup_timer.phase("import PySide6.QtWidgets"):
+        from PySide6.QtWidgets import QApplication
+    with startup_timer.phase("import src.main_window"):
+        from PySide6.QtCore import QTimer
+        from src.main_window import MainWindow
 
-if __name__ == "__main__":
     # 设置日志
-    setup_logging()
+    with startup_timer.phase("setup logging"):
+        setup_logging()
 
     # 创建配置文件（如果不存在）
     create_config_if_not_exists()
 
+    from src.profiling import profiler
+
+    if profile_mode:
+        profiler.configure(profile_mode)
+    else:
+        profiler.watch_config()
+
     # 创建Qt应用
-    app = QApplication(sys.argv)
-    app.setStyle("Fusion")  # 使用Fusion风格，更现代化的界面
+    with startup_timer.phase("create QApplication"):
+        app = QApplication(argv)
+        app.setStyle("Fusion")  # 使用Fusion风格，更现代化的界面
 
     # 设置应用信息
     app.setApplicationName("EU4存档管理器")
     app.setApplicationVersion("1.0.0")
 
-    # 创建主窗口并显示
-    window = MainWindow()
-    window.show()
+    # 创建主窗口并显示，备份索引和存档列表随后在后台加载
+    with startup_timer.phase("create MainWindow"):
+        window = MainWindow()
+    with startup_timer.phase("show MainWindow"):
+        window.show()
+    QTimer.singleShot(0, lambda: startup_timer.mark("first paint"))
+    window.startup_finished.connect(lambda: report_startup(print_report))
 
     # 运行应用程序事件循环
-    sys.exit(app.exec())
+    exit_code = app.exec()
+
+    if metrics_out:
+        from src.metrics import metrics
+
+        metrics.write_json(metrics_out)
+    return exit_code
+
+
+if __name__ == "__main__":
+    # 带有子命令时以命令行模式运行
+    if len(sys.argv) > 1:
+        from src.cli import COMMANDS, main
+
+        if sys.argv[1] in COMMANDS or sys.argv[1] in ("-h", "--help"):
+            sys.exit(main(sys.argv[1:]))
+
+    sys.exit(run_gui(sys.argv))
@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+备份导出/导入模块
+
+将选中的备份打包为单个tar归档，便于在不同电脑之间迁移战役。
+归档以流的方式读写，任何时候都不会把整个存档读入内存。
+
+归档结构:
+    manifest.json               归档清单：备份的索引条目、所属存档和各文件的大小与校验值
+    backups/<备份ID>/meta.json  备份元数据
+    backups/<备份ID>/<存档文件>  存档文件
+"""
+
+import os
+import io
+import json
+import shutil
+import hashlib
+import logging
+import tarfile
+from datetime import datetime
+
+from src.mapped_io import MappedFile, read_pass
+from src.store_lock import StoreLockTimeout
+
+ARCHIVE_FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def _hash_file(file_path):
+    digest = hashlib.sha256()
+    with MappedFile(file_path) as source:
+        read_pass(source, [digest])
+    return digest.hexdigest()
+
+
+def _is_safe_name(name):
+    """检查归档中的名称是否是单层文件名，防止写到备份目录之外"""
+    return bool(name) and os.path.basename(name) == name and name not in (".", "..")
+
+
+def _describe_backup_files(backup_path, meta):
+    """列出备份目录中的文件及其大小和校验值，未压缩的存档文件和存档条目优先使用元数据中记录的校验值"""
+    save_file_name = os.path.basename(meta["original_file"])
+    known = {
+        entry["file"]: entry["sha256"]
+        for entry in meta.get("zip_layout", {}).get("entries", [])
+        if not entry.get("compression")  # 分块压缩的条目文件与记录的校验值不对应
+    }
+    if meta.get("sha256"):
+        known[save_file_name] = meta["sha256"]
+    files = {}
+    for name in sorted(os.listdir(backup_path)):
+        file_path = os.path.join(backup_path, name)
+        if not os.path.isfile(file_path):
+            continue
+        sha256 = known.get(name) or _hash_file(file_path)
+        files[name] = {"size": os.path.getsize(file_path), "sha256": sha256}
+    return files
+
+
+def export_backups(
+    backup_manager, archive_path, backup_ids=None, save_names=None, compress=True
+):
+    """
+    导出备份到归档文件
+
+    参数:
+        backup_manager: 备份管理器
+        archive_path: 归档文件路径
+        backup_ids: 要导出的备份ID列表
+        save_names: 要导出全部备份的存档名称列表
+        compress: 是否使用gzip压缩归档
+
+    返回:
+        导出的备份ID列表，失败时返回None
+    """
+    wanted_ids = set(backup_ids or [])
+    wanted_saves = set(save_names or [])
+
+    selected = []
+    with backup_manager._reading():
+        for save_name, backups in backup_manager.backup_index.items():
+            for backup in backups:
+                if save_name in wanted_saves or backup["id"] in wanted_ids:
+                    selected.append((save_name, dict(backup)))
+
+    try:
+        # 先生成清单，导入时读到清单即可决定跳过哪些备份
+        manifest = {
+            "format": ARCHIVE_FORMAT_VERSION,
+            "created": datetime.now().isoformat(),
+            "backups": [],
+        }
+        for save_name, backup in selected:
+            backup_path = os.path.join(backup_manager.backup_dir, backup["id"])
+            meta_path = os.path.join(backup_path, "meta.json")
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            manifest["backups"].append(
+                {
+                    "save_name": save_name,
+                    "entry": backup,
+                    "files": _describe_backup_files(backup_path, meta),
+                }
+            )
+
+        tmp_path = f"{archive_path}.tmp"
+        with tarfile.open(tmp_path, "w|gz" if compress else "w|") as tar:
+            data = json.dumps(manifest, ensure_ascii=False, indent=4).encode("utf-8")
+            info = tarfile.TarInfo(MANIFEST_NAME)
+            info.size = len(data)
+            info.mtime = int(datetime.now().timestamp())
+            tar.addfile(info, io.BytesIO(data))
+
+            for item in manifest["backups"]:
+                backup_id = item["entry"]["id"]
+                backup_path = os.path.join(backup_manager.backup_dir, backup_id)
+                for name in item["files"]:
+                    # tarfile分块读取文件内容，不会整体读入内存
+                    tar.add(
+                        os.path.join(backup_path, name),
+                        arcname=f"backups/{backup_id}/{name}",
+                        recursive=False,
+                    )
+
+        os.replace(tmp_path, archive_path)
+        exported = [item["entry"]["id"] for item in manifest["backups"]]
+        logging.info(f"导出备份成功: {len(exported)} 个备份 -> {archive_path}")
+        return exported
+
+    except Exception as e:
+        logging.error(f"导出备份失败: {e}")
+        if os.path.exists(f"{archive_path}.tmp"):
+            os.remove(f"{archive_path}.tmp")
+        return None
+
+
+def _copy_member(tar, member, dest_path, expected):
+    """将归档成员流式写入文件，同时校验大小和校验值"""
+    digest = hashlib.sha256()
+    size = 0
+    source = tar.extractfile(member)
+    with open(dest_path, "wb") as f:
+        for chunk in iter(lambda: source.read(COPY_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            size += len(chunk)
+            f.write(chunk)
+
+    if size != expected["size"] or digest.hexdigest() != expected["sha256"]:
+        raise ValueError(f"文件校验失败: {member.name}")
+
+
+def import_backups(backup_manager, archive_path):
+    """
+    从归档文件导入备份
+
+    已经存在的备份会被跳过，因此重复导入同一批备份的开销很小。
+    解包在锁外进行，全部完成后在备份目录的写锁下只保存一次备份索引。
+
+    参数:
+        backup_manager: 备份管理器
+        archive_path: 归档文件路径
+
+    返回:
+        {"imported": [备份ID], "skipped": [备份ID], "failed": {备份ID: 错误信息}}，
+        无法读取归档时返回None
+    """
+    imported, skipped, failed = [], [], {}
+    pending = {}
+    with backup_manager._reading():
+        existing = {
+            backup["id"]
+            for backups in backup_manager.backup_index.values()
+            for backup in backups
+        }
+    save_dir = backup_manager.config["eu4_save_dir"]
+
+    def staging_path(backup_id):
+        return os.path.join(backup_manager.backup_dir, f"{backup_id}.importing")
+
+    try:
+        with tarfile.open(archive_path, "r|*") as tar:
+            first = tar.next()
+            if first is None or first.name != MANIFEST_NAME:
+                raise ValueError("归档中缺少清单文件")
+            manifest = json.load(tar.extractfile(first))
+            if manifest.get("format") != ARCHIVE_FORMAT_VERSION:
+                raise ValueError(f"不支持的归档格式: {manifest.get('format')}")
+
+            for item in manifest["backups"]:
+                backup_id = item["entry"]["id"]
+                if backup_id in existing:
+                    skipped.append(backup_id)
+                elif not _is_safe_name(backup_id) or not all(
+                    _is_safe_name(name) for name in item["files"]
+                ):
+                    failed[backup_id] = "备份ID或文件名不合法"
+                else:
+                    pending[backup_id] = item
+
+            received = {backup_id: set() for backup_id in pending}
+            for member in tar:
+                parts = member.name.split("/")
+                if len(parts) != 3 or parts[0] != "backups" or not member.isfile():
+                    continue
+                backup_id, name = parts[1], parts[2]
+                item = pending.get(backup_id)
+                # 跳过已存在的备份以及清单中没有记录的文件
+                if item is None or backup_id in failed or name not in item["files"]:
+                    continue
+
+                staging_dir = staging_path(backup_id)
+                os.makedirs(staging_dir, exist_ok=True)
+                try:
+                    _copy_member(
+                        tar, member, os.path.join(staging_dir, name), item["files"][name]
+                    )
+                    received[backup_id].add(name)
+                except Exception as e:
+                    logging.error(f"导入备份失败: {backup_id}: {e}")
+                    failed[backup_id] = str(e)
+                    shutil.rmtree(staging_dir, ignore_errors=True)
+
+            for backup_id, item in pending.items():
+                if backup_id in failed:
+                    continue
+                staging_dir = staging_path(backup_id)
+                if received[backup_id] != set(item["files"]):
+                    failed[backup_id] = "归档中的备份文件不完整"
+                    shutil.rmtree(staging_dir, ignore_errors=True)
+                    continue
+
+                # 备份目录中已有同名但不在索引中的目录（例如中断的操作留下的），
+                # 不覆盖它，只跳过这一个备份
+                final_dir = os.path.join(backup_manager.backup_dir, backup_id)
+                if os.path.exists(final_dir):
+                    logging.warning(f"备份目录已存在但不在备份索引中，跳过导入: {backup_id}")
+                    failed[backup_id] = "备份目录已存在但不在备份索引中"
+                    continue
+
+                try:
+                    # 原始存档路径指向导出时的电脑，改为本机的存档目录
+                    meta_path = os.path.join(staging_dir, "meta.json")
+                    with open(meta_path, "r", encoding="utf-8") as f:
+                        meta = json.load(f)
+                    meta["original_file"] = os.path.join(
+                        save_dir, os.path.basename(meta["original_file"])
+                    )
+                    with open(meta_path, "w", encoding="utf-8") as f:
+                        json.dump(meta, f, ensure_ascii=False, indent=4)
+
+                    os.replace(staging_dir, final_dir)
+                except (OSError, ValueError, KeyError) as e:
+                    logging.error(f"导入备份失败: {backup_id}: {e}")
+                    failed[backup_id] = str(e)
+                    continue
+                imported.append(backup_id)
+
+    except Exception as e:
+        logging.error(f"读取备份归档失败: {e}")
+        if not pending and not imported:
+            return None
+
+        # 归档在中途损坏，已导入的备份仍然保留
+        for backup_id in pending:
+            if backup_id not in imported:
+                failed.setdefault(backup_id, str(e))
+    finally:
+        # 没有导入的备份留下的临时目录
+        for backup_id in pending:
+            if backup_id not in imported:
+                shutil.rmtree(staging_path(backup_id), ignore_errors=True)
+
+    if imported:
+        try:
+            with backup_manager._transaction():
+                for backup_id in imported:
+                    item = pending[backup_id]
+                    backup_manager._add_entry(item["save_name"], item["entry"])
+                backup_manager._save_backup_index()
+        except StoreLockTimeout as e:
+            logging.error(f"导入备份失败: {e}")
+            backup_manager._discard_backups(imported)
+            failed.update((backup_id, str(e)) for backup_id in imported)
+            imported = []
+    logging.info(
+        f"导入备份完成: 导入 {len(imported)} 个，"
+        f"跳过 {len(skipped)} 个，失败 {len(failed)} 个"
+    )
+    return {"imported": imported, "skipped": skipped, "failed": failed}
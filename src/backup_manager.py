@@ -3,16 +3,93 @@
 
 """
 备份管理模块
+
+图形界面、命令行和后台守护进程可以同时使用同一个备份目录。备份索引、回收站和
+时间线分支记录的修改都在备份目录的写锁下进行（见store_lock）：先加载其他进程的
+修改，再修改并原子地写回文件。复制存档等耗时操作在锁外完成，只有提交索引时持锁。
+读取备份信息前会检查记录文件是否被其他进程修改过，有变化时在读锁下重新加载。
+
+同一进程中的多个线程也可以同时使用备份管理器：复制、恢复存档按存档名加锁，
+不同存档的备份可以同时进行，同一存档的操作依次进行；读取和修改内存中的备份
+记录时只短暂持有一个全局的目录锁。submit_backup在有限大小的线程池中创建备份，
+同一存档的备份按提交顺序执行。
+
+开启backup_compression后，备份中的存档（或规范化存储的zip条目）按块并行压缩
+保存（见block_codec），恢复、校验和比较时并行解压。
+复制后的存档只映射一次（见mapped_io），解析开头信息、计算校验值和分块压缩共用
+同一个映射，在一次遍历中完成。
 """
 
 import os
 import shutil
 import json
+import heapq
+import hashlib
 import logging
+import threading
+from contextlib import ExitStack, contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
 
-from src.config import get_config, save_config
+from src.config import get_config, get_config_service
+from src.metrics import metrics
+from src.profiling import profiler
+from src.campaign import CAMPAIGN_FIELDS, CampaignIndex, campaign_key
+from src.save_parser import read_header
+from src.block_codec import (
+    BLOCK_SIZE,
+    BLOCK_SUFFIX,
+    BlockEncoder,
+    decompress_file,
+    iter_chunks,
+)
+from src.io_scheduler import checkpoint, io_scheduler
+from src.mapped_io import MappedFile, hash_file, read_pass
+from src.save_store import (
+    compress_entries,
+    gamestate_path,
+    is_zip_save,
+    normalize_zip,
+    restore_zip,
+    stored_size,
+    verify_entries,
+)
+from src.timeline import CampaignTimeline
+from src.store_lock import StoreLock, StoreLockTimeout
+
+# 批量操作时并行处理文件的最大线程数
+BATCH_WORKERS = 4
+# submit_backup并发创建备份的最大线程数
+BACKUP_WORKERS = 4
+# 恢复前自动保存当前存档时使用的标签
+SAFETY_TAG = "auto-safety"
+# 撤销栈最多保存的操作数
+UNDO_LIMIT = 50
+# 按容量清理时各标签的保留优先级，越小越先被清理，没有这些标签的备份为1
+RETENTION_PRIORITY = {SAFETY_TAG: 0.25, "auto": 0.5}
+
+
+def _is_none(result):
+    return result is None
+
+
+def _is_false(result):
+    return result is False
+
+
+def _has_failures(result):
+    """批量操作的返回值为None或其中有失败的项目"""
+    return result is None or bool(result.get("failed"))
+
+
+def _file_signature(path):
+    """文件的状态，用于判断文件是否被其他进程替换过，文件不存在时返回None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
 
 
 class BackupManager:
@@ -20,14 +97,125 @@ class BackupManager:
 
     def __init__(self):
         self.config = get_config()
-        self.backup_dir = self.config["backup_dir"]
+
+        # 目录锁：读取或修改内存中的备份记录时短暂持有（可重入）
+        self._catalog_lock = threading.RLock()
+        # 存档锁：同一存档的复制和恢复依次进行
+        self._save_locks = {}
+        self._save_locks_guard = threading.Lock()
+        # 并发创建备份的线程池（首次使用时创建）和各存档最后提交的备份任务
+        self._backup_pool = None
+        self._backup_queue = {}
+
+        self._open_backup_dir(self.config["backup_dir"])
+
+        # 设置修改后立即生效，无需重启
+        get_config_service().subscribe(self._on_config_changed)
+
+    def _open_backup_dir(self, backup_dir):
+        """切换到指定的备份目录并加载其中的备份索引"""
+        self.backup_dir = backup_dir
 
         # 确保备份目录存在
         os.makedirs(self.backup_dir, exist_ok=True)
 
-        # 加载备份记录
+        # 与其他进程共享的备份记录文件
         self.backup_index_file = os.path.join(self.backup_dir, "backup_index.json")
-        self.backup_index = self._load_backup_index()
+        self.timeline_file = os.path.join(self.backup_dir, "timeline.json")
+        self.trash_dir = os.path.join(self.backup_dir, ".trash")
+        self.trash_file = os.path.join(self.backup_dir, "trash.json")
+        self.store_lock = StoreLock(self.backup_dir)
+        # 上次加载或保存时各记录文件的状态
+        self._signatures = {}
+
+        # 最近一次恢复: (被恢复的备份ID, 恢复前自动保存的备份ID)
+        self.last_restore = None
+
+        # 回收站：删除的备份先移到这里，超出容量后由后台线程真正删除
+        self._reaper = None
+
+        # 撤销/重做栈，只在本次运行中有效
+        self.undo_stack = []
+        self.redo_stack = []
+
+        # 加载备份索引、时间线分支和回收站记录，并按战役索引备份
+        self._load_catalog()
+        self._backfill_index()
+        self._migrate_timeline_branches()
+
+    def _on_config_changed(self, changes):
+        """配置变化时更新缓存的配置"""
+        self.config = get_config()
+
+        if "backup_dir" in changes:
+            logging.info(f"备份目录已切换: {self.config['backup_dir']}")
+            with self._catalog_lock:
+                self._open_backup_dir(self.config["backup_dir"])
+
+    def _load_catalog(self):
+        """在读锁下加载备份索引、时间线分支和回收站记录，并重建战役索引"""
+        with self.store_lock.read():
+            self._signatures = {
+                path: _file_signature(path)
+                for path in (self.backup_index_file, self.timeline_file, self.trash_file)
+            }
+            self.backup_index = self._load_backup_index()
+            self.timeline_branches, self._legacy_branches = self._load_timeline_branches()
+            self.trash = self._load_trash()
+        self._timelines = {}
+        self.campaigns = CampaignIndex(self.backup_index)
+
+    def refresh(self):
+        """
+        记录文件被其他进程修改过时重新加载
+
+        返回:
+            重新加载了返回True，没有变化返回False
+        """
+        with self._catalog_lock:
+            if all(
+                _file_signature(path) == signature
+                for path, signature in self._signatures.items()
+            ):
+                return False
+            logging.info("备份记录已被其他进程修改，重新加载")
+            self._load_catalog()
+            return True
+
+    @contextmanager
+    def _reading(self):
+        """在目录锁下读取内存中的备份记录，读取前先加载其他进程的修改"""
+        with self._catalog_lock:
+            self.refresh()
+            yield
+
+    @contextmanager
+    def _transaction(self):
+        """
+        在目录锁和备份目录的写锁下修改备份记录，可以嵌套
+
+        进入时先加载其他进程的修改，修改后由调用方保存对应的记录文件。
+        """
+        with self._catalog_lock, self.store_lock.write():
+            self.refresh()
+            yield
+
+    def _save_lock(self, save_name):
+        """获取存档的锁，同一存档的复制和恢复依次进行"""
+        with self._save_locks_guard:
+            return self._save_locks.setdefault(save_name, threading.RLock())
+
+    def _write_catalog_file(self, path, data):
+        """原子地写入记录文件（先写临时文件再替换），并记下新的文件状态"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=4)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._signatures[path] = _file_signature(path)
 
     def _load_backup_index(self):
         """加载备份索引文件"""
@@ -41,43 +229,282 @@ class BackupManager:
         else:
             return {}
 
+    def _backfill_index(self):
+        """
+        为旧版本创建的备份补充战役信息和校验值（只需执行一次）
+
+        读取备份文件和解析存档头在锁外进行，备份很多时也不会长时间持有写锁；
+        提交时只更新仍然存在且仍需补充的条目。
+        """
+        fields = ("campaign", "sha256", "size")
+
+        with self._reading():
+            outdated = [
+                (save_name, dict(entry))
+                for save_name, backups in self.backup_index.items()
+                for entry in backups
+                if not all(key in entry for key in fields)
+            ]
+        if not outdated:
+            return
+
+        updates = {}
+        for save_name, entry in outdated:
+            try:
+                file_path, meta = self._get_backup_file_path(entry["id"])
+            except Exception:
+                file_path, meta = None, None
+            meta = meta or {}
+            update = {"sha256": meta.get("sha256", ""), "size": meta.get("size", 0)}
+            if "campaign" not in entry:
+                header = read_header(file_path, CAMPAIGN_FIELDS) if file_path else {}
+                update["campaign"] = campaign_key(header, save_name)
+                update["player"] = str(header.get("player", ""))
+            updates[entry["id"]] = update
+
+        with self._transaction():
+            changed = False
+            for backups in self.backup_index.values():
+                for entry in backups:
+                    update = updates.get(entry["id"])
+                    if update is None or all(key in entry for key in fields):
+                        continue
+                    if "campaign" not in entry and "campaign" in update:
+                        entry["campaign"] = update["campaign"]
+                        entry["player"] = update["player"]
+                    entry["sha256"] = update["sha256"]
+                    entry.setdefault("size", update["size"])
+                    changed = True
+            if changed:
+                logging.info("已为旧备份补充战役信息和校验值")
+                self._save_backup_index()
+                self.campaigns = CampaignIndex(self.backup_index)
+
+    def _add_entry(self, save_name, entry):
+        """把索引条目加入备份索引和战役索引（由调用方负责保存）"""
+        self.backup_index.setdefault(save_name, []).append(entry)
+        self.campaigns.add(save_name, entry)
+
+    def _drop_entries(self, backup_ids):
+        """从备份索引和战役索引中移除条目（由调用方负责保存）"""
+        by_save = {}
+        for backup_id in backup_ids:
+            save_name, _ = self.campaigns.owner(backup_id)
+            if save_name is not None:
+                by_save.setdefault(save_name, set()).add(backup_id)
+            self.campaigns.remove(backup_id)
+
+        for save_name, removed in by_save.items():
+            backups = [b for b in self.backup_index[save_name] if b["id"] not in removed]
+            if backups:
+                self.backup_index[save_name] = backups
+            else:
+                del self.backup_index[save_name]
+
+    def _load_trash(self):
+        """加载回收站记录文件"""
+        if not os.path.exists(self.trash_file):
+            return {}
+        try:
+            with open(self.trash_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logging.error(f"读取回收站记录失败: {e}")
+            return {}
+
+    def _save_trash(self):
+        """保存回收站记录文件"""
+        try:
+            self._write_catalog_file(self.trash_file, self.trash)
+            return True
+        except Exception as e:
+            logging.error(f"保存回收站记录失败: {e}")
+            return False
+
+    def _load_timeline_branches(self):
+        """
+        加载时间线分支记录文件
+
+        返回:
+            ({战役: 分支记录}, {存档名称: 分支记录})，后者是旧版本按存档名记录、
+            还没有迁移的分支
+        """
+        if not os.path.exists(self.timeline_file):
+            return {}, {}
+        try:
+            with open(self.timeline_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if "campaigns" in data:
+                campaigns, legacy = data["campaigns"], data.get("saves", {})
+            else:
+                # 旧版本的记录文件按存档名记录分支
+                campaigns, legacy = {}, data
+            # JSON的键只能是字符串，分支编号转换回整数
+            for info in (*campaigns.values(), *legacy.values()):
+                info["branches"] = {int(k): v for k, v in info["branches"].items()}
+            return campaigns, legacy
+        except Exception as e:
+            logging.error(f"读取时间线分支记录失败: {e}")
+            return {}, {}
+
+    def _save_timeline_branches(self):
+        """保存时间线分支记录文件"""
+        data = {"campaigns": self.timeline_branches}
+        if self._legacy_branches:
+            # 还没有迁移的旧记录原样保留，下次启动时再迁移
+            data["saves"] = self._legacy_branches
+        try:
+            self._write_catalog_file(self.timeline_file, data)
+            return True
+        except Exception as e:
+            logging.error(f"保存时间线分支记录失败: {e}")
+            return False
+
+    def _migrate_timeline_branches(self):
+        """
+        把旧版本按存档名记录的时间线分支改为按战役记录（只需执行一次）
+
+        分支归入其分叉处的备份所属的战役，分叉处的备份都已不存在时归入该存档
+        最近一次备份所属的战役。同一战役已有分支时，迁移来的分支依次往后编号，
+        并同步修改该存档的备份记录的分支编号。
+        """
+        if not self._legacy_branches:
+            return
+        try:
+            with self._transaction():
+                index_changed = False
+                for save_name, info in self._legacy_branches.items():
+                    campaign = None
+                    for branch in info["branches"].values():
+                        campaign = self.campaigns.owner(branch.get("parent"))[1]
+                        if campaign:
+                            break
+                    backups = self.backup_index.get(save_name, [])
+                    if campaign is None and backups:
+                        latest = max(backups, key=lambda b: b["time"])
+                        campaign = CampaignIndex.campaign_of(save_name, latest)
+                    if campaign is None:
+                        campaign = f"save:{save_name}"
+
+                    target = self.timeline_branches.setdefault(
+                        campaign, {"current": 0, "branches": {}}
+                    )
+                    offset = max([0, *target["branches"]])
+                    for branch, branch_info in info["branches"].items():
+                        target["branches"][branch + offset] = branch_info
+                    if info["current"]:
+                        target["current"] = info["current"] + offset
+                    if offset:
+                        for entry in backups:
+                            if entry.get("branch") and (
+                                CampaignIndex.campaign_of(save_name, entry) == campaign
+                            ):
+                                entry["branch"] += offset
+                                index_changed = True
+
+                self._legacy_branches = {}
+                self._timelines.clear()
+                if index_changed:
+                    self._save_backup_index()
+                self._save_timeline_branches()
+            logging.info("已将时间线分支记录改为按战役保存")
+        except StoreLockTimeout as e:
+            logging.error(f"迁移时间线分支记录失败: {e}")
+
     def _save_backup_index(self):
         """保存备份索引文件"""
+        # 索引变化后时间线需要重建
+        self._timelines.clear()
         try:
-            with open(self.backup_index_file, "w", encoding="utf-8") as f:
-                json.dump(self.backup_index, f, ensure_ascii=False, indent=4)
+            with metrics.timer("index_write_seconds"):
+                self._write_catalog_file(self.backup_index_file, self.backup_index)
             return True
         except Exception as e:
             logging.error(f"保存备份索引文件失败: {e}")
             return False
 
-    def create_backup(self, save_file_path, description="", tags=None):
-        """
-        创建备份
+    def _discard_backups(self, backup_ids):
+        """删除已经写入但没能加入索引的备份目录"""
+        for backup_id in backup_ids:
+            shutil.rmtree(os.path.join(self.backup_dir, backup_id), ignore_errors=True)
 
-        参数:
-            save_file_path: 存档文件路径
-            description: 备份描述
-            tags: 标签列表
+    def _write_backup(self, save_file_path, description="", tags=None):
+        """
+        复制存档文件并写入备份元数据（不修改备份索引）
 
         返回:
-            成功返回备份ID，失败返回None
+            (存档名称, 索引条目)
         """
-        try:
-            save_file_name = os.path.basename(save_file_path)
-            save_name = os.path.splitext(save_file_name)[0]  # 不含扩展名的存档名
-
-            # 生成唯一的备份目录名
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_id = f"{save_name}_{timestamp}"
+        save_file_name = os.path.basename(save_file_path)
+        save_name = os.path.splitext(save_file_name)[0]  # 不含扩展名的存档名
+
+        # 生成唯一的备份目录名，同一秒内多次备份时追加序号。
+        # 回收站中的备份仍占用自己的ID，之后移回或再次被清理时不会冲突
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        backup_id = f"{save_name}_{timestamp}"
+        suffix = 1
+        while True:
             backup_dir = os.path.join(self.backup_dir, backup_id)
+            try:
+                if os.path.exists(os.path.join(self.trash_dir, backup_id)):
+                    raise FileExistsError(backup_id)
+                # 在备份目录中创建一个子目录用于存放实际文件
+                os.makedirs(backup_dir)
+                break
+            except FileExistsError:
+                backup_id = f"{save_name}_{timestamp}_{suffix}"
+                suffix += 1
 
-            # 在备份目录中创建一个子目录用于存放实际文件
-            os.makedirs(backup_dir, exist_ok=True)
-
+        try:
             # 复制存档文件
             dest_path = os.path.join(backup_dir, save_file_name)
-            shutil.copy2(save_file_path, dest_path)
+            with metrics.timer("stage_seconds", stage="copy"):
+                shutil.copy2(save_file_path, dest_path)
+            size = os.path.getsize(dest_path)
+            metrics.inc("bytes_copied_total", size)
+
+            is_zip = is_zip_save(dest_path)
+            normalize = self.config["normalize_zip_saves"] and is_zip
+            # 分块压缩：zip存档已经压缩过，只压缩未压缩的存档和规范化存储的条目
+            compression = self.config["backup_compression"]
+            if compression == "none" or (is_zip and not normalize):
+                compression = None
+
+            # 复制的存档只映射一次：从开头解析游戏日期和战役信息（二进制存档无法解析，
+            # 留空），再在一次遍历中计算校验值，未压缩的存档同时分块压缩。
+            # 校验值始终是原存档的校验值，与存储方式无关
+            hasher = hashlib.sha256()
+            pass_stage = "compress" if compression and not normalize else "hash"
+            with MappedFile(dest_path) as source:
+                with metrics.timer("stage_seconds", stage="parse"):
+                    header = read_header(dest_path, CAMPAIGN_FIELDS, source=source)
+                with metrics.timer("stage_seconds", stage=pass_stage), ExitStack() as stack:
+                    consumers = [hasher]
+                    if pass_stage == "compress":
+                        consumers.append(
+                            stack.enter_context(
+                                BlockEncoder(
+                                    dest_path + BLOCK_SUFFIX,
+                                    compression,
+                                    self._codec_workers(),
+                                )
+                            )
+                        )
+                    read_pass(source, consumers, BLOCK_SIZE)
+            digest = hasher.hexdigest()
+            if pass_stage == "compress":
+                os.remove(dest_path)
+
+            # 规范化存储：zip存档的条目解压后分别保存，复制的zip文件不再需要。
+            # 解压的是刚复制的文件，与校验值对应的是同一份数据
+            layout = None
+            if normalize:
+                with metrics.timer("stage_seconds", stage="normalize"):
+                    layout = normalize_zip(dest_path, backup_dir)
+                os.remove(dest_path)
+                if compression:
+                    with metrics.timer("stage_seconds", stage="compress"):
+                        compress_entries(layout, backup_dir, compression, self._codec_workers())
 
             # 创建备份元数据
             meta = {
@@ -85,51 +512,237 @@ class BackupManager:
                 "backup_time": datetime.now().isoformat(),
                 "description": description,
                 "tags": tags or [],
-                "game_date": "",  # 可以从存档文件中解析游戏日期
-                "size": os.path.getsize(save_file_path),
+                "game_date": str(header.get("date", "")),
+                "player": str(header.get("player", "")),
+                "campaign": campaign_key(header, save_name),
+                "size": size,
+                "sha256": digest,
             }
+            if layout is not None or compression:
+                # size为实际占用的空间，original_size为原存档的大小
+                meta["original_size"] = size
+            if layout is not None:
+                meta["size"] = stored_size(layout, backup_dir)
+                meta["zip_layout"] = layout
+            elif compression:
+                meta["size"] = os.path.getsize(dest_path + BLOCK_SUFFIX)
+                meta["compression"] = compression
+
+            # 备份中存储的数据文件（不含会被修改的meta.json）的大小和校验值，
+            # 记入索引后同步时不必再读取这些文件。未压缩的副本和条目使用已有的校验值
+            known = {save_file_name: digest}
+            for item in (layout or {}).get("entries", []):
+                if not item.get("compression"):
+                    known[item["file"]] = item["sha256"]
+            files = {}
+            for name in os.listdir(backup_dir):
+                path = os.path.join(backup_dir, name)
+                files[name] = {
+                    "size": os.path.getsize(path),
+                    "sha256": known.get(name) or hash_file(path),
+                }
 
             # 保存元数据
             meta_path = os.path.join(backup_dir, "meta.json")
-            with open(meta_path, "w", encoding="utf-8") as f:
+            with metrics.timer("stage_seconds", stage="meta"), open(
+                meta_path, "w", encoding="utf-8"
+            ) as f:
                 json.dump(meta, f, ensure_ascii=False, indent=4)
+        except Exception:
+            # 清理复制到一半的备份目录
+            shutil.rmtree(backup_dir, ignore_errors=True)
+            raise
+
+        entry = {
+            "id": backup_id,
+            "time": meta["backup_time"],
+            "description": description,
+            "tags": tags or [],
+            "size": meta["size"],
+            "game_date": meta["game_date"],
+            "player": meta["player"],
+            "campaign": meta["campaign"],
+            "sha256": meta["sha256"],
+            "branch": self.timeline_branches.get(meta["campaign"], {}).get("current", 0),
+            "files": files,
+        }
+        return save_name, entry
+
+    @profiler.profiled("backup.create")
+    @metrics.timed("operation_seconds", failed=_is_none, op="create")
+    def create_backup(self, save_file_path, description="", tags=None):
+        """
+        创建备份
 
-            # 更新备份索引
-            if save_name not in self.backup_index:
-                self.backup_index[save_name] = []
-
-            self.backup_index[save_name].append(
-                {
-                    "id": backup_id,
-                    "time": meta["backup_time"],
-                    "description": description,
-                    "tags": tags or [],
-                }
-            )
+        参数:
+            save_file_path: 存档文件路径
+            description: 备份描述
+            tags: 标签列表
 
-            # 检查是否超过最大备份数量
-            max_backups = self.config["max_backups_per_save"]
-            if len(self.backup_index[save_name]) > max_backups:
-                # 删除最旧的备份
-                oldest = sorted(self.backup_index[save_name], key=lambda x: x["time"])[
-                    0
-                ]
-                self._remove_backup(oldest["id"])
-                self.backup_index[save_name].remove(oldest)
+        返回:
+            成功返回备份ID，失败返回None
+        """
+        save_name = os.path.splitext(os.path.basename(save_file_path))[0]
+        try:
+            # 同一存档的备份依次进行，复制文件时不持有目录锁
+            with self._save_lock(save_name):
+                save_name, entry = self._write_backup(save_file_path, description, tags)
+
+                try:
+                    with self._transaction():
+                        # 更新备份索引
+                        self._add_entry(save_name, entry)
+
+                        # 检查战役的备份是否超过最大数量，删除最旧的备份
+                        self._after_prune(
+                            self._prune_campaign(
+                                entry["campaign"], self.config["max_backups_per_save"]
+                            )
+                        )
+                        # 检查总占用空间是否超过容量上限
+                        self._after_prune(
+                            self._enforce_quota(keep={entry["id"]}), "按容量上限清理"
+                        )
 
-            self._save_backup_index()
-            logging.info(f"创建备份成功: {backup_id}")
+                        self._save_backup_index()
+                except StoreLockTimeout:
+                    # 没能加入索引的备份目录没有用处
+                    self._discard_backups([entry["id"]])
+                    raise
+            logging.info(f"创建备份成功: {entry['id']}")
 
-            return backup_id
+            return entry["id"]
 
         except Exception as e:
             logging.error(f"创建备份失败: {e}")
             return None
 
+    def submit_backup(self, save_file_path, description="", tags=None):
+        """
+        在后台线程池中创建备份
+
+        不同存档的备份可以同时进行，同一存档的备份按提交顺序依次执行。
+
+        参数:
+            save_file_path: 存档文件路径
+            description: 备份描述
+            tags: 标签列表
+
+        返回:
+            Future，结果为create_backup的返回值（备份ID或None）
+        """
+        save_name = os.path.splitext(os.path.basename(save_file_path))[0]
+        future = Future()
+
+        def run():
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(
+                        self.create_backup(save_file_path, description, tags)
+                    )
+                except BaseException as e:
+                    future.set_exception(e)
+            with self._save_locks_guard:
+                if self._backup_queue.get(save_name) is future:
+                    del self._backup_queue[save_name]
+
+        def start(_=None):
+            with self._save_locks_guard:
+                if self._backup_pool is None:
+                    self._backup_pool = ThreadPoolExecutor(
+                        max_workers=BACKUP_WORKERS, thread_name_prefix="backup"
+                    )
+                pool = self._backup_pool
+            pool.submit(run)
+
+        # 同一存档的上一个备份完成后才提交，等待中的任务不占用线程
+        with self._save_locks_guard:
+            previous = self._backup_queue.get(save_name)
+            self._backup_queue[save_name] = future
+        if previous is None:
+            start()
+        else:
+            previous.add_done_callback(start)
+        return future
+
+    @profiler.profiled("backup.create_many")
+    @metrics.timed("operation_seconds", failed=_has_failures, op="create_many")
+    def create_backups(self, save_file_paths, description="", tags=None):
+        """
+        批量创建备份
+
+        文件复制在线程池中并行执行（同名存档依次复制，不持有目录锁），
+        全部完成后在写锁下只保存一次备份索引。
+
+        参数:
+            save_file_paths: 存档文件路径列表
+            description: 备份描述（所有备份相同）
+            tags: 标签列表（所有备份相同）
+
+        返回:
+            {"succeeded": {存档路径: 备份ID}, "failed": {存档路径: 错误信息}}
+        """
+        paths = list(dict.fromkeys(save_file_paths))
+        succeeded, failed = {}, {}
+        written = []
+
+        def write(path):
+            with self._save_lock(os.path.splitext(os.path.basename(path))[0]):
+                return self._write_backup(path, description, tags)
+
+        if paths:
+            with ThreadPoolExecutor(max_workers=min(BATCH_WORKERS, len(paths))) as executor:
+                futures = {executor.submit(write, path): path for path in paths}
+                for future in as_completed(futures):
+                    path = futures[future]
+                    try:
+                        save_name, entry = future.result()
+                    except Exception as e:
+                        logging.error(f"创建备份失败: {path}: {e}")
+                        failed[path] = str(e)
+                        continue
+
+                    written.append((save_name, entry))
+                    succeeded[path] = entry["id"]
+
+        if written:
+            try:
+                with self._transaction():
+                    touched = set()
+                    for save_name, entry in written:
+                        self._add_entry(save_name, entry)
+                        touched.add(entry["campaign"])
+
+                    removed = []
+                    for campaign in touched:
+                        removed.extend(
+                            self._prune_campaign(campaign, self.config["max_backups_per_save"])
+                        )
+                    self._after_prune(removed)
+                    self._after_prune(
+                        self._enforce_quota(keep=set(succeeded.values())), "按容量上限清理"
+                    )
+
+                    self._save_backup_index()
+            except StoreLockTimeout as e:
+                logging.error(f"创建备份失败: {e}")
+                self._discard_backups(succeeded.values())
+                failed.update((path, str(e)) for path in succeeded)
+                succeeded = {}
+        logging.info(f"批量创建备份完成: 成功 {len(succeeded)} 个，失败 {len(failed)} 个")
+
+        return {"succeeded": succeeded, "failed": failed}
+
+    @profiler.profiled("backup.restore")
+    @metrics.timed("operation_seconds", failed=_is_false, op="restore")
     def restore_backup(self, backup_id):
         """
         从备份恢复
 
+        恢复前的存档会作为普通备份（带auto-safety标签）保存到备份目录中，
+        与已有备份内容相同时直接引用已有备份，不会重复保存。保存后立即按数量上限
+        清理该战役最旧的备份（不包括正在恢复的备份）。恢复操作可以撤销。
+
         参数:
             backup_id: 备份ID
 
@@ -137,108 +750,754 @@ class BackupManager:
             成功返回True，失败返回False
         """
         try:
-            backup_dir = os.path.join(self.backup_dir, backup_id)
+            safety_id = self._restore(backup_id)
+        except Exception as e:
+            logging.error(f"恢复备份失败: {e}")
+            return False
 
-            # 检查备份是否存在
-            if not os.path.exists(backup_dir):
-                logging.error(f"备份不存在: {backup_id}")
-                return False
+        self.last_restore = (backup_id, safety_id)
+        if safety_id:
+            self._journal(
+                {
+                    "action": "restore",
+                    "backup_id": backup_id,
+                    "safety_id": safety_id,
+                    "description": f"恢复备份 {backup_id}",
+                }
+            )
 
-            # 读取元数据
-            meta_path = os.path.join(backup_dir, "meta.json")
-            with open(meta_path, "r", encoding="utf-8") as f:
-                meta = json.load(f)
+        try:
+            with self._transaction():
+                self._touch(backup_id)
+                self._save_backup_index()
+
+                # 恢复后继续游戏会产生新的分支
+                _, campaign = self.campaigns.owner(backup_id)
+                if campaign:
+                    self._record_restore(campaign, backup_id)
+        except Exception as e:
+            # 存档已经恢复，只是没有记录使用时间和时间线分支
+            logging.error(f"更新备份记录失败: {e}")
 
-            # 备份的原始存档文件名
-            original_file = meta["original_file"]
-            save_file_name = os.path.basename(original_file)
+        return True
 
-            # 备份的存档文件路径
-            backup_file_path = os.path.join(backup_dir, save_file_name)
+    def _restore(self, backup_id):
+        """
+        用备份替换存档
 
-            # 目标存档位置
-            target_dir = os.path.dirname(original_file)
-            target_path = os.path.join(target_dir, save_file_name)
+        返回:
+            恢复前自动保存的备份ID，存档原本不存在时返回None
 
-            # 如果目标存档存在，先创建一个临时备份
-            if os.path.exists(target_path):
-                current_timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                temp_backup_path = os.path.join(
-                    target_dir, f"{save_file_name}.{current_timestamp}.bak"
-                )
-                shutil.copy2(target_path, temp_backup_path)
-                logging.info(f"创建了当前存档的临时备份: {temp_backup_path}")
+        异常:
+            备份不存在或恢复失败时抛出异常
+        """
+        backup_file_path, meta = self._get_backup_file_path(backup_id)
+        if backup_file_path is None or not (
+            meta.get("zip_layout") or os.path.exists(backup_file_path)
+        ):
+            raise FileNotFoundError(f"备份不存在: {backup_id}")
+
+        # 目标存档位置
+        target_path = meta["original_file"]
+        target_dir = os.path.dirname(target_path)
+        save_file_name = os.path.basename(target_path)
+
+        # 先把备份写到存档目录中的临时文件，再用重命名替换存档。
+        # 同一目录内的重命名是原子操作，游戏不会读到写了一半的存档。
+        # 恢复期间持有存档锁，不会与该存档的备份交错进行
+        staging_path = os.path.join(target_dir, f".{save_file_name}.restoring")
+        with self._save_lock(os.path.splitext(save_file_name)[0]):
+            try:
+                self._materialize(backup_file_path, meta, staging_path, self._codec_workers())
 
-            # 复制备份文件到目标位置
-            shutil.copy2(backup_file_path, target_path)
-            logging.info(f"恢复备份成功: {backup_id} -> {target_path}")
+                # 保存当前存档，保存失败时放弃恢复
+                safety_id = None
+                if os.path.exists(target_path):
+                    safety_id = self._snapshot_before_restore(target_path, backup_id)
 
-            return True
+                os.replace(staging_path, target_path)
+            finally:
+                if os.path.exists(staging_path):
+                    os.remove(staging_path)
 
-        except Exception as e:
-            logging.error(f"恢复备份失败: {e}")
-            return False
+        logging.info(f"恢复备份成功: {backup_id} -> {target_path}")
+        return safety_id
+
+    @staticmethod
+    def _materialize(backup_file_path, meta, dest_path, workers=None):
+        """
+        把备份中的存档写到dest_path
+
+        规范化存储的zip存档按布局重新压缩，并校验每个条目的内容；分块压缩的存档
+        并行解压并校验内容；其他存档直接复制。
+        """
+        layout = meta.get("zip_layout")
+        if layout is not None:
+            with metrics.timer("stage_seconds", stage="rebuild"):
+                restore_zip(layout, os.path.dirname(backup_file_path), dest_path, workers)
+        elif meta.get("compression"):
+            with metrics.timer("stage_seconds", stage="decompress"):
+                digest = decompress_file(backup_file_path, dest_path, workers)
+            if meta.get("sha256") and digest != meta["sha256"]:
+                raise ValueError(f"备份中的存档已损坏: {backup_file_path}")
+        else:
+            shutil.copy2(backup_file_path, dest_path)
+
+    def _snapshot_before_restore(self, save_file_path, restoring_id):
+        """
+        把即将被覆盖的存档保存为备份
+
+        与普通备份一样受数量上限约束，保存后立即清理战役中超出上限的最旧备份，
+        但不会清理正在恢复的备份和刚保存的备份。
+
+        参数:
+            save_file_path: 即将被覆盖的存档路径
+            restoring_id: 正在恢复的备份ID
+
+        返回:
+            备份ID（内容与已有备份相同时返回已有备份的ID）
+
+        异常:
+            保存失败时抛出异常
+        """
+        save_name = os.path.splitext(os.path.basename(save_file_path))[0]
+        with metrics.timer("stage_seconds", stage="hash"):
+            digest = self._hash_file(save_file_path)
+        metrics.inc("dedup_checks_total")
+        with self._reading():
+            existing = list(self.backup_index.get(save_name, []))
+        for entry in existing:
+            if entry.get("sha256") == digest:
+                metrics.inc("dedup_hits_total")
+                metrics.inc("bytes_deduplicated_total", entry.get("size", 0))
+                logging.info(f"当前存档与备份 {entry['id']} 相同，无需另行保存")
+                return entry["id"]
+
+        save_name, entry = self._write_backup(
+            save_file_path, "恢复前自动备份", [SAFETY_TAG]
+        )
+        try:
+            with self._transaction():
+                self._add_entry(save_name, entry)
+                self._after_prune(
+                    self._prune_campaign(
+                        entry["campaign"],
+                        self.config["max_backups_per_save"],
+                        keep={entry["id"], restoring_id},
+                    )
+                )
+                self._save_backup_index()
+        except StoreLockTimeout:
+            self._discard_backups([entry["id"]])
+            raise
+        logging.info(f"已保存恢复前的存档: {entry['id']}")
+        return entry["id"]
 
     def delete_backup(self, backup_id):
         """
         删除备份
 
+        备份只是被移到回收站，可以撤销。
+
         参数:
             backup_id: 备份ID
 
         返回:
             成功返回True，失败返回False
         """
+        result = self.delete_backups([backup_id])
+        return not result["failed"]
+
+    @profiler.profiled("backup.delete")
+    @metrics.timed("operation_seconds", failed=_has_failures, op="delete")
+    def delete_backups(self, backup_ids):
+        """
+        批量删除备份
+
+        每个备份只需一次重命名移到回收站，全部完成后只保存一次备份索引，
+        真正的删除在回收站超出容量后由后台线程完成。整批删除可以一次撤销。
+
+        参数:
+            backup_ids: 备份ID列表
+
+        返回:
+            {"succeeded": [备份ID], "failed": {备份ID: 错误信息}}
+        """
         try:
-            # 找到备份所属的存档
-            save_name = None
-            for name, backups in self.backup_index.items():
-                for backup in backups:
-                    if backup["id"] == backup_id:
-                        save_name = name
-                        break
-                if save_name:
-                    break
+            with self._transaction():
+                succeeded, failed = self._trash_backups(dict.fromkeys(backup_ids))
+                if succeeded:
+                    self._save_backup_index()
+        except StoreLockTimeout as e:
+            logging.error(f"删除备份失败: {e}")
+            return {"succeeded": [], "failed": dict.fromkeys(backup_ids, str(e))}
 
-            if not save_name:
-                logging.error(f"找不到备份ID对应的存档: {backup_id}")
-                return False
+        if succeeded:
+            self._journal(
+                {
+                    "action": "delete",
+                    "backup_ids": succeeded,
+                    "description": f"删除 {len(succeeded)} 个备份",
+                }
+            )
+            self._schedule_reap()
+        logging.info(f"删除备份完成: 成功 {len(succeeded)} 个，失败 {len(failed)} 个")
 
-            # 删除物理备份文件
-            success = self._remove_backup(backup_id)
-            if not success:
-                return False
+        return {"succeeded": succeeded, "failed": failed}
+
+    def _trash_backups(self, backup_ids):
+        """
+        把备份移到回收站并从索引中移除（由调用方负责保存备份索引）
 
-            # 更新索引
-            self.backup_index[save_name] = [
-                b for b in self.backup_index[save_name] if b["id"] != backup_id
+        返回:
+            (成功的备份ID列表, {备份ID: 错误信息})
+        """
+        succeeded, failed = [], {}
+        now = datetime.now().isoformat()
+
+        with self._catalog_lock:
+            for backup_id in backup_ids:
+                save_name, index = self._find_backup(backup_id)
+                if save_name is None:
+                    logging.error(f"找不到备份ID对应的存档: {backup_id}")
+                    failed[backup_id] = "找不到备份"
+                    continue
+
+                source = os.path.join(self.backup_dir, backup_id)
+                if os.path.exists(source):
+                    try:
+                        os.makedirs(self.trash_dir, exist_ok=True)
+                        os.replace(source, os.path.join(self.trash_dir, backup_id))
+                    except OSError as e:
+                        logging.error(f"移动备份到回收站失败: {backup_id}: {e}")
+                        failed[backup_id] = str(e)
+                        continue
+                    self.trash[backup_id] = {
+                        "save_name": save_name,
+                        "entry": self.backup_index[save_name][index],
+                        "deleted_time": now,
+                    }
+                else:
+                    # 备份文件已经不存在，只需要清理索引
+                    logging.warning(f"备份目录不存在: {backup_id}")
+                succeeded.append(backup_id)
+
+            self._drop_entries(succeeded)
+            if succeeded:
+                self._save_trash()
+
+        return succeeded, failed
+
+    def restore_from_trash(self, backup_ids):
+        """
+        把回收站中的备份放回备份目录
+
+        参数:
+            backup_ids: 备份ID列表
+
+        返回:
+            {"succeeded": [备份ID], "failed": {备份ID: 错误信息}}
+        """
+        succeeded, failed = [], {}
+        try:
+            with self._transaction():
+                for backup_id in dict.fromkeys(backup_ids):
+                    item = self.trash.get(backup_id)
+                    if item is None:
+                        failed[backup_id] = "回收站中没有该备份（可能已被清理）"
+                        continue
+                    target = os.path.join(self.backup_dir, backup_id)
+                    if os.path.exists(target):
+                        failed[backup_id] = "备份目录中已有同名备份"
+                        continue
+                    try:
+                        os.replace(os.path.join(self.trash_dir, backup_id), target)
+                    except OSError as e:
+                        logging.error(f"从回收站恢复备份失败: {backup_id}: {e}")
+                        failed[backup_id] = str(e)
+                        continue
+                    del self.trash[backup_id]
+                    self._add_entry(item["save_name"], item["entry"])
+                    succeeded.append(backup_id)
+
+                if succeeded:
+                    self._save_trash()
+                    self._save_backup_index()
+        except StoreLockTimeout as e:
+            logging.error(f"从回收站恢复备份失败: {e}")
+            return {"succeeded": [], "failed": dict.fromkeys(backup_ids, str(e))}
+
+        return {"succeeded": succeeded, "failed": failed}
+
+    def get_trash(self):
+        """
+        获取回收站中的备份
+
+        返回:
+            索引条目列表，每项额外包含save_name和deleted_time字段，按删除时间从新到旧排序
+        """
+        with self._reading():
+            items = [
+                dict(item["entry"], save_name=item["save_name"], deleted_time=item["deleted_time"])
+                for item in self.trash.values()
             ]
-            if not self.backup_index[save_name]:
-                del self.backup_index[save_name]
+        items.sort(key=lambda item: item["deleted_time"], reverse=True)
+        return items
 
-            self._save_backup_index()
-            logging.info(f"删除备份成功: {backup_id}")
+    def reap_trash(self, quota_bytes=None):
+        """
+        从最早删除的备份开始真正删除回收站中的备份，直到回收站不超过容量
 
-            return True
+        参数:
+            quota_bytes: 回收站容量（字节），为None时使用_trash_limit()，为0时清空回收站
+
+        返回:
+            被删除的备份ID列表
+        """
+        try:
+            with self._transaction():
+                if quota_bytes is None:
+                    quota_bytes = self._trash_limit()
+                total = sum(item["entry"].get("size", 0) for item in self.trash.values())
+                victims = []
+                for backup_id, item in sorted(
+                    self.trash.items(), key=lambda kv: kv[1]["deleted_time"]
+                ):
+                    if total <= quota_bytes:
+                        break
+                    total -= item["entry"].get("size", 0)
+                    victims.append(backup_id)
+                    del self.trash[backup_id]
+                if victims:
+                    self._save_trash()
+
+                # 回收站中没有记录的目录（例如上次清理被中断）也一起删除
+                if os.path.isdir(self.trash_dir):
+                    victims.extend(
+                        name
+                        for name in os.listdir(self.trash_dir)
+                        if name not in self.trash and name not in victims
+                    )
+        except StoreLockTimeout as e:
+            logging.error(f"清理回收站失败: {e}")
+            return []
+
+        # 删除文件不需要持有锁；游戏正在写入存档时先等待写入平息
+        for backup_id in victims:
+            checkpoint()
+            shutil.rmtree(os.path.join(self.trash_dir, backup_id), ignore_errors=True)
+            logging.info(f"清理回收站中的备份: {backup_id}")
+        return victims
+
+    def _trash_bytes(self):
+        """回收站中的备份占用的空间"""
+        return sum(item["entry"].get("size", 0) for item in self.trash.values())
+
+    def _trash_limit(self):
+        """
+        回收站的容量（字节）
+
+        设置了总容量上限时，回收站中的备份同样占用磁盘，和索引中的备份一起计入上限：
+        回收站最多使用上限减去现有备份后剩余的空间，因容量上限被移到回收站的备份
+        因此会被真正删除。
+        """
+        limit = self.config["trash_quota_mb"] * 1024 * 1024
+        quota = self.config["storage_quota_mb"] * 1024 * 1024
+        if quota:
+            limit = min(limit, max(0, quota - self.campaigns.total_bytes))
+        return limit
+
+    def _schedule_reap(self):
+        """回收站超出容量时，在低优先级的后台线程中清理，不阻塞界面操作"""
+        with self._reading():
+            if self._trash_bytes() <= self._trash_limit():
+                return
+        with self._catalog_lock:
+            # 还没有开始的清理会按执行时的回收站清理，不必再提交；正在进行的清理
+            # 看不到之后移入回收站的备份，在它之后再清理一次
+            if self._reaper is not None and not (self._reaper.done() or self._reaper.running()):
+                return
+            # 命令行退出前通过io_scheduler.shutdown等待清理完成
+            self._reaper = io_scheduler.submit(self.reap_trash, name="trash-reaper")
+
+    def _journal(self, operation):
+        """记录一次可以撤销的操作"""
+        with self._catalog_lock:
+            self.undo_stack.append(operation)
+            del self.undo_stack[:-UNDO_LIMIT]
+            self.redo_stack.clear()
+
+    def undo_description(self):
+        """可以撤销的操作的描述，没有时返回None"""
+        return self.undo_stack[-1]["description"] if self.undo_stack else None
+
+    def redo_description(self):
+        """可以重做的操作的描述，没有时返回None"""
+        return self.redo_stack[-1]["description"] if self.redo_stack else None
+
+    @profiler.profiled("backup.undo")
+    @metrics.timed("operation_seconds", op="undo")
+    def undo(self):
+        """
+        撤销最近一次删除、清理或恢复
+
+        返回:
+            成功返回True，没有可撤销的操作或撤销失败返回False
+        """
+        with self._catalog_lock:
+            if not self.undo_stack:
+                return False
+            operation = self.undo_stack.pop()
 
+        try:
+            if operation["action"] == "delete":
+                result = self.restore_from_trash(operation["backup_ids"])
+                for backup_id, error in result["failed"].items():
+                    logging.warning(f"无法撤销删除: {backup_id}: {error}")
+                # 只有成功放回的备份可以重做删除
+                operation = dict(operation, backup_ids=result["succeeded"])
+                ok = bool(result["succeeded"])
+            else:
+                self._restore(operation["safety_id"])
+                ok = True
         except Exception as e:
-            logging.error(f"删除备份失败: {e}")
+            logging.error(f"撤销失败: {operation['description']}: {e}")
+            metrics.inc("operation_errors_total", op="undo")
             return False
 
-    def _remove_backup(self, backup_id):
-        """删除备份文件"""
+        if ok:
+            with self._catalog_lock:
+                self.redo_stack.append(operation)
+            logging.info(f"已撤销: {operation['description']}")
+        return ok
+
+    @profiler.profiled("backup.redo")
+    @metrics.timed("operation_seconds", op="redo")
+    def redo(self):
+        """
+        重做最近一次撤销的操作
+
+        返回:
+            成功返回True，没有可重做的操作或重做失败返回False
+        """
+        with self._catalog_lock:
+            if not self.redo_stack:
+                return False
+            operation = self.redo_stack.pop()
+
         try:
-            backup_dir = os.path.join(self.backup_dir, backup_id)
-            if os.path.exists(backup_dir):
-                shutil.rmtree(backup_dir)
-                return True
+            if operation["action"] == "delete":
+                with self._transaction():
+                    succeeded, _ = self._trash_backups(operation["backup_ids"])
+                    if succeeded:
+                        self._save_backup_index()
+                if succeeded:
+                    self._schedule_reap()
+                ok = bool(succeeded)
             else:
-                logging.warning(f"备份目录不存在: {backup_dir}")
-                return False
+                self._restore(operation["backup_id"])
+                ok = True
         except Exception as e:
-            logging.error(f"删除备份文件失败: {e}")
+            logging.error(f"重做失败: {operation['description']}: {e}")
+            metrics.inc("operation_errors_total", op="redo")
             return False
 
+        if ok:
+            with self._catalog_lock:
+                self.undo_stack.append(operation)
+            logging.info(f"已重做: {operation['description']}")
+        return ok
+
+    def _record_restore(self, campaign, backup_id):
+        """记录一次恢复：从被恢复的备份处分出战役的新时间线分支（由调用方持有写锁）"""
+        info = self.timeline_branches.setdefault(
+            campaign, {"current": 0, "branches": {}}
+        )
+        branch = max([0, *info["branches"]]) + 1
+        info["branches"][branch] = {
+            "parent": backup_id,
+            "time": datetime.now().isoformat(),
+        }
+        info["current"] = branch
+        self._timelines.pop(campaign, None)
+        self._save_timeline_branches()
+        logging.info(f"从备份 {backup_id} 分出时间线分支 {branch}")
+
+    def get_timeline(self, campaign):
+        """
+        获取战役时间线
+
+        参数:
+            campaign: 战役标识（可以用get_campaign_of_save查找存档所属的战役）
+
+        返回:
+            CampaignTimeline，按游戏日期组织该战役的备份（包括重命名前后的存档）
+            并记录恢复产生的分支
+        """
+        with self._reading():
+            timeline = self._timelines.get(campaign)
+            if timeline is None:
+                timeline = CampaignTimeline(
+                    [entry for _, entry in self.campaigns.backups(campaign)],
+                    self.timeline_branches.get(campaign, {}).get("branches"),
+                )
+                self._timelines[campaign] = timeline
+            return timeline
+
+    def _find_backup(self, backup_id):
+        """
+        查找备份所属的存档
+
+        返回:
+            (存档名称, 在该存档备份列表中的位置)，找不到时返回(None, None)
+        """
+        save_name, _ = self.campaigns.owner(backup_id)
+        if save_name is None:
+            return None, None
+        for i, backup in enumerate(self.backup_index[save_name]):
+            if backup["id"] == backup_id:
+                return save_name, i
+        return None, None
+
+    def get_campaigns(self):
+        """
+        获取所有战役的概况
+
+        返回:
+            列表，每项为 {"campaign", "player", "save_names", "count",
+            "latest_time", "latest_game_date"}
+        """
+        with self._reading():
+            return self.campaigns.campaigns()
+
+    def get_campaign_of_save(self, save_name):
+        """
+        获取存档最近一次备份所属的战役
+
+        返回:
+            战役标识，存档没有备份时返回None
+        """
+        with self._reading():
+            backups = self.backup_index.get(save_name)
+            if not backups:
+                return None
+            latest = max(backups, key=lambda b: b["time"])
+            return CampaignIndex.campaign_of(save_name, latest)
+
+    def get_backups_for_campaign(self, campaign):
+        """
+        获取战役的所有备份（可能来自多个存档名）
+
+        返回:
+            索引条目列表，每项额外包含save_name字段，按备份时间从新到旧排序
+        """
+        with self._reading():
+            return [
+                dict(entry, save_name=save_name)
+                for save_name, entry in self.campaigns.backups(campaign)
+            ]
+
+    def _after_prune(self, removed, action="清理"):
+        """记录清理操作以便撤销，并在后台清理回收站"""
+        if not removed:
+            return
+        self._journal(
+            {
+                "action": "delete",
+                "backup_ids": removed,
+                "description": f"{action} {len(removed)} 个旧备份",
+            }
+        )
+        self._schedule_reap()
+
+    def _touch(self, backup_id):
+        """记录备份被使用的时间（仅修改内存中的索引），按容量清理时最近使用的备份最后被清理"""
+        save_name, index = self._find_backup(backup_id)
+        if save_name:
+            self.backup_index[save_name][index]["accessed"] = datetime.now().isoformat()
+
+    @staticmethod
+    def _eviction_score(entry, now):
+        """按容量清理时的分数：闲置时间除以保留优先级，分数越高越先被清理"""
+        last_used = datetime.fromisoformat(entry.get("accessed") or entry["time"])
+        idle = max(0.0, (now - last_used).total_seconds())
+        priority = min(
+            (RETENTION_PRIORITY.get(tag, 1.0) for tag in entry.get("tags", [])),
+            default=1.0,
+        )
+        return idle / priority
+
+    def _enforce_quota(self, keep=()):
+        """
+        总占用空间超过容量上限时，把最久未使用的备份移到回收站
+        （仅修改内存中的索引，由调用方负责保存）
+
+        固定的备份、每个战役最新的备份以及keep中的备份不会被清理。
+        占用空间来自战役索引中的累计值，不需要遍历备份目录。移到回收站的备份仍占用
+        磁盘，回收站的容量随之缩小（见_trash_limit），由后台清理真正删除。
+
+        返回:
+            被清理的备份ID列表
+        """
+        quota = self.config["storage_quota_mb"] * 1024 * 1024
+        excess = self.campaigns.total_bytes - quota
+        if not quota or excess <= 0:
+            return []
+
+        newest = {}
+        for _, campaign, entry in self.campaigns.entries():
+            if campaign not in newest or entry["time"] > newest[campaign]["time"]:
+                newest[campaign] = entry
+
+        now = datetime.now()
+        heap = [
+            (-self._eviction_score(entry, now), entry["id"], entry.get("size", 0))
+            for _, campaign, entry in self.campaigns.entries()
+            if not entry.get("pinned")
+            and entry["id"] not in keep
+            and entry is not newest[campaign]
+        ]
+        heapq.heapify(heap)
+
+        victims = []
+        while heap and excess > 0:
+            _, backup_id, size = heapq.heappop(heap)
+            victims.append(backup_id)
+            excess -= size
+        if excess > 0:
+            logging.warning("固定的备份和各战役最新的备份已超过容量上限，无法继续清理")
+
+        removed, _ = self._trash_backups(victims)
+        for backup_id in removed:
+            logging.info(f"按容量上限清理备份: {backup_id}")
+        return removed
+
+    def get_usage(self):
+        """
+        获取备份占用的空间
+
+        返回:
+            {"total": 总字节数, "trash": 回收站字节数, "quota": 容量上限字节数（0表示不限制）,
+             "saves": {存档名称: 字节数}, "campaigns": {战役: 字节数}}
+        """
+        with self._reading():
+            return {
+                "total": self.campaigns.total_bytes,
+                "trash": self._trash_bytes(),
+                "quota": self.config["storage_quota_mb"] * 1024 * 1024,
+                "saves": dict(self.campaigns.save_bytes),
+                "campaigns": dict(self.campaigns.campaign_bytes),
+            }
+
+    def set_pinned(self, backup_ids, pinned=True):
+        """
+        固定或取消固定备份，固定的备份不会因为容量上限被清理
+
+        参数:
+            backup_ids: 备份ID列表
+            pinned: True为固定，False为取消固定
+
+        返回:
+            成功返回True，有备份找不到或更新失败时返回False
+        """
+        ok = True
+        try:
+            with self._transaction():
+                for backup_id in backup_ids:
+                    save_name, index = self._find_backup(backup_id)
+                    if not save_name:
+                        logging.error(f"找不到备份ID对应的存档: {backup_id}")
+                        ok = False
+                        continue
+                    self.backup_index[save_name][index]["pinned"] = pinned
+                    try:
+                        self._update_meta_file(backup_id, {"pinned": pinned})
+                    except Exception as e:
+                        logging.error(f"更新备份元数据失败: {backup_id}: {e}")
+                        ok = False
+
+                self._save_backup_index()
+        except StoreLockTimeout as e:
+            logging.error(f"固定备份失败: {e}")
+            return False
+        return ok
+
+    def _prune_campaign(self, campaign, max_backups, keep=()):
+        """
+        删除战役中超出数量上限的最旧备份（仅修改内存中的索引，由调用方负责保存）
+
+        同一战役的备份可能分散在多个存档名下，数量上限按战役计算。
+
+        参数:
+            campaign: 战役标识
+            max_backups: 数量上限，为None时不清理
+            keep: 不清理的备份ID，超出的数量由其余最旧的备份抵扣
+
+        返回:
+            被删除的备份ID列表
+        """
+        backups = self.campaigns.backups(campaign)
+        if max_backups is None or len(backups) <= max_backups:
+            return []
+
+        # backups按时间从新到旧排序，最旧的那部分移到回收站
+        candidates = [entry["id"] for _, entry in backups if entry["id"] not in keep]
+        excess = len(backups) - max_backups
+        removed, _ = self._trash_backups(candidates[max(0, len(candidates) - excess) :])
+        for backup_id in removed:
+            logging.info(f"清理旧备份: {backup_id}")
+        return removed
+
+    @staticmethod
+    def _hash_file(file_path, workers=None):
+        """计算文件的SHA-256校验值，分块压缩的文件按解压后的内容计算"""
+        digest = hashlib.sha256()
+        for chunk in iter_chunks(file_path, workers):
+            digest.update(chunk)
+        return digest.hexdigest()
+
+    def _codec_workers(self):
+        """分块压缩和解压使用的线程数，为None时使用CPU核数"""
+        return self.config["compression_workers"] or None
+
+    def _get_backup_file_path(self, backup_id):
+        """
+        获取备份中存档文件的路径
+
+        返回:
+            (存档文件路径, 元数据)，备份不存在时返回(None, None)
+        """
+        meta_path = os.path.join(self.backup_dir, backup_id, "meta.json")
+        if not os.path.exists(meta_path):
+            return None, None
+
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        save_file_name = os.path.basename(meta["original_file"])
+        if meta.get("compression"):
+            save_file_name += BLOCK_SUFFIX
+        return os.path.join(self.backup_dir, backup_id, save_file_name), meta
+
+    def _get_readable_path(self, backup_id):
+        """
+        获取可以用save_parser解析的文件路径
+
+        规范化存储的zip存档返回其中gamestate条目的文件。
+
+        返回:
+            文件路径，备份不存在时返回None
+        """
+        file_path, meta = self._get_backup_file_path(backup_id)
+        if file_path is None:
+            return None
+        layout = meta.get("zip_layout")
+        if layout is not None:
+            return gamestate_path(layout, os.path.dirname(file_path))
+        return file_path if os.path.exists(file_path) else None
+
+    @profiler.profiled("backup.list")
+    @metrics.timed("operation_seconds", op="list")
     def get_backups_for_save(self, save_name):
         """
         获取指定存档的所有备份
@@ -249,39 +1508,37 @@ class BackupManager:
         返回:
             备份列表，按时间从新到旧排序
         """
-        if save_name in self.backup_index:
+        with self._reading():
             # 按时间排序
             backups = sorted(
-                self.backup_index[save_name], key=lambda x: x["time"], reverse=True
+                self.backup_index.get(save_name, []), key=lambda x: x["time"], reverse=True
             )
 
-            # 为每个备份添加额外信息
-            result = []
-            for backup in backups:
-                backup_dir = os.path.join(self.backup_dir, backup["id"])
-                meta_path = os.path.join(backup_dir, "meta.json")
-
-                if os.path.exists(meta_path):
-                    try:
-                        with open(meta_path, "r", encoding="utf-8") as f:
-                            meta = json.load(f)
-
-                        backup_info = backup.copy()
-                        backup_info["game_date"] = meta.get("game_date", "")
-                        backup_info["size"] = meta.get("size", 0)
-                        backup_info["description"] = meta.get(
-                            "description", backup_info.get("description", "")
-                        )
+        # 为每个备份添加额外信息（读取元数据文件时不持有锁）
+        result = []
+        for backup in backups:
+            backup_dir = os.path.join(self.backup_dir, backup["id"])
+            meta_path = os.path.join(backup_dir, "meta.json")
 
-                        result.append(backup_info)
-                    except:
-                        result.append(backup)
-                else:
+            if os.path.exists(meta_path):
+                try:
+                    with open(meta_path, "r", encoding="utf-8") as f:
+                        meta = json.load(f)
+
+                    backup_info = backup.copy()
+                    backup_info["game_date"] = meta.get("game_date", "")
+                    backup_info["size"] = meta.get("size", 0)
+                    backup_info["description"] = meta.get(
+                        "description", backup_info.get("description", "")
+                    )
+
+                    result.append(backup_info)
+                except:
                     result.append(backup)
+            else:
+                result.append(backup)
 
-            return result
-        else:
-            return []
+        return result
 
     def get_all_backups(self):
         """
@@ -291,16 +1548,37 @@ class BackupManager:
             所有备份的扁平列表，按时间从新到旧排序
         """
         all_backups = []
-        for save_name, backups in self.backup_index.items():
-            for backup in backups:
-                backup_copy = backup.copy()
-                backup_copy["save_name"] = save_name
-                all_backups.append(backup_copy)
+        with self._reading():
+            for save_name, backups in self.backup_index.items():
+                for backup in backups:
+                    backup_copy = backup.copy()
+                    backup_copy["save_name"] = save_name
+                    all_backups.append(backup_copy)
 
         # 按时间排序
         all_backups.sort(key=lambda x: x["time"], reverse=True)
         return all_backups
 
+    def _update_meta_file(self, backup_id, fields):
+        """更新备份目录中的元数据文件"""
+        meta_path = os.path.join(self.backup_dir, backup_id, "meta.json")
+        if not os.path.exists(meta_path):
+            return
+
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        meta.update(fields)
+
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=4)
+
+    @staticmethod
+    def _metadata_fields(description=None, tags=None, game_date=None):
+        """整理需要更新的元数据字段，值为None的字段不更新"""
+        fields = {"description": description, "tags": tags, "game_date": game_date}
+        return {k: v for k, v in fields.items() if v is not None}
+
     def update_backup_metadata(
         self, backup_id, description=None, tags=None, game_date=None
     ):
@@ -317,52 +1595,345 @@ class BackupManager:
             成功返回True，失败返回False
         """
         try:
-            # 查找备份所属的存档
-            save_name = None
-            backup_index = None
-            for name, backups in self.backup_index.items():
-                for i, backup in enumerate(backups):
-                    if backup["id"] == backup_id:
-                        save_name = name
-                        backup_index = i
-                        break
-                if save_name:
-                    break
+            with self._transaction():
+                # 查找备份所属的存档
+                save_name, backup_index = self._find_backup(backup_id)
+
+                if not save_name:
+                    logging.error(f"找不到备份ID对应的存档: {backup_id}")
+                    return False
+
+                fields = self._metadata_fields(description, tags, game_date)
 
-            if not save_name:
+                # 更新索引中的元数据
+                entry = self.backup_index[save_name][backup_index]
+                for key in ("description", "tags", "game_date"):
+                    if key in fields:
+                        entry[key] = fields[key]
+
+                # 更新文件中的元数据
+                self._update_meta_file(backup_id, fields)
+
+                self._save_backup_index()
+            logging.info(f"更新备份元数据成功: {backup_id}")
+
+            return True
+
+        except Exception as e:
+            logging.error(f"更新备份元数据失败: {e}")
+            return False
+
+    @profiler.profiled("backup.update_many")
+    @metrics.timed("operation_seconds", failed=_has_failures, op="update_many")
+    def update_metadata_many(self, updates):
+        """
+        批量更新备份元数据
+
+        元数据文件在线程池中并行写入（不持有锁），全部完成后在写锁下只保存一次备份索引。
+
+        参数:
+            updates: {备份ID: {"description": ..., "tags": ..., "game_date": ...}}，
+                     省略或为None的字段不更新
+
+        返回:
+            {"succeeded": [备份ID], "failed": {备份ID: 错误信息}}
+        """
+        succeeded, failed = [], {}
+        jobs = {}
+        with self._reading():
+            missing = {
+                backup_id
+                for backup_id in updates
+                if self.campaigns.owner(backup_id)[0] is None
+            }
+        for backup_id, values in updates.items():
+            if backup_id in missing:
                 logging.error(f"找不到备份ID对应的存档: {backup_id}")
-                return False
+                failed[backup_id] = "找不到备份"
+                continue
+            jobs[backup_id] = self._metadata_fields(**values)
+
+        if jobs:
+            with ThreadPoolExecutor(max_workers=min(BATCH_WORKERS, len(jobs))) as executor:
+                futures = {
+                    executor.submit(self._update_meta_file, backup_id, fields): backup_id
+                    for backup_id, fields in jobs.items()
+                }
+                for future in as_completed(futures):
+                    backup_id = futures[future]
+                    try:
+                        future.result()
+                    except Exception as e:
+                        logging.error(f"更新备份元数据失败: {backup_id}: {e}")
+                        failed[backup_id] = str(e)
+                        continue
+                    succeeded.append(backup_id)
+
+        if succeeded:
+            try:
+                with self._transaction():
+                    for backup_id in succeeded:
+                        save_name, index = self._find_backup(backup_id)
+                        if save_name is None:
+                            # 更新期间被其他进程删除
+                            continue
+                        entry = self.backup_index[save_name][index]
+                        fields = jobs[backup_id]
+                        for key in ("description", "tags", "game_date"):
+                            if key in fields:
+                                entry[key] = fields[key]
+                    self._save_backup_index()
+            except StoreLockTimeout as e:
+                # 元数据文件已经更新，索引中的字段要等下次更新时才会同步
+                logging.error(f"更新备份索引失败: {e}")
+                failed.update((backup_id, str(e)) for backup_id in succeeded)
+                succeeded = []
+        logging.info(f"批量更新备份元数据完成: 成功 {len(succeeded)} 个，失败 {len(failed)} 个")
+
+        return {"succeeded": succeeded, "failed": failed}
+
+    @profiler.profiled("backup.export")
+    @metrics.timed("operation_seconds", failed=_is_none, op="export")
+    def export_backups(self, archive_path, backup_ids=None, save_names=None):
+        """
+        导出备份到单个归档文件
 
-            # 更新索引中的元数据
-            if description is not None:
-                self.backup_index[save_name][backup_index]["description"] = description
+        参数:
+            archive_path: 归档文件路径
+            backup_ids: 要导出的备份ID列表
+            save_names: 要导出全部备份的存档名称列表
 
-            if tags is not None:
-                self.backup_index[save_name][backup_index]["tags"] = tags
+        返回:
+            导出的备份ID列表，失败时返回None
+        """
+        from src.archive import export_backups
 
-            # 读取并更新文件中的元数据
-            meta_path = os.path.join(self.backup_dir, backup_id, "meta.json")
-            if os.path.exists(meta_path):
-                with open(meta_path, "r", encoding="utf-8") as f:
-                    meta = json.load(f)
+        return export_backups(self, archive_path, backup_ids, save_names)
 
-                if description is not None:
-                    meta["description"] = description
+    @profiler.profiled("backup.import")
+    @metrics.timed("operation_seconds", failed=_has_failures, op="import")
+    def import_backups(self, archive_path):
+        """
+        从归档文件导入备份，已存在的备份会被跳过
 
-                if tags is not None:
-                    meta["tags"] = tags
+        参数:
+            archive_path: 归档文件路径
 
-                if game_date is not None:
-                    meta["game_date"] = game_date
+        返回:
+            {"imported": [...], "skipped": [...], "failed": {...}}，失败时返回None
+        """
+        from src.archive import import_backups
 
-                with open(meta_path, "w", encoding="utf-8") as f:
-                    json.dump(meta, f, ensure_ascii=False, indent=4)
+        return import_backups(self, archive_path)
 
-            self._save_backup_index()
-            logging.info(f"更新备份元数据成功: {backup_id}")
+    @profiler.profiled("backup.sync")
+    @metrics.timed("operation_seconds", failed=_has_failures, op="sync")
+    def sync_to_mirror(self, target=None, concurrency=None, delete=True):
+        """
+        将备份目录增量同步到镜像目标
+
+        参数:
+            target: 同步目标，为None时使用配置中的sync_target
+            concurrency: 并行上传数，为None时使用配置中的sync_concurrency
+            delete: 是否删除目标上已不存在于本地的文件
+
+        返回:
+            {"uploaded": [...], "deleted": [...], "failed": {...}}，失败时返回None
+        """
+        from src.sync import SyncEngine, get_backend
+
+        target = target or self.config["sync_target"]
+        if not target:
+            logging.error("未配置备份同步目标")
+            return None
+
+        try:
+            engine = SyncEngine(
+                self,
+                get_backend(target),
+                concurrency or self.config["sync_concurrency"],
+            )
+            return engine.sync(delete=delete)
+        except Exception as e:
+            logging.error(f"同步备份失败: {e}")
+            return None
+
+    @profiler.profiled("backup.diff")
+    @metrics.timed("operation_seconds", failed=_is_none, op="diff")
+    def diff_backups(self, old_backup_id, new_backup_id):
+        """
+        在游戏层面比较两个备份（国家、省份、战争、国库等）
+
+        参数:
+            old_backup_id: 较早的备份ID
+            new_backup_id: 较新的备份ID
+
+        返回:
+            save_diff.diff_saves的返回值，失败时返回None
+        """
+        from src.save_diff import diff_saves
+
+        try:
+            old_path = self._get_readable_path(old_backup_id)
+            new_path = self._get_readable_path(new_backup_id)
+            if not old_path or not new_path:
+                logging.error(f"备份不存在: {old_backup_id if not old_path else new_backup_id}")
+                return None
+
+            with self._catalog_lock:
+                self._touch(old_backup_id)
+                self._touch(new_backup_id)
+            return diff_saves(old_path, new_path)
+
+        except Exception as e:
+            logging.error(f"比较备份失败: {e}")
+            return None
+
+    @profiler.profiled("backup.prune")
+    @metrics.timed("operation_seconds", op="prune")
+    def prune_backups(self, save_name=None, max_backups=None):
+        """
+        按数量上限清理旧备份
+
+        数量上限按战役计算，指定存档时清理该存档的备份所属的所有战役。
+        之后总占用空间仍超过容量上限时，再按容量上限清理。
+
+        参数:
+            save_name: 存档名称(不含扩展名)，为None时清理所有战役
+            max_backups: 每个战役保留的备份数，为None时使用配置中的值
+
+        返回:
+            被删除的备份ID列表
+        """
+        if max_backups is None:
+            max_backups = self.config["max_backups_per_save"]
+
+        try:
+            with self._transaction():
+                if save_name:
+                    campaigns = {
+                        CampaignIndex.campaign_of(save_name, entry)
+                        for entry in self.backup_index.get(save_name, [])
+                    }
+                else:
+                    campaigns = [item["campaign"] for item in self.campaigns.campaigns()]
+
+                removed = []
+                for campaign in campaigns:
+                    removed.extend(self._prune_campaign(campaign, max_backups))
+                self._after_prune(removed)
+
+                evicted = self._enforce_quota()
+                self._after_prune(evicted, "按容量上限清理")
+                removed.extend(evicted)
+
+                if removed:
+                    self._save_backup_index()
+        except StoreLockTimeout as e:
+            logging.error(f"清理备份失败: {e}")
+            metrics.inc("operation_errors_total", op="prune")
+            return []
+        if removed:
+            logging.info(f"清理备份完成，共删除 {len(removed)} 个备份")
+        return removed
+
+    @profiler.profiled("backup.verify")
+    @metrics.timed("operation_seconds", op="verify")
+    def verify_backup(self, backup_id):
+        """
+        校验备份文件的完整性
+
+        参数:
+            backup_id: 备份ID
+
+        返回:
+            校验通过返回True，否则返回False
+        """
+        try:
+            backup_file_path, meta = self._get_backup_file_path(backup_id)
+            if backup_file_path and meta.get("zip_layout"):
+                error = verify_entries(
+                    meta["zip_layout"],
+                    os.path.dirname(backup_file_path),
+                    self._codec_workers(),
+                )
+                if error:
+                    logging.error(f"{error}: {backup_id}")
+                    return False
+                return True
+
+            if not backup_file_path or not os.path.exists(backup_file_path):
+                logging.error(f"备份文件缺失: {backup_id}")
+                return False
+
+            if os.path.getsize(backup_file_path) != meta.get("size"):
+                logging.error(f"备份文件大小不一致: {backup_id}")
+                return False
+
+            # 旧版本创建的备份没有记录校验值，只检查文件大小
+            expected = meta.get("sha256")
+            if not expected:
+                return True
+            try:
+                # 分块压缩的文件解压时还会校验每块的CRC32
+                digest = self._hash_file(backup_file_path, self._codec_workers())
+            except ValueError as e:
+                logging.error(f"{e}: {backup_id}")
+                return False
+            if digest != expected:
+                logging.error(f"备份文件校验值不一致: {backup_id}")
+                return False
 
             return True
 
         except Exception as e:
-            logging.error(f"更新备份元数据失败: {e}")
+            logging.error(f"校验备份失败: {e}")
             return False
+
+    def search_backups(self, keyword):
+        """
+        按关键字搜索备份
+
+        参数:
+            keyword: 关键字，匹配存档名称、备份ID、描述和标签（不区分大小写）
+
+        返回:
+            匹配的备份列表，按时间从新到旧排序
+        """
+        keyword = keyword.lower()
+        result = []
+        for backup in self.get_all_backups():
+            fields = [
+                backup["save_name"],
+                backup["id"],
+                backup.get("description", ""),
+            ] + backup.get("tags", [])
+            if any(keyword in field.lower() for field in fields):
+                result.append(backup)
+        return result
+
+    def get_stats(self):
+        """
+        获取备份统计信息
+
+        大小来自索引中累计的占用空间，不读取备份目录。
+
+        返回:
+            包含存档数、备份数、总大小和各存档明细的字典
+        """
+        with self._reading():
+            per_save = {
+                save_name: {
+                    "count": len(backups),
+                    "size": self.campaigns.save_bytes.get(save_name, 0),
+                }
+                for save_name, backups in self.backup_index.items()
+            }
+            total_size = self.campaigns.total_bytes
+
+        return {
+            "save_count": len(per_save),
+            "backup_count": sum(v["count"] for v in per_save.values()),
+            "total_size": total_size,
+            "saves": per_save,
+        }
@@ -0,0 +1,400 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+分块并行压缩模块
+
+单线程压缩一个上百MB的gamestate需要数秒。本模块把文件按固定大小分块，每块独立
+压缩为一个帧：多个块由线程池同时压缩（zlib和lzma压缩时释放GIL），再按原顺序
+写入文件。解压时同样由线程池同时解压各块，按顺序输出，速度随CPU核数增长。
+同时处理的块数有上限，内存占用与文件大小无关。
+
+文件格式（整数均为小端）:
+    文件头  MAGIC（8字节）、压缩方式（1字节）、块大小（4字节）
+    数据    各块的压缩帧，依次排列
+    块索引  每块一条记录: 帧的位置（8字节）、帧的大小、原始大小、CRC32（各4字节）
+    文件尾  块索引的位置、块数、原始总大小（各8字节）、END_MAGIC（8字节）
+
+块索引记录了每块的位置，读取任意一段内容只需解压覆盖它的块（BlockReader）。
+本模块不依赖Qt。
+"""
+
+import io
+import os
+import lzma
+import zlib
+import struct
+import bisect
+import hashlib
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from src.mapped_io import MappedFile, read_pass
+
+# 每块的原始大小
+BLOCK_SIZE = 4 * 1024 * 1024
+# 未压缩文件每次产出的字节数，以及BlockReader的缓冲区大小
+READ_CHUNK_SIZE = 1024 * 1024
+# zlib压缩级别和lzma预设级别
+ZLIB_LEVEL = 6
+LZMA_PRESET = 3
+# 分块压缩的文件在备份目录中的扩展名
+BLOCK_SUFFIX = ".blk"
+
+MAGIC = b"EU4BLK\x00\x01"
+END_MAGIC = b"EU4BLKIX"
+
+_HEADER = struct.Struct("<8sBI")
+_INDEX_RECORD = struct.Struct("<QIII")
+_FOOTER = struct.Struct("<QQQ8s")
+
+# 压缩方式: (文件头中的编号, 压缩函数, 解压函数)
+CODECS = {
+    "zlib": (1, lambda data: zlib.compress(data, ZLIB_LEVEL), zlib.decompress),
+    "lzma": (2, lambda data: lzma.compress(data, preset=LZMA_PRESET), lzma.decompress),
+}
+_CODEC_NAMES = {codec_id: name for name, (codec_id, _, _) in CODECS.items()}
+
+
+def default_workers():
+    """默认的压缩线程数（CPU核数）"""
+    return os.cpu_count() or 1
+
+
+def _ordered_map(func, items, workers):
+    """
+    用线程池对items中的每一项调用func，按原顺序产出结果
+
+    同时提交的任务最多为线程数的两倍，items在产出结果的过程中逐项读取。
+    """
+    if workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="block-codec") as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(func, item))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def is_block_file(path):
+    """判断文件是否是分块压缩的文件"""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+class BlockEncoder:
+    """
+    分块压缩的写入类
+
+    update传入的内容按块交给线程池压缩，压缩好的帧按原顺序写入文件，close时写入
+    块索引。可以与哈希对象一起作为mapped_io.read_pass的使用者，在同一次遍历中
+    压缩和计算校验值。
+
+    参数:
+        dest_path: 压缩文件路径
+        codec: CODECS中的压缩方式
+        workers: 线程数，为None时使用CPU核数
+        block_size: 每块的原始大小
+
+    属性:
+        size: 已写入的原始内容大小
+    """
+
+    def __init__(self, dest_path, codec="zlib", workers=None, block_size=BLOCK_SIZE):
+        codec_id, self._compress, _ = CODECS[codec]
+        self.block_size = block_size
+        self.workers = workers or default_workers()
+        self.size = 0
+        self._index = []
+        self._partial = bytearray()
+        self._pending = deque()
+        self._pool = (
+            ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="block-codec")
+            if self.workers > 1
+            else None
+        )
+        self._file = open(dest_path, "wb")
+        self._file.write(_HEADER.pack(MAGIC, codec_id, block_size))
+        self._offset = _HEADER.size
+
+    def _encode(self, data):
+        return self._compress(data), len(data), zlib.crc32(data)
+
+    def _write(self, frame, size, crc):
+        self._file.write(frame)
+        self._index.append(_INDEX_RECORD.pack(self._offset, len(frame), size, crc))
+        self._offset += len(frame)
+        self.size += size
+
+    def _submit(self, block):
+        if self._pool is None:
+            self._write(*self._encode(block))
+            return
+        self._pending.append(self._pool.submit(self._encode, block))
+        # 同时压缩的块数有上限，超出时先写出最早的一块
+        if len(self._pending) >= self.workers * 2:
+            self._write(*self._pending.popleft().result())
+
+    def update(self, data):
+        """追加内容；整块传入的内容（例如映射的切片）直接交给压缩线程，不复制"""
+        if not self._partial and len(data) == self.block_size:
+            self._submit(data)
+            return
+        self._partial += data
+        while len(self._partial) >= self.block_size:
+            self._submit(bytes(self._partial[: self.block_size]))
+            del self._partial[: self.block_size]
+
+    def close(self):
+        """写出剩余的块和块索引"""
+        if self._partial:
+            self._submit(bytes(self._partial))
+            self._partial.clear()
+        while self._pending:
+            self._write(*self._pending.popleft().result())
+        self._file.write(b"".join(self._index))
+        self._file.write(_FOOTER.pack(self._offset, len(self._index), self.size, END_MAGIC))
+        self._shutdown()
+
+    def _shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # 出错时不写块索引，不完整的文件由调用方删除
+            self._shutdown()
+
+
+def compress_file(src_path, dest_path, codec="zlib", workers=None, block_size=BLOCK_SIZE):
+    """
+    把文件分块并行压缩到dest_path
+
+    参数:
+        src_path: 原文件路径
+        dest_path: 压缩文件路径
+        codec: CODECS中的压缩方式
+        workers: 线程数，为None时使用CPU核数
+        block_size: 每块的原始大小
+
+    返回:
+        原文件的大小（字节）
+    """
+    with MappedFile(src_path) as source, BlockEncoder(
+        dest_path, codec, workers, block_size
+    ) as encoder:
+        read_pass(source, [encoder], block_size)
+    return encoder.size
+
+
+class BlockFile:
+    """
+    分块压缩文件的读取类
+
+    参数:
+        path: 分块压缩的文件路径
+
+    异常:
+        不是分块压缩的文件或文件不完整时抛出ValueError
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._lock = threading.Lock()
+        try:
+            self._read_index()
+        except Exception:
+            self._file.close()
+            raise
+
+    def _read_index(self):
+        magic, codec_id, self.block_size = _HEADER.unpack(self._file.read(_HEADER.size))
+        if magic != MAGIC or codec_id not in _CODEC_NAMES:
+            raise ValueError(f"不是分块压缩的文件: {self.path}")
+        self.codec = _CODEC_NAMES[codec_id]
+
+        self._file.seek(0, os.SEEK_END)
+        if self._file.tell() < _HEADER.size + _FOOTER.size:
+            raise ValueError(f"分块压缩的文件不完整: {self.path}")
+        self._file.seek(-_FOOTER.size, os.SEEK_END)
+        index_offset, count, self.size, end_magic = _FOOTER.unpack(
+            self._file.read(_FOOTER.size)
+        )
+        if end_magic != END_MAGIC:
+            raise ValueError(f"分块压缩的文件不完整: {self.path}")
+
+        self._file.seek(index_offset)
+        data = self._file.read(count * _INDEX_RECORD.size)
+        if len(data) != count * _INDEX_RECORD.size:
+            raise ValueError(f"分块压缩的文件不完整: {self.path}")
+        self.blocks = list(_INDEX_RECORD.iter_unpack(data))
+
+        # 每块在原文件中的起始位置
+        self.starts = []
+        position = 0
+        for _, _, size, _ in self.blocks:
+            self.starts.append(position)
+            position += size
+        if position != self.size:
+            raise ValueError(f"分块压缩文件的块索引损坏: {self.path}")
+
+    def _read_frame(self, index):
+        offset, stored, _, _ = self.blocks[index]
+        with self._lock:
+            self._file.seek(offset)
+            frame = self._file.read(stored)
+        return index, frame
+
+    def _decode(self, item):
+        index, frame = item
+        _, _, size, crc = self.blocks[index]
+        try:
+            data = CODECS[self.codec][2](frame)
+        except (zlib.error, lzma.LZMAError) as e:
+            raise ValueError(f"分块压缩的文件已损坏（第{index}块）: {e}") from e
+        if len(data) != size or zlib.crc32(data) != crc:
+            raise ValueError(f"分块压缩的文件已损坏（第{index}块）: {self.path}")
+        return data
+
+    def read_block(self, index):
+        """解压并校验第index块"""
+        return self._decode(self._read_frame(index))
+
+    def block_at(self, position):
+        """包含原文件中position处内容的块号"""
+        return bisect.bisect_right(self.starts, position) - 1
+
+    def iter_blocks(self, start=0, workers=None):
+        """从第start块开始按顺序产出各块的原始内容，各块由线程池并行解压"""
+        frames = (self._read_frame(index) for index in range(start, len(self.blocks)))
+        return _ordered_map(self._decode, frames, workers or default_workers())
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class BlockReader(io.RawIOBase):
+    """
+    按原文件位置随机读取分块压缩文件的流
+
+    只解压被读取的块，并缓存最近读取的一块。
+
+    参数:
+        path: 分块压缩的文件路径
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self._blocks = BlockFile(path)
+        self._position = 0
+        self._cached_index = None
+        self._cached = b""
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += self._blocks.size
+        if offset < 0:
+            raise ValueError(f"无效的读取位置: {offset}")
+        self._position = offset
+        return offset
+
+    def readinto(self, buffer):
+        if self._position >= self._blocks.size:
+            return 0
+        index = self._blocks.block_at(self._position)
+        if index != self._cached_index:
+            self._cached = self._blocks.read_block(index)
+            self._cached_index = index
+        start = self._position - self._blocks.starts[index]
+        count = min(len(buffer), len(self._cached) - start)
+        buffer[:count] = memoryview(self._cached)[start : start + count]
+        self._position += count
+        return count
+
+    def close(self):
+        if not self.closed:
+            self._blocks.close()
+        super().close()
+
+
+def open_block_file(path):
+    """打开分块压缩的文件，返回带缓冲、可以seek的二进制流"""
+    return io.BufferedReader(BlockReader(path), buffer_size=READ_CHUNK_SIZE)
+
+
+def open_stored(path):
+    """打开备份中的文件，分块压缩的文件按原始内容读取"""
+    if is_block_file(path):
+        return open_block_file(path)
+    return open(path, "rb")
+
+
+def iter_chunks(path, workers=None):
+    """
+    按顺序产出文件的原始内容
+
+    分块压缩的文件由线程池并行解压（损坏时抛出ValueError），其他文件映射到内存后
+    产出不复制数据的memoryview切片（见mapped_io），使用者不能在迭代之后继续持有。
+    """
+    if is_block_file(path):
+        with BlockFile(path) as blocks:
+            yield from blocks.iter_blocks(workers=workers)
+        return
+    with MappedFile(path) as source:
+        for chunk in source.chunks(READ_CHUNK_SIZE):
+            yield chunk
+            # 映射的切片只在本次迭代中有效
+            if isinstance(chunk, memoryview):
+                chunk.release()
+
+
+def decompress_file(src_path, dest_path, workers=None):
+    """
+    把分块压缩的文件并行解压到dest_path
+
+    返回:
+        解压内容的SHA-256（调用方与记录的校验值比较）
+
+    异常:
+        文件损坏时抛出ValueError（dest_path中可能留下不完整的文件，由调用方删除）
+    """
+    digest = hashlib.sha256()
+    with open(dest_path, "wb") as dst:
+        for data in iter_chunks(src_path, workers):
+            digest.update(data)
+            dst.write(data)
+    return digest.hexdigest()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+战役识别模块
+
+玩家经常重命名存档或使用"另存为"，同一个战役的备份会分散在多个存档名下；
+反过来autosave之类的存档名又会被多个战役共用。因此备份除了按存档名索引外，
+还根据存档中解析出的战役信息归入战役：
+
+1. 存档中有campaign_id时直接使用；
+2. 否则使用 玩家国家@开局日期；
+3. 都无法解析（例如二进制存档）时退回到存档名。
+
+CampaignIndex 在备份索引之上维护一层按战役和备份ID的字典，按战役查找备份
+和按ID查找备份都不需要遍历所有存档名。它同时按存档和战役累计备份占用的空间
+（来自索引条目中的size），统计磁盘占用时不需要遍历备份目录。
+"""
+
+# 从存档开头读取的战役相关字段
+CAMPAIGN_FIELDS = ("date", "player", "campaign_id", "start_date")
+
+
+def campaign_key(header, save_name):
+    """
+    根据存档开头的字段确定战役标识
+
+    参数:
+        header: read_header的返回值
+        save_name: 存档名称(不含扩展名)，无法识别战役时使用
+
+    返回:
+        战役标识字符串
+    """
+    campaign_id = str(header.get("campaign_id", "")).strip()
+    if campaign_id:
+        return campaign_id
+    player = str(header.get("player", "")).strip()
+    start_date = str(header.get("start_date", "")).strip()
+    if player and start_date:
+        return f"{player}@{start_date}"
+    return f"save:{save_name}"
+
+
+class CampaignIndex:
+    """
+    战役索引类
+
+    参数:
+        backup_index: {存档名称: [索引条目]}，条目中的campaign字段为战役标识，
+            没有该字段的条目按存档名归类
+    """
+
+    def __init__(self, backup_index=None):
+        # 战役 -> {备份ID: (存档名称, 索引条目)}
+        self._campaigns = {}
+        # 备份ID -> (存档名称, 战役)
+        self._owners = {}
+        # 占用空间（字节）
+        self.total_bytes = 0
+        self.save_bytes = {}
+        self.campaign_bytes = {}
+
+        for save_name, backups in (backup_index or {}).items():
+            for entry in backups:
+                self.add(save_name, entry)
+
+    def __len__(self):
+        return len(self._campaigns)
+
+    @staticmethod
+    def campaign_of(save_name, entry):
+        """获取索引条目所属的战役"""
+        return entry.get("campaign") or f"save:{save_name}"
+
+    def add(self, save_name, entry):
+        """登记一个备份"""
+        campaign = self.campaign_of(save_name, entry)
+        self._campaigns.setdefault(campaign, {})[entry["id"]] = (save_name, entry)
+        self._owners[entry["id"]] = (save_name, campaign)
+        self._count_bytes(save_name, campaign, entry.get("size", 0))
+
+    def remove(self, backup_id):
+        """注销一个备份，备份不存在时忽略"""
+        owner = self._owners.pop(backup_id, None)
+        if owner is None:
+            return
+        save_name, campaign = owner
+        backups = self._campaigns[campaign]
+        _, entry = backups.pop(backup_id)
+        if not backups:
+            del self._campaigns[campaign]
+        self._count_bytes(save_name, campaign, -entry.get("size", 0))
+
+    def _count_bytes(self, save_name, campaign, size):
+        self.total_bytes += size
+        for usage, key in ((self.save_bytes, save_name), (self.campaign_bytes, campaign)):
+            usage[key] = usage.get(key, 0) + size
+            if usage[key] <= 0:
+                del usage[key]
+
+    def owner(self, backup_id):
+        """
+        查找备份所属的存档和战役
+
+        返回:
+            (存档名称, 战役)，找不到时返回(None, None)
+        """
+        return self._owners.get(backup_id, (None, None))
+
+    def backups(self, campaign):
+        """
+        获取战役的所有备份
+
+        返回:
+            [(存档名称, 索引条目)]，按备份时间从新到旧排序
+        """
+        items = list(self._campaigns.get(campaign, {}).values())
+        items.sort(key=lambda item: item[1]["time"], reverse=True)
+        return items
+
+    def entries(self):
+        """
+        遍历所有备份
+
+        返回:
+            生成器，每项为 (存档名称, 战役, 索引条目)
+        """
+        for campaign, backups in self._campaigns.items():
+            for save_name, entry in backups.values():
+                yield save_name, campaign, entry
+
+    def campaigns(self):
+        """
+        获取所有战役的概况
+
+        返回:
+            列表，每项为 {"campaign", "player", "save_names", "count",
+            "latest_time", "latest_game_date"}，按最近备份时间从新到旧排序
+        """
+        result = []
+        for campaign, backups in self._campaigns.items():
+            latest_name, latest = max(backups.values(), key=lambda item: item[1]["time"])
+            result.append(
+                {
+                    "campaign": campaign,
+                    "player": latest.get("player", ""),
+                    "save_names": sorted({name for name, _ in backups.values()}),
+                    "count": len(backups),
+                    "latest_time": latest["time"],
+                    "latest_game_date": latest.get("game_date", ""),
+                }
+            )
+        result.sort(key=lambda item: item["latest_time"], reverse=True)
+        return result
@@ -0,0 +1,481 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+命令行模块
+
+提供无图形界面的存档备份管理命令，以及长期运行的守护进程模式。
+本模块及其依赖不会导入Qt，以保证命令能够快速启动。
+"""
+
+import os
+import sys
+import argparse
+import logging
+
+from src.config import (
+    setup_logging,
+    create_config_if_not_exists,
+    get_save_files,
+    get_save_roots,
+    format_file_size,
+)
+from src.io_scheduler import checkpoint, enter_background, io_scheduler
+from src.profiling import PROFILE_MODES, profiler
+
+COMMANDS = (
+    "list",
+    "create",
+    "restore",
+    "delete",
+    "trash",
+    "pin",
+    "prune",
+    "verify",
+    "search",
+    "stats",
+    "export",
+    "import",
+    "sync",
+    "diff",
+    "timeline",
+    "campaigns",
+    "daemon",
+)
+
+
+def _get_backup_manager():
+    """延迟导入备份管理器"""
+    from src.backup_manager import BackupManager
+
+    return BackupManager()
+
+
+def _resolve_save_path(save):
+    """将存档名称或路径解析为存档文件路径"""
+    if os.path.isfile(save):
+        return os.path.abspath(save)
+
+    for save_dir in get_save_roots():
+        for name in (save, f"{save}.eu4"):
+            path = os.path.join(save_dir, name)
+            if os.path.isfile(path):
+                return path
+    return None
+
+
+def _print_backups(backups):
+    for backup in backups:
+        tags = ",".join(backup.get("tags", []))
+        size = format_file_size(backup["size"]) if "size" in backup else "-"
+        print(
+            f"{backup['id']}\t{backup['time']}\t{size}\t"
+            f"{backup.get('description', '')}\t{tags}"
+        )
+
+
+def cmd_list(args):
+    """列出存档或指定存档的备份"""
+    manager = _get_backup_manager()
+
+    if args.save:
+        save_name = os.path.splitext(os.path.basename(args.save))[0]
+        _print_backups(manager.get_backups_for_save(save_name))
+        return 0
+
+    backed_up = {name: len(b) for name, b in manager.backup_index.items()}
+    for save_file in get_save_files():
+        save_name = os.path.splitext(save_file["name"])[0]
+        print(
+            f"{save_file['name']}\t{format_file_size(save_file['size'])}\t"
+            f"{save_file['modified'].strftime('%Y-%m-%d %H:%M:%S')}\t"
+            f"{backed_up.get(save_name, 0)} 个备份"
+        )
+    return 0
+
+
+def cmd_create(args):
+    """创建备份"""
+    save_path = _resolve_save_path(args.save)
+    if not save_path:
+        print(f"找不到存档: {args.save}", file=sys.stderr)
+        return 1
+
+    tags = [tag.strip() for tag in args.tags.split(",") if tag.strip()]
+    manager = _get_backup_manager()
+    backup_id = manager.create_backup(save_path, args.description, tags)
+    if not backup_id:
+        print("创建备份失败，请检查日志获取更多信息。", file=sys.stderr)
+        return 1
+
+    if args.game_date:
+        manager.update_backup_metadata(backup_id, game_date=args.game_date)
+
+    print(backup_id)
+    return 0
+
+
+def cmd_restore(args):
+    """恢复备份"""
+    manager = _get_backup_manager()
+    if not manager.restore_backup(args.backup_id):
+        print("恢复备份失败，请检查日志获取更多信息。", file=sys.stderr)
+        return 1
+    print(f"成功恢复备份: {args.backup_id}")
+    _, safety_id = manager.last_restore
+    if safety_id:
+        print(f"恢复前的存档已保存为备份: {safety_id}")
+    return 0
+
+
+def cmd_delete(args):
+    """删除备份"""
+    result = _get_backup_manager().delete_backups(args.backup_ids)
+    for backup_id, error in result["failed"].items():
+        print(f"删除备份失败: {backup_id}: {error}", file=sys.stderr)
+    return 1 if result["failed"] else 0
+
+
+def cmd_trash(args):
+    """查看回收站，或从回收站恢复备份、清空回收站"""
+    manager = _get_backup_manager()
+
+    if args.restore:
+        result = manager.restore_from_trash(args.restore)
+        for backup_id in result["succeeded"]:
+            print(f"已恢复: {backup_id}")
+        for backup_id, error in result["failed"].items():
+            print(f"恢复备份失败: {backup_id}: {error}", file=sys.stderr)
+        return 1 if result["failed"] else 0
+
+    if args.empty:
+        enter_background()
+        removed = manager.reap_trash(0)
+        print(f"已清空回收站，共删除 {len(removed)} 个备份")
+        return 0
+
+    for backup in manager.get_trash():
+        size = format_file_size(backup.get("size", 0))
+        print(f"{backup['id']}\t{backup['deleted_time']}\t{size}\t{backup['save_name']}")
+    return 0
+
+
+def cmd_pin(args):
+    """固定或取消固定备份"""
+    if not _get_backup_manager().set_pinned(args.backup_ids, not args.off):
+        print("部分备份更新失败，请检查日志获取更多信息。", file=sys.stderr)
+        return 1
+    return 0
+
+
+def cmd_prune(args):
+    """按数量上限清理旧备份"""
+    removed = _get_backup_manager().prune_backups(args.save, args.keep)
+    for backup_id in removed:
+        print(backup_id)
+    print(f"共删除 {len(removed)} 个备份")
+    return 0
+
+
+def cmd_verify(args):
+    """校验备份完整性"""
+    manager = _get_backup_manager()
+    # 校验全部备份属于后台维护任务：降低优先级，游戏正在写入存档时暂停
+    scrub = not args.backup_ids
+    backup_ids = args.backup_ids or [b["id"] for b in manager.get_all_backups()]
+    if scrub:
+        enter_background()
+
+    failed = 0
+    for backup_id in backup_ids:
+        if scrub:
+            checkpoint()
+        ok = manager.verify_backup(backup_id)
+        if not ok:
+            failed += 1
+        print(f"{'正常' if ok else '损坏'}\t{backup_id}")
+
+    print(f"共校验 {len(backup_ids)} 个备份，{failed} 个异常")
+    return 1 if failed else 0
+
+
+def cmd_search(args):
+    """搜索备份"""
+    _print_backups(_get_backup_manager().search_backups(args.keyword))
+    return 0
+
+
+def cmd_stats(args):
+    """显示备份统计信息"""
+    manager = _get_backup_manager()
+    stats = manager.get_stats()
+    for save_name, info in sorted(stats["saves"].items()):
+        print(f"{save_name}\t{info['count']} 个备份\t{format_file_size(info['size'])}")
+    print(
+        f"共 {stats['save_count']} 个存档，{stats['backup_count']} 个备份，"
+        f"占用 {format_file_size(stats['total_size'])}"
+    )
+
+    usage = manager.get_usage()
+    print()
+    for campaign, size in sorted(usage["campaigns"].items(), key=lambda kv: -kv[1]):
+        print(f"{campaign}\t{format_file_size(size)}")
+    quota = format_file_size(usage["quota"]) if usage["quota"] else "不限制"
+    print(f"回收站: {format_file_size(usage['trash'])}")
+    print(f"容量上限: {quota}")
+    return 0
+
+
+def cmd_export(args):
+    """导出备份到归档文件"""
+    exported = _get_backup_manager().export_backups(
+        args.archive, args.backup_ids, args.save
+    )
+    if exported is None:
+        print("导出备份失败，请检查日志获取更多信息。", file=sys.stderr)
+        return 1
+    print(f"共导出 {len(exported)} 个备份")
+    return 0
+
+
+def cmd_import(args):
+    """从归档文件导入备份"""
+    result = _get_backup_manager().import_backups(args.archive)
+    if result is None:
+        print("导入备份失败，请检查日志获取更多信息。", file=sys.stderr)
+        return 1
+
+    for backup_id, error in result["failed"].items():
+        print(f"导入备份失败: {backup_id}: {error}", file=sys.stderr)
+    print(
+        f"导入 {len(result['imported'])} 个备份，"
+        f"跳过 {len(result['skipped'])} 个已存在的备份"
+    )
+    return 1 if result["failed"] else 0
+
+
+def cmd_sync(args):
+    """将备份目录同步到镜像目标"""
+    enter_background()
+    result = _get_backup_manager().sync_to_mirror(
+        args.target, args.jobs, delete=not args.keep_deleted
+    )
+    if result is None:
+        print("同步失败，请检查日志获取更多信息。", file=sys.stderr)
+        return 1
+
+    for rel_path, error in result["failed"].items():
+        print(f"同步失败: {rel_path}: {error}", file=sys.stderr)
+    print(f"上传 {len(result['uploaded'])} 个文件，删除 {len(result['deleted'])} 个文件")
+    return 1 if result["failed"] else 0
+
+
+def cmd_diff(args):
+    """比较两个备份的游戏内容"""
+    from src.save_diff import format_diff
+
+    diff = _get_backup_manager().diff_backups(args.old_backup_id, args.new_backup_id)
+    if diff is None:
+        print("比较备份失败，请检查日志获取更多信息。", file=sys.stderr)
+        return 1
+    print(format_diff(diff))
+    return 0
+
+
+def cmd_timeline(args):
+    """按游戏日期列出存档所属战役的备份，或查找某个日期之前最近的备份"""
+    manager = _get_backup_manager()
+    save_name = os.path.splitext(os.path.basename(args.save))[0]
+    # 没有该存档的备份时把参数当作战役标识
+    campaign = manager.get_campaign_of_save(save_name) or args.save
+    timeline = manager.get_timeline(campaign)
+
+    if args.before:
+        backup = timeline.nearest_before(args.before, branch=args.branch)
+        if backup is None:
+            print(f"{args.before} 之前没有备份", file=sys.stderr)
+            return 1
+        _print_backups([backup])
+        return 0
+
+    span = timeline.date_span()
+    if span is None:
+        print("没有带游戏日期的备份")
+        return 0
+    for branch, backup in timeline.range(span[0], span[1], branch=args.branch):
+        print(f"{backup['game_date']}\t分支{branch}\t{backup['id']}")
+    return 0
+
+
+def cmd_campaigns(args):
+    """列出所有战役，或指定战役的备份（包括重命名前后的存档）"""
+    manager = _get_backup_manager()
+
+    if args.campaign:
+        backups = manager.get_backups_for_campaign(args.campaign)
+        if not backups:
+            print(f"找不到战役: {args.campaign}", file=sys.stderr)
+            return 1
+        for backup in backups:
+            print(
+                f"{backup['id']}\t{backup['time']}\t{backup.get('game_date', '')}\t"
+                f"{backup['save_name']}"
+            )
+        return 0
+
+    for campaign in manager.get_campaigns():
+        print(
+            f"{campaign['campaign']}\t{campaign['player'] or '-'}\t"
+            f"{campaign['count']} 个备份\t{campaign['latest_game_date'] or '-'}\t"
+            f"{', '.join(campaign['save_names'])}"
+        )
+    return 0
+
+
+def cmd_daemon(args):
+    """运行自动备份守护进程"""
+    from src.daemon import BackupDaemon
+
+    BackupDaemon(
+        poll_seconds=args.poll,
+        settle_seconds=args.settle,
+        metrics_port=args.metrics_port,
+    ).run()
+    return 0
+
+
+def build_parser():
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(
+        prog="main.py", description="欧陆风云IV 存档管理器命令行工具"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    p = subparsers.add_parser("list", help="列出存档，或指定存档的所有备份")
+    p.add_argument("save", nargs="?", help="存档名称")
+    p.set_defaults(func=cmd_list)
+
+    p = subparsers.add_parser("create", help="创建备份")
+    p.add_argument("save", help="存档名称或存档文件路径")
+    p.add_argument("-d", "--description", default="", help="备份描述")
+    p.add_argument("-t", "--tags", default="", help="标签，用逗号分隔")
+    p.add_argument("-g", "--game-date", default="", help="游戏内日期，例如 1456.8.15")
+    p.set_defaults(func=cmd_create)
+
+    p = subparsers.add_parser("restore", help="恢复备份")
+    p.add_argument("backup_id", help="备份ID")
+    p.set_defaults(func=cmd_restore)
+
+    p = subparsers.add_parser("delete", help="删除备份")
+    p.add_argument("backup_ids", nargs="+", help="备份ID")
+    p.set_defaults(func=cmd_delete)
+
+    p = subparsers.add_parser("trash", help="查看或管理回收站中已删除的备份")
+    group = p.add_mutually_exclusive_group()
+    group.add_argument("--restore", nargs="+", metavar="备份ID", help="从回收站恢复备份")
+    group.add_argument("--empty", action="store_true", help="清空回收站")
+    p.set_defaults(func=cmd_trash)
+
+    p = subparsers.add_parser("pin", help="固定备份，固定的备份不会因为容量上限被清理")
+    p.add_argument("backup_ids", nargs="+", help="备份ID")
+    p.add_argument("--off", action="store_true", help="取消固定")
+    p.set_defaults(func=cmd_pin)
+
+    p = subparsers.add_parser("prune", help="按数量上限清理旧备份")
+    p.add_argument("save", nargs="?", help="存档名称，默认清理所有存档")
+    p.add_argument("-k", "--keep", type=int, help="每个存档保留的备份数")
+    p.set_defaults(func=cmd_prune)
+
+    p = subparsers.add_parser("verify", help="校验备份完整性")
+    p.add_argument("backup_ids", nargs="*", help="备份ID，默认校验所有备份")
+    p.set_defaults(func=cmd_verify)
+
+    p = subparsers.add_parser("search", help="按关键字搜索备份")
+    p.add_argument("keyword", help="关键字")
+    p.set_defaults(func=cmd_search)
+
+    p = subparsers.add_parser("stats", help="显示备份统计信息")
+    p.set_defaults(func=cmd_stats)
+
+    p = subparsers.add_parser("export", help="导出备份到归档文件")
+    p.add_argument("archive", help="归档文件路径")
+    p.add_argument("backup_ids", nargs="*", help="备份ID")
+    p.add_argument(
+        "-s", "--save", action="append", default=[], help="导出该存档的全部备份"
+    )
+    p.set_defaults(func=cmd_export)
+
+    p = subparsers.add_parser("import", help="从归档文件导入备份")
+    p.add_argument("archive", help="归档文件路径")
+    p.set_defaults(func=cmd_import)
+
+    p = subparsers.add_parser("sync", help="将备份目录增量同步到镜像目标")
+    p.add_argument("target", nargs="?", help="同步目标，默认使用配置中的sync_target")
+    p.add_argument("-j", "--jobs", type=int, help="并行上传数")
+    p.add_argument(
+        "--keep-deleted", action="store_true", help="不删除目标上已被本地删除的备份"
+    )
+    p.set_defaults(func=cmd_sync)
+
+    p = subparsers.add_parser("diff", help="比较两个备份的游戏内容")
+    p.add_argument("old_backup_id", help="较早的备份ID")
+    p.add_argument("new_backup_id", help="较新的备份ID")
+    p.set_defaults(func=cmd_diff)
+
+    p = subparsers.add_parser("timeline", help="按游戏日期列出存档所属战役的备份")
+    p.add_argument("save", help="存档名称或战役标识")
+    p.add_argument("--before", help="查找该游戏日期之前最近的备份，例如 1650.3.1")
+    p.add_argument("--branch", type=int, help="只查找该分支（及其分叉前的历史）")
+    p.set_defaults(func=cmd_timeline)
+
+    p = subparsers.add_parser("campaigns", help="列出战役及其备份")
+    p.add_argument("campaign", nargs="?", help="战役标识，省略时列出所有战役")
+    p.set_defaults(func=cmd_campaigns)
+
+    p = subparsers.add_parser("daemon", help="运行自动备份守护进程")
+    p.add_argument("--poll", type=float, default=10, help="轮询间隔（秒）")
+    p.add_argument("--settle", type=float, default=5, help="存档写入稳定时间（秒）")
+    p.add_argument(
+        "--metrics-port",
+        type=int,
+        help="在该端口通过HTTP提供运行指标（/metrics 和 /metrics.json）",
+    )
+    p.set_defaults(func=cmd_daemon)
+
+    for p in subparsers.choices.values():
+        p.add_argument("--metrics-out", metavar="文件", help="命令结束后把运行指标写入JSON文件")
+        p.add_argument(
+            "--profile",
+            choices=PROFILE_MODES,
+            help="对各项操作做性能分析，结果保存在logs/profiles目录",
+        )
+
+    return parser
+
+
+def main(argv=None):
+    """命令行入口"""
+    args = build_parser().parse_args(argv)
+
+    setup_logging()
+    create_config_if_not_exists()
+
+    if args.profile:
+        profiler.configure(args.profile)
+    else:
+        profiler.watch_config()
+
+    try:
+        return args.func(args)
+    except KeyboardInterrupt:
+        return 130
+    except Exception as e:
+        logging.error(f"命令执行失败: {e}")
+        return 1
+    finally:
+        # 等待后台清理完成；游戏正在写入存档时不等待，避免命令行迟迟不退出
+        io_scheduler.shutdown()
+        if args.metrics_out:
+            from src.metrics import metrics
+
+            metrics.write_json(args.metrics_out)
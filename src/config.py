@@ -7,10 +7,16 @@
 
 import os
 import json
+import time
+import queue
+import weakref
 import logging
+import threading
 from pathlib import Path
 from datetime import datetime
 
+from src.metrics import metrics
+
 # 应用目录
 APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 RESOURCES_DIR = os.path.join(APP_DIR, "resources")
@@ -24,6 +30,7 @@ EU4_SAVE_DIR = os.path.join(
     "save games",
 )
 BACKUP_DIR = os.path.join(APP_DIR, "backups")
+LOG_DIR = os.path.join(APP_DIR, "logs")
 
 # 配置文件路径
 CONFIG_FILE = os.path.join(APP_DIR, "config.json")
@@ -31,35 +38,105 @@ CONFIG_FILE = os.path.join(APP_DIR, "config.json")
 # 默认配置
 DEFAULT_CONFIG = {
     "eu4_save_dir": EU4_SAVE_DIR,
+    "extra_save_dirs": [],  # 其他存档目录（其他配置、网络共享等），与存档目录一起扫描
+    "save_scan_timeout": 10,  # 扫描单个存档目录的超时时间（秒）
     "backup_dir": BACKUP_DIR,
+    "auto_backup": True,  # 图形界面运行时自动备份发生变化的存档
     "auto_backup_interval": 30,  # 自动备份间隔（分钟）
-    "max_backups_per_save": 10,  # 每个存档最多保留的备份数
+    "auto_backup_game_months": 0,  # 游戏日期每前进这么多个月也自动备份，0表示不按游戏内时间备份
+    "backup_coalesce_seconds": 20,  # 存档变化后等待的秒数，期间同一战役的多次写入只备份一次
+    "save_schedules": {},  # 按存档名覆盖调度设置: {存档名: {"interval", "game_months", "priority"}}
+    "max_backups_per_save": 10,  # 每个战役最多保留的备份数
     "theme": "dark",
     "first_run": True,
+    "sync_target": "",  # 备份同步目标（目录路径），为空表示不同步
+    "sync_concurrency": 4,  # 同步时的并行上传数
+    "trash_quota_mb": 2048,  # 回收站容量（MB），超出后最早删除的备份被真正删除
+    "storage_quota_mb": 0,  # 所有备份的总容量上限（MB），0表示不限制
+    "normalize_zip_saves": False,  # zip压缩存档解压后按条目分别保存，便于去重和增量同步
+    "backup_compression": "none",  # 备份的分块并行压缩方式: none、zlib、lzma（zip存档不再压缩）
+    "compression_workers": 0,  # 分块压缩和解压的线程数，0表示按CPU核数
+    "background_io_yield": True,  # 维护任务降低CPU和I/O优先级，游戏写入存档时暂停
+    "background_io_quiet_seconds": 10,  # 游戏最后一次写入存档后等待多少秒再继续维护任务
+    "profiling": "off",  # 性能分析（调试用，不在设置中显示）: off、cpu、memory、all
+    "profiling_sample_every": 1,  # 每个操作每几次调用做一次性能分析
+    "log_max_mb": 10,  # 单个日志文件的大小上限（MB），超出或跨天时轮换并压缩
+    "log_backup_count": 10,  # 保留的旧日志文件数
+    "log_format": "text",  # 日志文件格式: text 或 json（每行一个JSON对象）
+}
+
+# 配置项校验规则
+CONFIG_SCHEMA = {
+    "eu4_save_dir": {"type": str},
+    "extra_save_dirs": {"type": list, "items": str},
+    "save_scan_timeout": {"type": int, "min": 1},
+    "backup_dir": {"type": str},
+    "auto_backup": {"type": bool},
+    "auto_backup_interval": {"type": int, "min": 1},
+    "auto_backup_game_months": {"type": int, "min": 0},
+    "backup_coalesce_seconds": {"type": int, "min": 0},
+    "save_schedules": {"type": dict},
+    "max_backups_per_save": {"type": int, "min": 1},
+    "theme": {"type": str, "choices": ("dark", "light")},
+    "first_run": {"type": bool},
+    "sync_target": {"type": str},
+    "sync_concurrency": {"type": int, "min": 1},
+    "trash_quota_mb": {"type": int, "min": 0},
+    "storage_quota_mb": {"type": int, "min": 0},
+    "normalize_zip_saves": {"type": bool},
+    "backup_compression": {"type": str, "choices": ("none", "zlib", "lzma")},
+    "compression_workers": {"type": int, "min": 0},
+    "background_io_yield": {"type": bool},
+    "background_io_quiet_seconds": {"type": int, "min": 0},
+    "profiling": {"type": str, "choices": ("off", "cpu", "memory", "all")},
+    "profiling_sample_every": {"type": int, "min": 1},
+    "log_max_mb": {"type": int, "min": 1},
+    "log_backup_count": {"type": int, "min": 1},
+    "log_format": {"type": str, "choices": ("text", "json")},
 }
 
 
+_log_pipeline = None
+
+
 def setup_logging():
-    """设置日志系统"""
-    os.makedirs("logs", exist_ok=True)
-
-    log_file = os.path.join("logs", f'app_{datetime.now().strftime("%Y%m%d")}.log')
-
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        handlers=[
-            logging.FileHandler(log_file, encoding="utf-8"),
-            logging.StreamHandler(),
-        ],
+    """
+    设置日志系统
+
+    日志写入应用目录下的logs目录。日志调用只把记录放入队列，
+    写文件和输出到控制台在后台线程中进行，重复调用时不会重复设置。
+    """
+    global _log_pipeline
+    if _log_pipeline is not None:
+        return
+
+    from src.log_handlers import create_pipeline
+
+    # 配置文件还不存在时使用默认设置，避免在日志系统设置好之前创建配置文件
+    config = DEFAULT_CONFIG
+    if os.path.exists(CONFIG_FILE):
+        config = get_config_service().get()
+
+    _log_pipeline = create_pipeline(
+        LOG_DIR,
+        max_bytes=config["log_max_mb"] * 1024 * 1024,
+        backup_count=config["log_backup_count"],
+        json_format=config["log_format"] == "json",
     )
+    _log_pipeline.start()
+
+
+def shutdown_logging():
+    """输出剩余的日志并停止日志线程"""
+    if _log_pipeline is not None:
+        _log_pipeline.stop()
 
 
 def create_config_if_not_exists():
     """如果配置文件不存在，则创建默认配置"""
     if not os.path.exists(CONFIG_FILE):
         os.makedirs(BACKUP_DIR, exist_ok=True)
-        os.makedirs(os.path.join(APP_DIR, "logs"), exist_ok=True)
+        os.makedirs(LOG_DIR, exist_ok=True)
 
         with open(CONFIG_FILE, "w", encoding="utf-8") as f:
             json.dump(DEFAULT_CONFIG, f, ensure_ascii=False, indent=4)
@@ -69,57 +146,340 @@ def create_config_if_not_exists():
         logging.info(f"配置文件已存在: {CONFIG_FILE}")
 
 
-def get_config():
-    """获取配置"""
-    if not os.path.exists(CONFIG_FILE):
-        create_config_if_not_exists()
+def validate_config(config):
+    """
+    按CONFIG_SCHEMA校验配置
 
-    try:
-        with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-            config = json.load(f)
-            # 确保所有默认配置项都存在
-            for key, value in DEFAULT_CONFIG.items():
-                if key not in config:
-                    config[key] = value
-            return config
-    except Exception as e:
-        logging.error(f"读取配置文件失败: {e}")
-        return DEFAULT_CONFIG
+    参数:
+        config: 配置字典
+
+    返回:
+        (校验后的配置, 错误信息列表)。缺失或不合法的配置项会被替换为默认值，
+        未在规则中声明的配置项原样保留
+    """
+    result = dict(config)
+    errors = []
+    for key, rule in CONFIG_SCHEMA.items():
+        if key not in result:
+            result[key] = DEFAULT_CONFIG[key]
+            continue
+
+        value = result[key]
+        expected = rule["type"]
+        # bool是int的子类，需要单独排除
+        if not isinstance(value, expected) or (
+            expected is int and isinstance(value, bool)
+        ):
+            errors.append(f"{key} 应为 {expected.__name__} 类型: {value!r}")
+        elif "min" in rule and value < rule["min"]:
+            errors.append(f"{key} 不能小于 {rule['min']}: {value!r}")
+        elif "choices" in rule and value not in rule["choices"]:
+            errors.append(f"{key} 只能是 {', '.join(rule['choices'])} 之一: {value!r}")
+        elif "items" in rule and not all(isinstance(item, rule["items"]) for item in value):
+            errors.append(f"{key} 的元素应为 {rule['items'].__name__} 类型: {value!r}")
+        else:
+            continue
+
+        result[key] = DEFAULT_CONFIG[key]
+    return result, errors
+
+
+class ConfigService:
+    """
+    配置服务类
+
+    配置文件只在首次使用和文件被修改后读取，之后都从缓存返回。
+    通过subscribe注册的回调会在配置变化时收到变化的配置项，
+    回调参数为 {配置项: (旧值, 新值)}。
+    """
+
+    def __init__(self, config_file=CONFIG_FILE):
+        self.config_file = config_file
+        self._config = None
+        self._mtime = None
+        self._subscribers = []
+        self._lock = threading.RLock()
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.config_file).st_mtime_ns
+        except OSError:
+            return None
+
+    def _read(self):
+        """从磁盘读取并校验配置"""
+        if not os.path.exists(self.config_file):
+            create_config_if_not_exists()
+
+        mtime = self._file_mtime()
+        try:
+            with open(self.config_file, "r", encoding="utf-8") as f:
+                config = json.load(f)
+        except Exception as e:
+            logging.error(f"读取配置文件失败: {e}")
+            config = {}
+
+        config, errors = validate_config(config)
+        for error in errors:
+            logging.warning(f"配置项不合法，已使用默认值: {error}")
+        return config, mtime
+
+    def get(self):
+        """获取当前配置（共享对象，调用方不应修改）"""
+        with self._lock:
+            if self._config is None:
+                self._config, self._mtime = self._read()
+            elif self._file_mtime() != self._mtime:
+                # 配置文件被外部修改，重新加载
+                config, self._mtime = self._read()
+                self._apply(config)
+            return self._config
+
+    def update(self, config):
+        """
+        更新并保存配置
+
+        参数:
+            config: 新的配置（可以只包含要修改的配置项）
+
+        返回:
+            成功返回True，失败返回False
+        """
+        with self._lock:
+            new_config = dict(self.get())
+            new_config.update(config)
+
+            new_config, errors = validate_config(new_config)
+            if errors:
+                for error in errors:
+                    logging.error(f"配置项不合法: {error}")
+                return False
+
+            try:
+                with open(self.config_file, "w", encoding="utf-8") as f:
+                    json.dump(new_config, f, ensure_ascii=False, indent=4)
+            except Exception as e:
+                logging.error(f"保存配置文件失败: {e}")
+                return False
+
+            self._mtime = self._file_mtime()
+            self._apply(new_config)
+            return True
+
+    def _apply(self, config):
+        """替换缓存的配置并通知订阅者"""
+        old_config = self._config or {}
+        changes = {
+            key: (old_config.get(key), value)
+            for key, value in config.items()
+            if old_config.get(key) != value
+        }
+        self._config = config
+        if changes:
+            logging.info(f"配置已更新: {', '.join(changes)}")
+            self._notify(changes)
+
+    def subscribe(self, callback):
+        """
+        订阅配置变化
+
+        绑定方法以弱引用保存，对象被回收后自动取消订阅
+        """
+        with self._lock:
+            if hasattr(callback, "__self__"):
+                self._subscribers.append(weakref.WeakMethod(callback))
+            else:
+                self._subscribers.append(lambda: callback)
+
+    def unsubscribe(self, callback):
+        """取消订阅配置变化"""
+        with self._lock:
+            self._subscribers = [
+                ref for ref in self._subscribers if ref() not in (None, callback)
+            ]
+
+    def _notify(self, changes):
+        alive = []
+        for ref in self._subscribers:
+            callback = ref()
+            if callback is None:
+                continue
+            alive.append(ref)
+            try:
+                callback(changes)
+            except Exception as e:
+                logging.error(f"处理配置变化失败: {e}")
+        self._subscribers = alive
+
+
+_config_service = None
+_config_service_lock = threading.Lock()
+
+
+def get_config_service():
+    """获取全局共享的配置服务"""
+    global _config_service
+    with _config_service_lock:
+        if _config_service is None:
+            _config_service = ConfigService()
+        return _config_service
+
+
+def get_config():
+    """获取配置（返回副本，修改后需要调用save_config保存）"""
+    return dict(get_config_service().get())
 
 
 def save_config(config):
     """保存配置"""
+    return get_config_service().update(config)
+
+
+# 正在扫描的目录: 目录 -> 等待该目录结果的队列列表，同一目录同时只有一个扫描线程
+_scans_in_flight = {}
+_scans_lock = threading.Lock()
+
+
+def get_save_roots(config=None):
+    """
+    获取所有存档目录
+
+    返回:
+        存档目录列表，第一个为主存档目录(eu4_save_dir)，重复的目录只保留一个
+    """
+    config = config or get_config_service().get()
+    roots = []
+    seen = set()
+    for root in [config["eu4_save_dir"]] + list(config.get("extra_save_dirs", [])):
+        key = os.path.normcase(os.path.abspath(root)) if root else ""
+        if key and key not in seen:
+            seen.add(key)
+            roots.append(root)
+    return roots
+
+
+def _scan_save_dir(save_dir):
+    """
+    扫描一个存档目录
+
+    返回:
+        (目录, 存档列表, 错误信息)，成功时错误信息为None
+    """
     try:
-        with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-            json.dump(config, f, ensure_ascii=False, indent=4)
-        return True
+        if not os.path.exists(save_dir):
+            logging.error(f"存档目录不存在: {save_dir}")
+            return save_dir, [], "目录不存在"
+
+        save_files = []
+        with os.scandir(save_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".eu4"):
+                    continue
+                stat = entry.stat()
+                save_files.append(
+                    {
+                        "name": entry.name,
+                        "path": entry.path,
+                        "size": stat.st_size,
+                        "modified": datetime.fromtimestamp(stat.st_mtime),
+                        "source": save_dir,
+                    }
+                )
+        return save_dir, save_files, None
     except Exception as e:
-        logging.error(f"保存配置文件失败: {e}")
-        return False
+        logging.error(f"扫描存档目录失败: {save_dir}: {e}")
+        return save_dir, [], str(e)
+
+
+def _run_scan(save_dir):
+    """扫描线程：把结果交给所有等待该目录的调用方"""
+    result = (save_dir, [], "扫描失败")
+    try:
+        result = _scan_save_dir(save_dir)
+    finally:
+        with _scans_lock:
+            subscribers = _scans_in_flight.pop(save_dir, [])
+        for results in subscribers:
+            results.put(result)
+
+
+def iter_save_dirs(roots=None, timeout=None):
+    """
+    并行扫描多个存档目录，每扫描完一个目录就返回该目录的结果
+
+    每个目录在单独的线程中扫描，慢的目录（例如网络共享）不影响其他目录的结果。
+    超过timeout仍未完成的目录会被放弃，其线程在后台自行结束，不会阻止程序退出。
+    同一目录的扫描仍在进行时，后来的调用方等待并共用该次扫描的结果。
+
+    参数:
+        roots: 存档目录列表，默认为get_save_roots()
+        timeout: 每个目录的超时时间（秒），默认为配置中的save_scan_timeout
+
+    返回:
+        生成器，每项为 (目录, 存档列表, 错误信息)，成功时错误信息为None，
+        失败或超时时存档列表为空
+    """
+    config = get_config_service().get()
+    roots = get_save_roots(config) if roots is None else roots
+    timeout = config["save_scan_timeout"] if timeout is None else timeout
+
+    results = queue.SimpleQueue()
+    pending = set()
+    for root in roots:
+        # 同一目录已有扫描在进行时（例如界面加载存档列表和自动备份同时扫描），
+        # 等待并共用那次扫描的结果，不重复扫描
+        with _scans_lock:
+            subscribers = _scans_in_flight.get(root)
+            started = subscribers is None
+            if started:
+                subscribers = _scans_in_flight[root] = []
+            subscribers.append(results)
+        pending.add(root)
+        if started:
+            threading.Thread(
+                target=_run_scan, args=(root,), name="save-scan", daemon=True
+            ).start()
+
+    # 所有目录同时开始扫描，因此统一的截止时间就是每个目录的超时时间
+    deadline = time.monotonic() + timeout
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            root, save_files, error = results.get(timeout=remaining)
+        except queue.Empty:
+            break
+        pending.discard(root)
+        yield root, save_files, error
+
+    for root in pending:
+        logging.warning(f"扫描存档目录超时（{timeout} 秒）: {root}")
+        yield root, [], "扫描超时"
 
 
-def get_save_files():
-    """获取EU4存档文件"""
-    config = get_config()
-    save_dir = config["eu4_save_dir"]
+@metrics.timed("scan_seconds")
+def get_save_files(timeout=None, errors=None):
+    """
+    获取所有存档目录中的EU4存档文件
 
-    if not os.path.exists(save_dir):
-        logging.error(f"存档目录不存在: {save_dir}")
-        return []
+    参数:
+        timeout: 每个目录的超时时间（秒），默认为配置中的save_scan_timeout
+        errors: 传入字典时，记录扫描失败或超时的目录: {目录: 错误信息}。
+            这些目录中的存档不在返回的列表中，但不代表已被删除
 
-    # 获取所有.eu4文件
+    返回:
+        存档列表，每项为 {"name", "path", "size", "modified", "source"}，
+        source为存档所在的目录，按最后修改时间排序（最新的在前）。
+        超时或无法读取的目录不计入
+    """
     save_files = []
-    for file in os.listdir(save_dir):
-        if file.endswith(".eu4"):
-            file_path = os.path.join(save_dir, file)
-            save_files.append(
-                {
-                    "name": file,
-                    "path": file_path,
-                    "size": os.path.getsize(file_path),
-                    "modified": datetime.fromtimestamp(os.path.getmtime(file_path)),
-                }
-            )
+    for root, files, error in iter_save_dirs(timeout=timeout):
+        if error is not None:
+            logging.warning(f"存档目录的扫描结果不完整: {root}: {error}")
+            if errors is not None:
+                errors[root] = error
+        save_files.extend(files)
 
     # 按最后修改时间排序（最新的在前）
     save_files.sort(key=lambda x: x["modified"], reverse=True)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+后台守护进程模块
+
+监视存档目录，把写入完成的存档交给调度器（见scheduler），按配置的间隔和游戏内
+周期自动备份，游戏正在写入存档时推迟（见io_scheduler）。命令行的daemon子命令
+直接运行，图形界面在后台线程中运行同样的循环。
+本模块及其依赖不会导入Qt。
+"""
+
+import time
+import signal
+import logging
+
+from src.backup_manager import BackupManager
+from src.io_scheduler import IO_NORMAL, should_yield
+from src.metrics import metrics, serve_metrics
+from src.scheduler import BackupScheduler
+from src.watcher import SaveWatcher
+
+
+class BackupDaemon:
+    """
+    自动备份守护进程类
+
+    参数:
+        poll_seconds: 检查存档目录的间隔（秒）
+        settle_seconds: 存档写入稳定时间（秒）
+        backup_manager: 备份管理器，为None时新建
+        metrics_port: 提供运行指标的HTTP端口
+        on_backups: 每轮创建备份后调用，参数为备份ID列表（图形界面用于刷新列表）
+    """
+
+    def __init__(
+        self,
+        poll_seconds=10,
+        settle_seconds=5,
+        backup_manager=None,
+        metrics_port=None,
+        on_backups=None,
+    ):
+        self.backup_manager = backup_manager or BackupManager()
+        self.watcher = SaveWatcher(settle_seconds=settle_seconds)
+        self.scheduler = BackupScheduler(self.backup_manager)
+        self.poll_seconds = poll_seconds
+        self.metrics_port = metrics_port
+        self.on_backups = on_backups
+        self._running = False
+
+    def run_once(self):
+        """
+        执行一轮检查
+
+        把写入完成的存档交给调度器，再备份调度器中已经到期的任务。
+        多个存档同时到期时，不同存档的备份并行创建；游戏正在写入存档时推迟到下一轮。
+
+        返回:
+            本轮创建的备份ID列表
+        """
+        # 其他进程（图形界面、命令行）可能刚创建过备份
+        self.backup_manager.refresh()
+        for save_file in self.watcher.poll():
+            self.scheduler.notify(save_file)
+
+        # 游戏正在写入存档时不开始新的备份，到期的任务留到写入平息后
+        if should_yield(IO_NORMAL):
+            logging.debug("游戏正在写入存档，推迟自动备份")
+            return []
+
+        futures = [
+            self.backup_manager.submit_backup(
+                job["save_file"]["path"], description=job["description"], tags=job["tags"]
+            )
+            for job in self.scheduler.due_jobs()
+        ]
+        backup_ids = [backup_id for backup_id in (f.result() for f in futures) if backup_id]
+        if backup_ids and self.on_backups is not None:
+            self.on_backups(backup_ids)
+        return backup_ids
+
+    def stop(self, *args):
+        """停止守护进程"""
+        self._running = False
+
+    def loop(self):
+        """记录当前存档的状态，然后反复检查，直到调用stop"""
+        self._running = True
+        self.watcher.prime()
+        while self._running:
+            try:
+                with metrics.timer("operation_seconds", op="daemon_poll"):
+                    self.run_once()
+            except Exception as e:
+                logging.error(f"自动备份检查失败: {e}")
+
+            # 分段睡眠，以便及时响应停止信号
+            deadline = time.monotonic() + self.poll_seconds
+            while self._running and time.monotonic() < deadline:
+                time.sleep(min(0.5, self.poll_seconds))
+
+    def run(self):
+        """运行守护进程，直到收到停止信号"""
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        logging.info(f"守护进程已启动，轮询间隔 {self.poll_seconds} 秒")
+
+        metrics_server = None
+        if self.metrics_port is not None:
+            metrics_server = serve_metrics(self.metrics_port)
+
+        self.loop()
+
+        if metrics_server is not None:
+            metrics_server.shutdown()
+        logging.info("守护进程已停止")
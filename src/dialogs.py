@@ -0,0 +1,391 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+对话框模块
+
+对话框只在用户打开时才需要，由主窗口按需导入，以减少启动时的加载量。
+"""
+
+from PySide6.QtWidgets import (
+    QWidget,
+    QVBoxLayout,
+    QHBoxLayout,
+    QPushButton,
+    QLabel,
+    QLineEdit,
+    QTabWidget,
+    QGroupBox,
+    QCheckBox,
+    QComboBox,
+    QSpinBox,
+    QFileDialog,
+    QMessageBox,
+    QDialog,
+    QDialogButtonBox,
+    QFormLayout,
+    QTextEdit,
+    QPlainTextEdit,
+)
+
+from src.config import get_config, save_config
+
+
+class BackupDialog(QDialog):
+    """备份对话框"""
+
+    def __init__(self, parent=None, save_name=""):
+        super().__init__(parent)
+
+        self.setWindowTitle(f"创建备份 - {save_name}")
+        self.setMinimumWidth(400)
+
+        layout = QVBoxLayout(self)
+
+        # 游戏时间
+        game_date_group = QGroupBox("游戏进度")
+        game_date_layout = QVBoxLayout(game_date_group)
+
+        self.game_date_edit = QLineEdit()
+        self.game_date_edit.setPlaceholderText("输入游戏内日期，例如 1456.8.15")
+        game_date_layout.addWidget(self.game_date_edit)
+
+        layout.addWidget(game_date_group)
+
+        # 描述
+        description_group = QGroupBox("备份描述")
+        description_layout = QVBoxLayout(description_group)
+
+        self.description_edit = QTextEdit()
+        self.description_edit.setPlaceholderText("输入备份的描述信息...")
+        description_layout.addWidget(self.description_edit)
+
+        layout.addWidget(description_group)
+
+        # 标签
+        tags_group = QGroupBox("标签")
+        tags_layout = QVBoxLayout(tags_group)
+
+        self.tags_edit = QLineEdit()
+        self.tags_edit.setPlaceholderText("输入标签，用逗号分隔...")
+        tags_layout.addWidget(self.tags_edit)
+
+        layout.addWidget(tags_group)
+
+        # 按钮
+        button_box = QDialogButtonBox(
+            QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel
+        )
+        button_box.accepted.connect(self.accept)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+
+
+class EditBackupDialog(QDialog):
+    """编辑备份对话框"""
+
+    def __init__(self, parent=None, backup_id="", current_desc=""):
+        super().__init__(parent)
+
+        self.setWindowTitle(f"编辑备份信息")
+        self.setMinimumWidth(400)
+
+        layout = QVBoxLayout(self)
+
+        # 显示备份ID
+        id_label = QLabel(f"备份ID: {backup_id}")
+        layout.addWidget(id_label)
+
+        # 游戏日期
+        date_group = QGroupBox("游戏进度")
+        date_layout = QVBoxLayout(date_group)
+
+        self.game_date_edit = QLineEdit()
+        self.game_date_edit.setPlaceholderText("输入游戏内日期，例如 1456.8.15")
+        date_layout.addWidget(self.game_date_edit)
+
+        layout.addWidget(date_group)
+
+        # 描述
+        description_group = QGroupBox("备份描述")
+        description_layout = QVBoxLayout(description_group)
+
+        self.description_edit = QTextEdit()
+        self.description_edit.setPlaceholderText("输入备份的描述信息...")
+        self.description_edit.setText(current_desc)
+        description_layout.addWidget(self.description_edit)
+
+        layout.addWidget(description_group)
+
+        # 标签
+        tags_group = QGroupBox("标签")
+        tags_layout = QVBoxLayout(tags_group)
+
+        self.tags_edit = QLineEdit()
+        self.tags_edit.setPlaceholderText("输入标签，用逗号分隔...")
+        tags_layout.addWidget(self.tags_edit)
+
+        layout.addWidget(tags_group)
+
+        # 按钮
+        button_box = QDialogButtonBox(
+            QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel
+        )
+        button_box.accepted.connect(self.accept)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+
+
+class SettingsDialog(QDialog):
+    """设置对话框"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+        self.config = get_config()
+
+        self.setWindowTitle("设置")
+        self.setMinimumWidth(500)
+
+        layout = QVBoxLayout(self)
+
+        # 创建选项
+        self.tab_widget = QTabWidget()
+        layout.addWidget(self.tab_widget)
+
+        # 常规设置选项
+        self.general_tab = QWidget()
+        self.tab_widget.addTab(self.general_tab, "常规")
+        self.setup_general_tab()
+
+        # 外观选项
+        self.appearance_tab = QWidget()
+        self.tab_widget.addTab(self.appearance_tab, "外观")
+        self.setup_appearance_tab()
+
+        # 按钮
+        button_box = QDialogButtonBox(
+            QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel
+        )
+        button_box.accepted.connect(self.save_settings)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+
+    def setup_general_tab(self):
+        """设置常规选项"""
+        layout = QFormLayout(self.general_tab)
+
+        # 存档目录
+        self.save_dir_edit = QLineEdit(self.config["eu4_save_dir"])
+        self.save_dir_edit.setReadOnly(True)
+        save_dir_layout = QHBoxLayout()
+        save_dir_layout.addWidget(self.save_dir_edit)
+        save_dir_btn = QPushButton("浏览...")
+        save_dir_btn.clicked.connect(self.choose_save_dir)
+        save_dir_layout.addWidget(save_dir_btn)
+        layout.addRow("存档目录:", save_dir_layout)
+
+        # 其他存档目录（每行一个）
+        self.extra_save_dirs_edit = QPlainTextEdit("\n".join(self.config["extra_save_dirs"]))
+        self.extra_save_dirs_edit.setPlaceholderText("其他配置或网络共享中的存档目录，每行一个")
+        self.extra_save_dirs_edit.setMaximumHeight(70)
+        extra_dirs_layout = QVBoxLayout()
+        extra_dirs_layout.addWidget(self.extra_save_dirs_edit)
+        extra_dirs_btn = QPushButton("添加目录...")
+        extra_dirs_btn.clicked.connect(self.add_extra_save_dir)
+        extra_dirs_layout.addWidget(extra_dirs_btn)
+        layout.addRow("其他存档目录:", extra_dirs_layout)
+
+        # 扫描单个存档目录的超时时间
+        self.scan_timeout = QSpinBox()
+        self.scan_timeout.setRange(1, 300)
+        self.scan_timeout.setValue(self.config["save_scan_timeout"])
+        self.scan_timeout.setSuffix(" 秒")
+        layout.addRow("目录扫描超时:", self.scan_timeout)
+
+        # 备份目录
+        self.backup_dir_edit = QLineEdit(self.config["backup_dir"])
+        self.backup_dir_edit.setReadOnly(True)
+        backup_dir_layout = QHBoxLayout()
+        backup_dir_layout.addWidget(self.backup_dir_edit)
+        backup_dir_btn = QPushButton("浏览...")
+        backup_dir_btn.clicked.connect(self.choose_backup_dir)
+        backup_dir_layout.addWidget(backup_dir_btn)
+        layout.addRow("备份目录:", backup_dir_layout)
+
+        # 自动备份
+        self.auto_backup = QCheckBox("运行时自动备份发生变化的存档")
+        self.auto_backup.setChecked(self.config["auto_backup"])
+        layout.addRow("自动备份:", self.auto_backup)
+
+        # 自动备份间隔
+        self.backup_interval = QSpinBox()
+        self.backup_interval.setRange(5, 120)
+        self.backup_interval.setValue(self.config["auto_backup_interval"])
+        self.backup_interval.setSuffix(" 分钟")
+        layout.addRow("自动备份间隔:", self.backup_interval)
+
+        # 按游戏内时间自动备份（以月为单位保存，整年时按年显示）
+        game_months = self.config["auto_backup_game_months"]
+        self.game_interval = QSpinBox()
+        self.game_interval.setRange(0, 1200)
+        self.game_interval.setSpecialValueText("不启用")
+        self.game_interval_unit = QComboBox()
+        self.game_interval_unit.addItem("个月", 1)
+        self.game_interval_unit.addItem("年", 12)
+        if game_months and game_months % 12 == 0:
+            self.game_interval_unit.setCurrentIndex(1)
+            game_months //= 12
+        self.game_interval.setValue(game_months)
+        game_interval_layout = QHBoxLayout()
+        game_interval_layout.addWidget(self.game_interval)
+        game_interval_layout.addWidget(self.game_interval_unit)
+        layout.addRow("游戏内每隔:", game_interval_layout)
+
+        # 每个战役最大备份数（同一战役的多个存档名共用上限）
+        self.max_backups = QSpinBox()
+        self.max_backups.setRange(1, 100)
+        self.max_backups.setValue(self.config["max_backups_per_save"])
+        layout.addRow("每个战役最大备份数:", self.max_backups)
+
+        # 回收站容量
+        self.trash_quota = QSpinBox()
+        self.trash_quota.setRange(0, 100000)
+        self.trash_quota.setValue(self.config["trash_quota_mb"])
+        self.trash_quota.setSuffix(" MB")
+        layout.addRow("回收站容量:", self.trash_quota)
+
+        # 备份总容量上限
+        self.storage_quota = QSpinBox()
+        self.storage_quota.setRange(0, 10000000)
+        self.storage_quota.setValue(self.config["storage_quota_mb"])
+        self.storage_quota.setSuffix(" MB")
+        self.storage_quota.setSpecialValueText("不限制")
+        layout.addRow("备份总容量上限:", self.storage_quota)
+
+        # zip存档的存储方式
+        self.normalize_zip = QCheckBox("解压保存压缩存档（占用更多空间，便于去重和增量同步）")
+        self.normalize_zip.setChecked(self.config["normalize_zip_saves"])
+        layout.addRow("压缩存档:", self.normalize_zip)
+
+        # 备份的存储压缩方式
+        self.backup_compression = QComboBox()
+        for text, value in (
+            ("不压缩", "none"),
+            ("zlib（较快）", "zlib"),
+            ("lzma（压缩率较高）", "lzma"),
+        ):
+            self.backup_compression.addItem(text, value)
+        self.backup_compression.setCurrentIndex(
+            max(0, self.backup_compression.findData(self.config["backup_compression"]))
+        )
+        layout.addRow("备份压缩:", self.backup_compression)
+
+        # 后台维护任务让路给游戏
+        self.background_io_yield = QCheckBox("清理、同步和校验时降低优先级，游戏写入存档时暂停")
+        self.background_io_yield.setChecked(self.config["background_io_yield"])
+        layout.addRow("后台任务:", self.background_io_yield)
+
+    def setup_appearance_tab(self):
+        """设置外观选项"""
+        layout = QVBoxLayout(self.appearance_tab)
+
+        # 主题选择
+        theme_group = QGroupBox("主题")
+        theme_layout = QVBoxLayout(theme_group)
+
+        self.dark_theme_rb = QCheckBox("暗色主题")
+        self.light_theme_rb = QCheckBox("亮色主题")
+
+        self.dark_theme_rb.setChecked(self.config["theme"] == "dark")
+        self.light_theme_rb.setChecked(self.config["theme"] == "light")
+
+        # 互斥选择
+        self.dark_theme_rb.clicked.connect(
+            lambda: self.light_theme_rb.setChecked(not self.dark_theme_rb.isChecked())
+        )
+        self.light_theme_rb.clicked.connect(
+            lambda: self.dark_theme_rb.setChecked(not self.light_theme_rb.isChecked())
+        )
+
+        theme_layout.addWidget(self.dark_theme_rb)
+        theme_layout.addWidget(self.light_theme_rb)
+
+        layout.addWidget(theme_group)
+        layout.addStretch()
+
+    def choose_save_dir(self):
+        """选择存档目录"""
+        directory = QFileDialog.getExistingDirectory(
+            self, "选择存档目录", self.save_dir_edit.text()
+        )
+        if directory:
+            self.save_dir_edit.setText(directory)
+
+    def add_extra_save_dir(self):
+        """添加其他存档目录"""
+        directory = QFileDialog.getExistingDirectory(self, "选择存档目录")
+        if directory:
+            self.extra_save_dirs_edit.appendPlainText(directory)
+
+    def choose_backup_dir(self):
+        """选择备份目录"""
+        directory = QFileDialog.getExistingDirectory(
+            self, "选择备份目录", self.backup_dir_edit.text()
+        )
+        if directory:
+            self.backup_dir_edit.setText(directory)
+
+    def save_settings(self):
+        """保存设置"""
+        self.config["eu4_save_dir"] = self.save_dir_edit.text()
+        self.config["extra_save_dirs"] = [
+            line.strip()
+            for line in self.extra_save_dirs_edit.toPlainText().splitlines()
+            if line.strip()
+        ]
+        self.config["save_scan_timeout"] = self.scan_timeout.value()
+        self.config["backup_dir"] = self.backup_dir_edit.text()
+        self.config["auto_backup"] = self.auto_backup.isChecked()
+        self.config["auto_backup_interval"] = self.backup_interval.value()
+        self.config["auto_backup_game_months"] = (
+            self.game_interval.value() * self.game_interval_unit.currentData()
+        )
+        self.config["max_backups_per_save"] = self.max_backups.value()
+        self.config["trash_quota_mb"] = self.trash_quota.value()
+        self.config["storage_quota_mb"] = self.storage_quota.value()
+        self.config["normalize_zip_saves"] = self.normalize_zip.isChecked()
+        self.config["backup_compression"] = self.backup_compression.currentData()
+        self.config["background_io_yield"] = self.background_io_yield.isChecked()
+
+        if self.dark_theme_rb.isChecked():
+            self.config["theme"] = "dark"
+        else:
+            self.config["theme"] = "light"
+
+        if save_config(self.config):
+            self.accept()
+        else:
+            QMessageBox.critical(self, "错误", "保存设置失败，请检查日志获取更多信息。")
+
+
+class DiffDialog(QDialog):
+    """备份对比结果对话框"""
+
+    def __init__(self, parent=None, title="", text=""):
+        super().__init__(parent)
+
+        self.setWindowTitle(f"备份对比 - {title}")
+        self.setMinimumSize(600, 500)
+
+        layout = QVBoxLayout(self)
+
+        self.result_edit = QTextEdit()
+        self.result_edit.setReadOnly(True)
+        self.result_edit.setPlainText(text)
+        layout.addWidget(self.result_edit)
+
+        # 按钮
+        button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Close)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
@@ -0,0 +1,358 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+后台I/O调度模块
+
+清理回收站、同步、批量校验等维护任务会与游戏争用磁盘，游戏自动存档时可能因此卡顿。
+本模块按优先级类别区别对待各种任务:
+
+- IO_INTERACTIVE: 用户直接发起并等待结果的操作，不受影响；
+- IO_NORMAL: 自动备份，游戏正在写入存档时推迟开始；
+- IO_IDLE: 维护任务，在降低了CPU和I/O优先级的线程中执行，并在每个文件或备份之间
+  调用checkpoint，游戏正在写入存档时暂停，直到写入平息。
+
+判断游戏是否正在写入存档（GameActivity）有两个来源：存档监视器看到正在写入的存档时
+调用note_write；游戏进程在运行时，存档目录中有刚修改过的存档。暂停最长
+MAX_PAUSE_SECONDS秒，维护任务不会一直无法完成。
+
+降低优先级只作用于当前线程：Linux上把I/O优先级设为idle类并把nice值加
+BACKGROUND_NICE（之后由该线程创建的线程会继承），Windows上进入后台处理模式。
+其他系统上不调整。配置中的background_io_yield为False时不降低优先级也不暂停。
+本模块不依赖Qt。
+"""
+
+import os
+import sys
+import time
+import ctypes
+import logging
+import platform
+import threading
+import subprocess
+from collections import deque
+from concurrent.futures import Future
+
+from src.config import get_config_service
+from src.metrics import metrics
+
+# 优先级类别，数值越小越优先
+IO_INTERACTIVE = 0
+IO_NORMAL = 1
+IO_IDLE = 2
+
+# 游戏进程名（小写），Linux原生版本为eu4，Windows和Proton下为eu4.exe
+GAME_PROCESS_NAMES = ("eu4", "eu4.exe")
+# 检查游戏进程和存档目录的结果缓存时间（秒）
+PROCESS_CHECK_SECONDS = 15
+SAVE_PROBE_SECONDS = 2
+# 每次暂停的最长时间（秒）
+MAX_PAUSE_SECONDS = 120
+# 暂停期间检查写入是否平息的间隔（秒）
+PAUSE_POLL_SECONDS = 0.5
+# 后台线程的nice增量
+BACKGROUND_NICE = 10
+
+# Linux ioprio_set的系统调用号和参数
+_IOPRIO_SET_SYSCALLS = {"x86_64": 251, "amd64": 251, "i386": 289, "i686": 289, "aarch64": 30}
+_IOPRIO_WHO_PROCESS = 1
+_IOPRIO_CLASS_IDLE = 3
+_IOPRIO_CLASS_SHIFT = 13
+# Windows SetThreadPriority的后台处理模式
+_THREAD_MODE_BACKGROUND_BEGIN = 0x00010000
+
+_thread_state = threading.local()
+
+
+def _yield_enabled():
+    return get_config_service().get()["background_io_yield"]
+
+
+def _set_linux_ioprio_idle():
+    number = _IOPRIO_SET_SYSCALLS.get(platform.machine().lower())
+    if number is None:
+        return False
+    libc = ctypes.CDLL(None, use_errno=True)
+    result = libc.syscall(
+        number,
+        _IOPRIO_WHO_PROCESS,
+        threading.get_native_id(),
+        _IOPRIO_CLASS_IDLE << _IOPRIO_CLASS_SHIFT,
+    )
+    if result != 0:
+        logging.debug(f"设置I/O优先级失败: {os.strerror(ctypes.get_errno())}")
+    return result == 0
+
+
+def lower_thread_priority():
+    """
+    降低当前线程的CPU和I/O优先级（每个线程只调整一次）
+
+    返回:
+        是否调整成功
+    """
+    if getattr(_thread_state, "lowered", False):
+        return True
+    lowered = False
+    try:
+        if sys.platform.startswith("linux"):
+            tid = threading.get_native_id()
+            # Linux上nice值按线程设置，传入线程ID只影响当前线程
+            nice = os.getpriority(os.PRIO_PROCESS, tid)
+            os.setpriority(os.PRIO_PROCESS, tid, min(19, nice + BACKGROUND_NICE))
+            lowered = _set_linux_ioprio_idle()
+        elif sys.platform == "win32":
+            kernel32 = ctypes.windll.kernel32
+            lowered = bool(
+                kernel32.SetThreadPriority(
+                    kernel32.GetCurrentThread(), _THREAD_MODE_BACKGROUND_BEGIN
+                )
+            )
+    except (OSError, AttributeError) as e:
+        logging.debug(f"降低线程优先级失败: {e}")
+    _thread_state.lowered = True
+    return lowered
+
+
+def enter_background():
+    """把当前线程作为后台维护线程：按配置降低优先级（也可以作为线程池的initializer）"""
+    if _yield_enabled():
+        lower_thread_priority()
+
+
+def _running_process_names():
+    """当前运行的进程名（小写），无法获取时返回空集合"""
+    names = set()
+    if sys.platform.startswith("linux"):
+        for entry in os.scandir("/proc"):
+            if not entry.name.isdigit():
+                continue
+            try:
+                with open(os.path.join(entry.path, "comm"), "r", encoding="utf-8") as f:
+                    names.add(f.read().strip().lower())
+            except OSError:
+                continue
+        return names
+
+    if sys.platform == "win32":
+        command = ["tasklist", "/FO", "CSV", "/NH"]
+        flags = subprocess.CREATE_NO_WINDOW
+    else:
+        command = ["ps", "-A", "-o", "comm="]
+        flags = 0
+    try:
+        output = subprocess.run(
+            command, capture_output=True, text=True, timeout=10, creationflags=flags
+        ).stdout
+    except (OSError, subprocess.SubprocessError) as e:
+        logging.debug(f"获取进程列表失败: {e}")
+        return names
+    for line in output.splitlines():
+        name = line.split('","')[0].strip('"') if sys.platform == "win32" else line
+        names.add(os.path.basename(name.strip()).lower())
+    return names
+
+
+class GameActivity:
+    """
+    游戏写入存档的检测类
+
+    参数:
+        quiet_seconds: 最后一次写入后经过这么多秒视为写入已平息，为None时使用配置中的值
+    """
+
+    def __init__(self, quiet_seconds=None):
+        self.quiet_seconds = quiet_seconds
+        self._lock = threading.Lock()
+        self._last_write = None
+        # (检查时间, 结果)
+        self._running = (None, False)
+        self._latest_mtime = (None, None)
+
+    def _quiet_seconds(self):
+        if self.quiet_seconds is not None:
+            return self.quiet_seconds
+        return get_config_service().get()["background_io_quiet_seconds"]
+
+    def note_write(self):
+        """报告游戏正在写入存档（由存档监视器调用）"""
+        with self._lock:
+            self._last_write = time.monotonic()
+
+    def game_running(self):
+        """游戏进程是否在运行（结果缓存PROCESS_CHECK_SECONDS秒）"""
+        now = time.monotonic()
+        with self._lock:
+            checked, running = self._running
+            if checked is not None and now - checked < PROCESS_CHECK_SECONDS:
+                return running
+        running = bool(_running_process_names() & set(GAME_PROCESS_NAMES))
+        with self._lock:
+            self._running = (now, running)
+        return running
+
+    def _latest_save_mtime(self):
+        """主存档目录中最近修改的存档的修改时间（结果缓存SAVE_PROBE_SECONDS秒）"""
+        now = time.monotonic()
+        with self._lock:
+            checked, latest = self._latest_mtime
+            if checked is not None and now - checked < SAVE_PROBE_SECONDS:
+                return latest
+        latest = None
+        save_dir = get_config_service().get()["eu4_save_dir"]
+        try:
+            for entry in os.scandir(save_dir):
+                if entry.name.endswith(".eu4") and entry.is_file():
+                    mtime = entry.stat().st_mtime
+                    latest = mtime if latest is None else max(latest, mtime)
+        except OSError:
+            pass
+        with self._lock:
+            self._latest_mtime = (now, latest)
+        return latest
+
+    def busy(self):
+        """游戏是否正在写入存档（或刚写入完、还没有经过quiet_seconds）"""
+        quiet = self._quiet_seconds()
+        with self._lock:
+            last_write = self._last_write
+        if last_write is not None and time.monotonic() - last_write < quiet:
+            return True
+        if not self.game_running():
+            return False
+        latest = self._latest_save_mtime()
+        return latest is not None and 0 <= time.time() - latest < quiet
+
+    def wait_until_quiet(self, max_wait=MAX_PAUSE_SECONDS):
+        """
+        等待游戏的写入平息
+
+        返回:
+            等待的秒数
+        """
+        if not self.busy():
+            return 0.0
+        start = time.monotonic()
+        logging.info("游戏正在写入存档，暂停后台任务")
+        while time.monotonic() - start < max_wait and self.busy():
+            time.sleep(PAUSE_POLL_SECONDS)
+        waited = time.monotonic() - start
+        metrics.inc("io_pause_seconds_total", waited)
+        logging.info(f"后台任务继续执行（暂停 {waited:.1f} 秒）")
+        return waited
+
+
+game_activity = GameActivity()
+
+
+def should_yield(priority=IO_IDLE):
+    """该类别的任务现在是否应当让路给游戏（不等待）"""
+    if priority == IO_INTERACTIVE or not _yield_enabled():
+        return False
+    return game_activity.busy()
+
+
+def checkpoint(priority=IO_IDLE):
+    """
+    后台任务在两个工作单元（文件、备份）之间调用：游戏正在写入存档时等待写入平息
+
+    返回:
+        等待的秒数
+    """
+    if not should_yield(priority):
+        return 0.0
+    return game_activity.wait_until_quiet()
+
+
+class IOScheduler:
+    """
+    后台任务调度器类
+
+    每个优先级类别有自己的任务队列和工作线程，同一类别的任务按提交顺序依次执行。
+    任务自己在工作单元之间调用checkpoint，开始前不等待。工作线程在有任务时创建、
+    队列清空后退出。IO_IDLE的工作线程降低了自己的优先级，并且是守护线程：
+    维护任务中断后下次会继续（例如回收站中没有记录的目录），不应阻止程序退出；
+    命令行在退出前调用shutdown，游戏没有在写入存档时等待任务完成。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queues = {}
+        self._workers = {}
+
+    def submit(self, func, *args, priority=IO_IDLE, name="io-task"):
+        """
+        提交后台任务
+
+        参数:
+            func: 任务函数
+            args: 任务函数的参数
+            priority: 优先级类别
+            name: 工作线程名的前缀
+
+        返回:
+            Future对象
+        """
+        future = Future()
+        with self._lock:
+            self._queues.setdefault(priority, deque()).append((func, args, future))
+            if self._workers.get(priority) is None:
+                worker = threading.Thread(
+                    target=self._run,
+                    args=(priority,),
+                    name=f"{name}-{priority}",
+                    daemon=priority == IO_IDLE,
+                )
+                self._workers[priority] = worker
+                worker.start()
+        return future
+
+    def pending_count(self, priority=None):
+        """等待执行的任务数"""
+        with self._lock:
+            if priority is not None:
+                return len(self._queues.get(priority, []))
+            return sum(len(queue) for queue in self._queues.values())
+
+    def shutdown(self, wait=True):
+        """
+        取消还没有开始的任务
+
+        参数:
+            wait: 是否等待正在执行的任务完成。游戏正在写入存档（IO_IDLE任务暂停）时不等待，
+                守护线程中的任务随程序退出而中断
+        """
+        with self._lock:
+            for queue in self._queues.values():
+                for _, _, future in queue:
+                    future.cancel()
+                queue.clear()
+            workers = [(p, w) for p, w in self._workers.items() if w is not None]
+        if not wait:
+            return
+        for priority, worker in workers:
+            while worker.is_alive():
+                if priority == IO_IDLE and should_yield(IO_IDLE):
+                    logging.info("游戏正在写入存档，不再等待后台任务完成")
+                    break
+                worker.join(PAUSE_POLL_SECONDS)
+
+    def _run(self, priority):
+        if priority == IO_IDLE:
+            enter_background()
+        while True:
+            with self._lock:
+                queue = self._queues.get(priority)
+                if not queue:
+                    self._workers[priority] = None
+                    return
+                func, args, future = queue.popleft()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+
+io_scheduler = IOScheduler()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+日志处理模块
+
+日志调用（通常在界面线程中）只把日志记录放入内存队列，写文件和输出到控制台
+都由后台线程完成，不会因为磁盘I/O阻塞调用线程。
+
+日志文件按大小和日期轮换：超过大小上限或跨过午夜时，当前文件被重命名并用gzip
+压缩为 app.log.1.gz、app.log.2.gz ...，只保留指定数量的旧文件。
+日志格式可以是普通文本，也可以是每行一个JSON对象，便于用工具检索。
+"""
+
+import os
+import gzip
+import json
+import time
+import queue
+import atexit
+import shutil
+import logging
+import logging.handlers
+from datetime import datetime, timedelta
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行JSON"""
+
+    def format(self, record):
+        data = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "module": record.module,
+            "line": record.lineno,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exception"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False)
+
+
+def _next_midnight(now=None):
+    now = datetime.fromtimestamp(now if now is not None else time.time())
+    midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return midnight.timestamp()
+
+
+def _gzip_namer(name):
+    return name + ".gz"
+
+
+def _gzip_rotator(source, dest):
+    """把轮换下来的日志文件压缩后删除原文件"""
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+class CompressingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    按大小和日期轮换并压缩旧文件的日志处理器
+
+    参数:
+        filename: 日志文件路径
+        max_bytes: 单个日志文件的大小上限（字节），0表示不按大小轮换
+        backup_count: 保留的旧日志文件数
+    """
+
+    def __init__(self, filename, max_bytes, backup_count):
+        super().__init__(
+            filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+        )
+        self.namer = _gzip_namer
+        self.rotator = _gzip_rotator
+
+        # 程序跨天启动时，先把昨天的日志轮换掉
+        try:
+            mtime = os.path.getmtime(filename)
+        except OSError:
+            mtime = time.time()
+        self.rollover_at = _next_midnight(mtime)
+
+    def shouldRollover(self, record):
+        if record.created >= self.rollover_at:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self.rollover_at = _next_midnight()
+
+
+# 在调用线程中把异常调用栈转为文本
+_traceback_formatter = logging.Formatter()
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    放入队列前不复制、不格式化日志记录的队列处理器
+
+    标准的QueueHandler会复制记录并在调用线程中格式化消息，这里只在有异常信息时
+    把调用栈转为文本（traceback对象不能跨线程保留），其余工作都交给后台线程。
+    """
+
+    def prepare(self, record):
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class LogPipeline:
+    """
+    队列日志管道类
+
+    参数:
+        handlers: 在后台线程中实际输出日志的处理器
+    """
+
+    def __init__(self, handlers):
+        self.queue = queue.SimpleQueue()
+        self.queue_handler = _QueueHandler(self.queue)
+        self.listener = logging.handlers.QueueListener(
+            self.queue, *handlers, respect_handler_level=True
+        )
+        self._running = False
+
+    def start(self, logger=None, level=logging.INFO):
+        """把队列处理器安装到logger（默认为根logger）并启动后台线程"""
+        logger = logger or logging.getLogger()
+        logger.setLevel(level)
+        logger.addHandler(self.queue_handler)
+        self.listener.start()
+        self._running = True
+        atexit.register(self.stop)
+
+    def stop(self):
+        """输出队列中剩余的日志并停止后台线程，可以重复调用"""
+        if not self._running:
+            return
+        self._running = False
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
+
+
+def create_pipeline(log_dir, max_bytes, backup_count, json_format=False, console=True):
+    """
+    创建日志管道
+
+    参数:
+        log_dir: 日志目录
+        max_bytes: 单个日志文件的大小上限（字节）
+        backup_count: 保留的旧日志文件数
+        json_format: 日志文件是否使用JSON格式（控制台始终为文本格式）
+        console: 是否同时输出到控制台
+
+    返回:
+        LogPipeline对象，调用start()开始使用
+    """
+    os.makedirs(log_dir, exist_ok=True)
+
+    file_handler = CompressingRotatingFileHandler(
+        os.path.join(log_dir, "app.log"), max_bytes, backup_count
+    )
+    file_handler.setFormatter(
+        JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT)
+    )
+    handlers = [file_handler]
+
+    if console:
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        handlers.append(stream_handler)
+
+    return LogPipeline(handlers)
@@ -7,10 +7,12 @@
 
 import os
 import sys
+import bisect
 import logging
 from datetime import datetime
 
 from PySide6.QtWidgets import (
+    QApplication,
     QMainWindow,
     QWidget,
     QVBoxLayout,
@@ -19,44 +21,145 @@ from PySide6.QtWidgets import (
     QPushButton,
     QLabel,
     QLineEdit,
-    QComboBox,
     QListWidget,
     QListWidgetItem,
-    QTabWidget,
     QGroupBox,
-    QCheckBox,
-    QSpinBox,
-    QFileDialog,
     QMessageBox,
     QDialog,
-    QDialogButtonBox,
+    QFileDialog,
     QFormLayout,
-    QTextEdit,
-    QCompleter,
     QMenu,
     QTableWidget,
     QTableWidgetItem,
     QHeaderView,
 )
-from PySide6.QtCore import Qt, QSize, QTimer, Signal, QThread, QSettings, QEvent
-from PySide6.QtGui import QIcon, QAction, QFont, QColor, QPalette, QPixmap
+from PySide6.QtCore import Qt, QSize, QTimer, Signal, QThread
+from PySide6.QtGui import QIcon, QAction, QKeySequence
 
-from src.config import get_config, save_config, get_save_files, format_file_size
+from src.config import get_config, get_save_roots, iter_save_dirs, format_file_size
 from src.backup_manager import BackupManager
-from src.styles import get_dark_style, get_light_style
+from src.io_scheduler import io_scheduler
+from src.styles import apply_theme
+from src.startup import startup_timer
+from src.metrics import metrics
+from src.profiling import profiler
+from src.timeline_widget import TimelineWidget
+
+
+class SaveScanner(QThread):
+    """
+    存档扫描线程类
+
+    并行扫描所有存档目录，每个目录扫描完成后就把其中的存档分批发送给主窗口，
+    无响应的目录（例如网络共享）不会耽误其他目录的结果显示。
+    """
+
+    save_files_loaded = Signal(list)
+    # 参数为 (目录, 错误信息)
+    save_dir_failed = Signal(str, str)
+
+    def __init__(self, batch_size=50, parent=None):
+        super().__init__(parent)
+        self.batch_size = batch_size
+
+    def scan(self):
+        for root, save_files, error in iter_save_dirs():
+            if error:
+                self.save_dir_failed.emit(root, error)
+            for i in range(0, len(save_files), self.batch_size):
+                self.save_files_loaded.emit(save_files[i : i + self.batch_size])
+
+    def run(self):
+        self.scan()
+
+
+class CatalogLoader(SaveScanner):
+    """
+    后台加载线程类
+
+    加载备份索引并扫描存档目录，扫描结果分批发送给主窗口，
+    使窗口在加载完成前就能显示并响应。
+    """
+
+    backup_manager_loaded = Signal(object)
+
+    def run(self):
+        backup_manager = BackupManager()
+        startup_timer.mark("catalog loaded")
+        self.backup_manager_loaded.emit(backup_manager)
+
+        self.scan()
+        startup_timer.mark("save dir scanned")
+
+
+class TaskThread(QThread):
+    """在后台线程中执行耗时操作，完成后发出result_ready信号"""
+
+    result_ready = Signal(object)
+
+    def __init__(self, func, *args, parent=None):
+        super().__init__(parent)
+        self.func = func
+        self.args = args
+
+    def run(self):
+        self.result_ready.emit(self.func(*self.args))
+
+
+class AutoBackupThread(QThread):
+    """
+    自动备份线程类
+
+    在后台运行与守护进程相同的检查循环（监视存档目录，由调度器合并变化、
+    按间隔和游戏内周期备份），创建备份后发出backups_created信号。
+    """
+
+    backups_created = Signal(list)
+
+    def __init__(self, backup_manager, parent=None):
+        super().__init__(parent)
+        from src.daemon import BackupDaemon
+
+        self.daemon = BackupDaemon(
+            backup_manager=backup_manager, on_backups=self.backups_created.emit
+        )
+
+    def run(self):
+        self.daemon.loop()
+
+    def stop(self):
+        """停止检查循环并等待线程结束"""
+        self.daemon.stop()
+        self.wait()
 
 
 class MainWindow(QMainWindow):
     """主窗口类"""
 
+    # 后台加载完成后发出
+    startup_finished = Signal()
+
     def __init__(self):
         super().__init__()
 
-        # 初始化配�?
+        # 初始化配置
         self.config = get_config()
 
-        # 初始化备份管理器
-        self.backup_manager = BackupManager()
+        # 备份管理器在后台线程中创建，加载完成前为None
+        self.backup_manager = None
+        self.catalog_loader = None
+        self.save_scanner = None
+        self.diff_thread = None
+        self.auto_backup_thread = None
+        self.applied_theme = None
+
+        # 存档列表中各项的排序键（修改时间的相反数），用于把各目录的结果按时间插入
+        self._save_order = []
+        # 扫描完成后要重新选中的存档路径
+        self._reselect_path = None
+        # 本次扫描中失败或超时的目录: [(目录, 错误信息)]
+        self._failed_save_dirs = []
+
         # 设置窗口属性
         self.setWindowTitle("欧陆风云IV 存档管理器")
         self.setMinimumSize(1000, 600)
@@ -82,8 +185,10 @@ class MainWindow(QMainWindow):
         # 创建界面组件
         self.setup_ui()
 
-        # 加载存档数据
-        self.load_save_files()
+        # 窗口显示后再加载备份索引和存档列表
+        self.backup_group.setEnabled(False)
+        self.status_label.setText("正在加载...")
+        QTimer.singleShot(0, self.start_background_load)
 
         # 创建定时器用于自动刷新
         self.timer = QTimer(self)
@@ -122,6 +227,8 @@ class MainWindow(QMainWindow):
         self.status_bar = self.statusBar()
         self.status_label = QLabel("就绪")
         self.status_bar.addWidget(self.status_label)
+        self.usage_label = QLabel()
+        self.status_bar.addPermanentWidget(self.usage_label)
 
     def create_toolbar(self):
         """创建顶部工具栏"""
@@ -147,10 +254,33 @@ class MainWindow(QMainWindow):
         restore_action.triggered.connect(self.restore_backup)
         self.toolbar.addAction(restore_action)
 
+        # 撤销/重做按钮
+        self.undo_action = QAction("撤销", self)
+        self.undo_action.setShortcut(QKeySequence.StandardKey.Undo)
+        self.undo_action.triggered.connect(self.undo)
+        self.toolbar.addAction(self.undo_action)
+
+        self.redo_action = QAction("重做", self)
+        self.redo_action.setShortcut(QKeySequence.StandardKey.Redo)
+        self.redo_action.triggered.connect(self.redo)
+        self.toolbar.addAction(self.redo_action)
+        self.update_undo_actions()
+
         # 添加分隔�?
         self.toolbar.addSeparator()
 
         # 设置按钮
+        # 导出/导入按钮
+        export_action = QAction("导出备份", self)
+        export_action.triggered.connect(self.export_backups)
+        self.toolbar.addAction(export_action)
+
+        import_action = QAction("导入备份", self)
+        import_action.triggered.connect(self.import_backups)
+        self.toolbar.addAction(import_action)
+
+        self.toolbar.addSeparator()
+
         settings_action = QAction("设置", self)
         settings_action.triggered.connect(self.show_settings)
         self.toolbar.addAction(settings_action)
@@ -171,7 +301,8 @@ class MainWindow(QMainWindow):
 
         # 存档列表
         self.save_list = QListWidget()
-        self.save_list.setSelectionMode(QListWidget.SingleSelection)
+        self.save_list.setObjectName("saveList")
+        self.save_list.setSelectionMode(QListWidget.ExtendedSelection)
         self.save_list.currentItemChanged.connect(self.on_save_selected)
         self.save_list.setContextMenuPolicy(Qt.CustomContextMenu)
         self.save_list.customContextMenuRequested.connect(self.show_save_context_menu)
@@ -186,10 +317,14 @@ class MainWindow(QMainWindow):
         self.save_name_label = QLabel("-")
         self.save_size_label = QLabel("-")
         self.save_date_label = QLabel("-")
+        self.save_campaign_label = QLabel("-")
+        self.save_source_label = QLabel("-")
 
         self.save_info_layout.addRow("存档名称:", self.save_name_label)
         self.save_info_layout.addRow("文件大小:", self.save_size_label)
         self.save_info_layout.addRow("修改日期:", self.save_date_label)
+        self.save_info_layout.addRow("所属战役:", self.save_campaign_label)
+        self.save_info_layout.addRow("所在目录:", self.save_source_label)
 
         self.right_layout.addWidget(self.save_info_group)
 
@@ -199,6 +334,7 @@ class MainWindow(QMainWindow):
 
         # 备份表格
         self.backup_table = QTableWidget()
+        self.backup_table.setObjectName("backupTable")
         self.backup_table.setColumnCount(4)
         self.backup_table.setHorizontalHeaderLabels(
             ["备份时间", "游戏进度", "描述", "大小"]
@@ -216,11 +352,20 @@ class MainWindow(QMainWindow):
             3, QHeaderView.ResizeToContents
         )
         self.backup_table.setSelectionBehavior(QTableWidget.SelectRows)
-        self.backup_table.setSelectionMode(QTableWidget.SingleSelection)
+        # 行高留出上下边距（样式表中不为单元格设置padding）
+        self.backup_table.verticalHeader().setDefaultSectionSize(
+            self.fontMetrics().height() + 10
+        )
+        self.backup_table.setSelectionMode(QTableWidget.ExtendedSelection)
         self.backup_table.setContextMenuPolicy(Qt.CustomContextMenu)
         self.backup_table.customContextMenuRequested.connect(
             self.show_backup_context_menu
         )
+        self.backup_table.currentCellChanged.connect(
+            lambda row, *_: self.timeline_widget.set_selected(
+                self.backup_table.item(row, 0).data(Qt.UserRole) if row >= 0 else None
+            )
+        )
 
         backup_layout.addWidget(self.backup_table)
 
@@ -246,26 +391,119 @@ class MainWindow(QMainWindow):
 
         self.right_layout.addWidget(self.backup_group)
 
+        # 战役时间线：按游戏日期显示备份，恢复产生的分支各占一行
+        self.timeline_group = QGroupBox("战役时间线")
+        timeline_layout = QVBoxLayout(self.timeline_group)
+        self.timeline_widget = TimelineWidget()
+        self.timeline_widget.backup_clicked.connect(self.select_backup_row)
+        timeline_layout.addWidget(self.timeline_widget)
+        self.right_layout.addWidget(self.timeline_group)
+
+    def start_background_load(self):
+        """在后台线程中加载备份索引和存档列表"""
+        self.clear_save_list()
+        self.catalog_loader = CatalogLoader(parent=self)
+        self.catalog_loader.backup_manager_loaded.connect(self.on_backup_manager_loaded)
+        self.catalog_loader.save_files_loaded.connect(self.add_save_files)
+        self.catalog_loader.save_dir_failed.connect(self.on_save_dir_failed)
+        self.catalog_loader.finished.connect(self.on_background_load_finished)
+        self.catalog_loader.start()
+
+    def on_backup_manager_loaded(self, backup_manager):
+        """备份索引加载完成"""
+        self.backup_manager = backup_manager
+        self.backup_group.setEnabled(True)
+        self.update_undo_actions()
+        self.update_usage_info()
+        self.update_auto_backup()
+
+    def on_background_load_finished(self):
+        """后台加载完成"""
+        self.catalog_loader = None
+        self.update_save_count()
+        startup_timer.mark("startup finished")
+        self.startup_finished.emit()
+
+    @profiler.profiled("ui.load_save_files")
     def load_save_files(self):
-        """加载存档文件"""
-        self.save_list.clear()
-        save_files = get_save_files()
-
-        if not save_files:
-            self.status_label.setText("未找到存档文件")
+        """在后台线程中重新扫描存档目录"""
+        if self.backup_manager is None or self.save_scanner is not None:
+            # 仍在后台加载中，或上一次扫描还没有结束
             return
 
+        # 扫描完成后恢复之前的选择
+        current_item = self.save_list.currentItem()
+        if current_item:
+            self._reselect_path = current_item.data(Qt.UserRole)["path"]
+
+        self.clear_save_list()
+        self.save_scanner = SaveScanner(parent=self)
+        self.save_scanner.save_files_loaded.connect(self.add_save_files)
+        self.save_scanner.save_dir_failed.connect(self.on_save_dir_failed)
+        self.save_scanner.finished.connect(self.on_save_scan_finished)
+        self.save_scanner.start()
+
+    def on_save_scan_finished(self):
+        """存档目录扫描完成"""
+        self.save_scanner = None
+        self._select_first_save()
+        self.update_save_count()
+
+    def on_save_dir_failed(self, save_dir, error):
+        """某个存档目录无法读取或扫描超时"""
+        self._failed_save_dirs.append((save_dir, error))
+
+    def clear_save_list(self):
+        """清空存档列表"""
+        self.save_list.clear()
+        self._save_order = []
+        self._failed_save_dirs = []
+
+    @metrics.timed("ui_refresh_seconds", view="saves")
+    def add_save_files(self, save_files):
+        """把存档按修改时间（最新的在前）插入存档列表"""
+        roots = get_save_roots()
         for save_file in save_files:
-            item = QListWidgetItem(save_file["name"])
+            text = save_file["name"]
+            source = save_file.get("source")
+            if source and source != roots[0]:
+                # 不在主存档目录中的存档，在名称后显示来源目录
+                text += f"  ({os.path.basename(source.rstrip(os.sep + '/')) or source})"
+            item = QListWidgetItem(text)
             item.setData(Qt.UserRole, save_file)
-            self.save_list.addItem(item)
+            item.setToolTip(save_file["path"])
+
+            key = -save_file["modified"].timestamp()
+            row = bisect.bisect_right(self._save_order, key)
+            self._save_order.insert(row, key)
+            self.save_list.insertItem(row, item)
+
+            if save_file["path"] == self._reselect_path:
+                self._reselect_path = None
+                self.save_list.setCurrentItem(item)
 
-        self.status_label.setText(f"已加载{len(save_files)} 个存档文件")
+        # 还在等待重新选中之前的存档时，不自动选中其他存档
+        if self._reselect_path is None:
+            self._select_first_save()
 
-        # 如果有存档，自动选中第一个存档
-        if self.save_list.count() > 0:
+    def _select_first_save(self):
+        """如果有存档且还没有选中，自动选中第一个存档"""
+        self._reselect_path = None
+        if self.save_list.currentRow() < 0 and self.save_list.count() > 0:
             self.save_list.setCurrentRow(0)
 
+    def update_save_count(self):
+        """在状态栏显示存档数量和无法读取的目录"""
+        count = self.save_list.count()
+        if count:
+            text = f"已加载{count} 个存档文件"
+        else:
+            text = "未找到存档文件"
+        if self._failed_save_dirs:
+            failed = "; ".join(f"{root}（{error}）" for root, error in self._failed_save_dirs)
+            text += f"，以下目录未能读取: {failed}"
+        self.status_label.setText(text)
+
     def filter_saves(self):
         """过滤存档列表"""
         filter_text = self.filter_edit.text().lower()
@@ -293,10 +531,13 @@ class MainWindow(QMainWindow):
         self.save_date_label.setText(
             save_data["modified"].strftime("%Y-%m-%d %H:%M:%S")
         )
+        self.save_source_label.setText(save_data.get("source", "-"))
 
         # 加载该存档的备份列表
-        self.load_backups_for_save(save_data["name"].split(".")[0])
+        self.load_backups_for_save(os.path.splitext(save_data["name"])[0])
 
+    @profiler.profiled("ui.load_backups_for_save")
+    @metrics.timed("ui_refresh_seconds", view="backups")
     def load_backups_for_save(self, save_name):
         """加载指定存档的备份列表"""
         self.backup_table.setRowCount(0)
@@ -310,6 +551,8 @@ class MainWindow(QMainWindow):
             backup_time = datetime.fromisoformat(backup["time"]).strftime(
                 "%Y-%m-%d %H:%M:%S"
             )
+            if backup.get("pinned"):
+                backup_time += "  [固定]"
             time_item = QTableWidgetItem(backup_time)
             self.backup_table.setItem(i, 0, time_item)
 
@@ -327,18 +570,109 @@ class MainWindow(QMainWindow):
             size_item = QTableWidgetItem(format_file_size(size))
             self.backup_table.setItem(i, 3, size_item)
 
-            # 存储备份ID
+            # 存储备份ID和固定状态
             time_item.setData(Qt.UserRole, backup["id"])
+            time_item.setData(Qt.UserRole + 1, backup.get("pinned", False))
 
         # 自动调整行高
         self.backup_table.resizeRowsToContents()
 
+        # 更新时间线：显示存档所属战役的全部备份，包括重命名前后的存档
+        campaign = self.backup_manager.get_campaign_of_save(save_name)
+        self.timeline_widget.set_timeline(
+            self.backup_manager.get_timeline(campaign) if campaign else None
+        )
+        self.update_campaign_info(save_name)
+        # 创建、恢复等操作后都会刷新列表，顺便更新撤销按钮和占用空间
+        self.update_undo_actions()
+        self.update_usage_info()
+
+    def refresh_current_backups(self):
+        """刷新当前选中存档的备份列表"""
+        current_item = self.save_list.currentItem()
+        if current_item:
+            self.load_backups_for_save(
+                os.path.splitext(current_item.data(Qt.UserRole)["name"])[0]
+            )
+        else:
+            self.update_undo_actions()
+            self.update_usage_info()
+
+    def update_usage_info(self):
+        """在状态栏显示备份占用的空间：当前存档、所属战役和总计"""
+        if self.backup_manager is None:
+            return
+        usage = self.backup_manager.get_usage()
+
+        parts = []
+        current_item = self.save_list.currentItem()
+        if current_item:
+            save_name = os.path.splitext(current_item.data(Qt.UserRole)["name"])[0]
+            parts.append(f"存档 {format_file_size(usage['saves'].get(save_name, 0))}")
+            campaign = self.backup_manager.get_campaign_of_save(save_name)
+            if campaign:
+                parts.append(
+                    f"战役 {format_file_size(usage['campaigns'].get(campaign, 0))}"
+                )
+        total = f"总计 {format_file_size(usage['total'])}"
+        if usage["quota"]:
+            total += f" / {format_file_size(usage['quota'])}"
+        parts.append(total)
+        self.usage_label.setText("  |  ".join(parts))
+
+        # 提示中列出占用最多的战役
+        top = sorted(usage["campaigns"].items(), key=lambda kv: -kv[1])[:10]
+        self.usage_label.setToolTip(
+            "\n".join(f"{name}: {format_file_size(size)}" for name, size in top)
+        )
+
+    def update_campaign_info(self, save_name):
+        """显示存档所属的战役，以及同一战役的其他存档名"""
+        campaign = self.backup_manager.get_campaign_of_save(save_name)
+        if campaign is None:
+            self.save_campaign_label.setText("-")
+            return
+
+        backups = self.backup_manager.get_backups_for_campaign(campaign)
+        player = backups[0].get("player") or "未知国家"
+        others = sorted({b["save_name"] for b in backups} - {save_name})
+        text = f"{player}（共 {len(backups)} 个备份）"
+        if others:
+            text += f"\n同一战役的其他存档: {', '.join(others)}"
+        self.save_campaign_label.setText(text)
+
+    def select_backup_row(self, backup_id):
+        """在备份表格中选中指定的备份"""
+        for row in range(self.backup_table.rowCount()):
+            if self.backup_table.item(row, 0).data(Qt.UserRole) == backup_id:
+                self.backup_table.selectRow(row)
+                self.backup_table.scrollToItem(self.backup_table.item(row, 0))
+                break
+
     def clear_save_info(self):
         """清除存档信息显示"""
         self.save_name_label.setText("-")
         self.save_size_label.setText("-")
         self.save_date_label.setText("-")
+        self.save_campaign_label.setText("-")
+        self.save_source_label.setText("-")
         self.backup_table.setRowCount(0)
+        self.timeline_widget.set_timeline(None)
+
+    def selected_save_files(self):
+        """获取所有选中的存档"""
+        return [item.data(Qt.UserRole) for item in self.save_list.selectedItems()]
+
+    def selected_backup_rows(self):
+        """获取所有选中的备份，返回按行号排序的(行号, 备份ID)列表"""
+        rows = sorted({index.row() for index in self.backup_table.selectedIndexes()})
+        return [(row, self.backup_table.item(row, 0).data(Qt.UserRole)) for row in rows]
+
+    @staticmethod
+    def show_batch_failures(parent, title, failed):
+        """显示批量操作中失败的条目"""
+        details = "\n".join(f"{key}: {error}" for key, error in failed.items())
+        QMessageBox.warning(parent, title, f"{len(failed)} 项操作失败:\n{details}")
 
     def create_backup(self):
         """创建备份"""
@@ -349,8 +683,14 @@ class MainWindow(QMainWindow):
             return
 
         save_data = current_item.data(Qt.UserRole)
+        selected = self.selected_save_files()
+        if len(selected) > 1:
+            self.create_backups(selected)
+            return
+
+        # 显示备份对话框
+        from src.dialogs import BackupDialog
 
-        # 显示备份对话�?
         dialog = BackupDialog(self, save_data["name"])
         if dialog.exec() != QDialog.Accepted:
             return
@@ -374,10 +714,41 @@ class MainWindow(QMainWindow):
         if backup_id:
             QMessageBox.information(self, "成功", f"成功创建备份: {backup_id}")
             # 刷新备份列表
-            self.load_backups_for_save(save_data["name"].split(".")[0])
+            self.load_backups_for_save(os.path.splitext(save_data["name"])[0])
         else:
             QMessageBox.critical(self, "错误", "创建备份失败，请检查日志获取更多信息。")
 
+    def create_backups(self, save_files):
+        """为多个存档批量创建备份"""
+        from src.dialogs import BackupDialog
+
+        dialog = BackupDialog(self, f"{len(save_files)} 个存档")
+        dialog.game_date_edit.setEnabled(False)
+        if dialog.exec() != QDialog.Accepted:
+            return
+
+        description = dialog.description_edit.toPlainText()
+        tags = [
+            tag.strip() for tag in dialog.tags_edit.text().split(",") if tag.strip()
+        ]
+
+        result = self.backup_manager.create_backups(
+            [save_file["path"] for save_file in save_files], description, tags
+        )
+
+        if result["failed"]:
+            self.show_batch_failures(self, "部分备份失败", result["failed"])
+        else:
+            QMessageBox.information(
+                self, "成功", f"成功创建 {len(result['succeeded'])} 个备份"
+            )
+
+        # 刷新备份列表
+        current_item = self.save_list.currentItem()
+        if current_item:
+            save_name = os.path.splitext(current_item.data(Qt.UserRole)["name"])[0]
+            self.load_backups_for_save(save_name)
+
     def restore_backup(self):
         """恢复备份"""
         current_row = self.backup_table.currentRow()
@@ -400,7 +771,13 @@ class MainWindow(QMainWindow):
 
         # 恢复备份
         if self.backup_manager.restore_backup(backup_id):
-            QMessageBox.information(self, "成功", "成功恢复备份！")
+            _, safety_id = self.backup_manager.last_restore
+            message = "成功恢复备份！"
+            if safety_id:
+                message += f"\n恢复前的存档已保存为备份: {safety_id}"
+            QMessageBox.information(self, "成功", message)
+            # 刷新备份列表（可能新增了恢复前的自动备份）
+            self.refresh_current_backups()
         else:
             QMessageBox.critical(self, "错误", "恢复备份失败，请检查日志获取更多信息。")
 
@@ -411,10 +788,17 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "警告", "请先选择一个备份！")
             return
 
+        selected = self.selected_backup_rows()
+        if len(selected) > 1:
+            self.edit_backups(selected)
+            return
+
         backup_id = self.backup_table.item(current_row, 0).data(Qt.UserRole)
         current_desc = self.backup_table.item(current_row, 2).text()
 
-        # 显示编辑对话�?
+        # 显示编辑对话框
+        from src.dialogs import EditBackupDialog
+
         dialog = EditBackupDialog(self, backup_id, current_desc)
         if dialog.exec() != QDialog.Accepted:
             return
@@ -440,19 +824,62 @@ class MainWindow(QMainWindow):
                 self, "错误", "更新备份信息失败，请检查日志获取更多信息。"
             )
 
+    def edit_backups(self, selected):
+        """批量编辑多个备份的信息，留空的项目保持不变"""
+        from src.dialogs import EditBackupDialog
+
+        dialog = EditBackupDialog(self, f"已选择 {len(selected)} 个备份")
+        if dialog.exec() != QDialog.Accepted:
+            return
+
+        description = dialog.description_edit.toPlainText() or None
+        tags = [
+            tag.strip() for tag in dialog.tags_edit.text().split(",") if tag.strip()
+        ] or None
+        game_date = dialog.game_date_edit.text() or None
+
+        result = self.backup_manager.update_metadata_many(
+            {
+                backup_id: {
+                    "description": description,
+                    "tags": tags,
+                    "game_date": game_date,
+                }
+                for _, backup_id in selected
+            }
+        )
+
+        # 更新表格显示
+        succeeded = set(result["succeeded"])
+        for row, backup_id in selected:
+            if backup_id not in succeeded:
+                continue
+            if game_date is not None:
+                self.backup_table.item(row, 1).setText(game_date)
+            if description is not None:
+                self.backup_table.item(row, 2).setText(description)
+
+        if result["failed"]:
+            self.show_batch_failures(self, "部分备份更新失败", result["failed"])
+        else:
+            QMessageBox.information(self, "成功", f"成功更新 {len(succeeded)} 个备份！")
+
     def delete_backup(self):
         """删除备份"""
-        current_row = self.backup_table.currentRow()
-        if current_row < 0:
+        selected = self.selected_backup_rows()
+        if not selected:
             QMessageBox.warning(self, "警告", "请先选择一个备份！")
             return
 
-        backup_id = self.backup_table.item(current_row, 0).data(Qt.UserRole)
-        # 显示确认对话�?
+        # 显示确认对话框
+        if len(selected) == 1:
+            message = "确定要删除这个备份吗？删除后可以通过“撤销”恢复。"
+        else:
+            message = f"确定要删除选中的 {len(selected)} 个备份吗？删除后可以通过“撤销”恢复。"
         reply = QMessageBox.question(
             self,
             "确认删除",
-            "确定要删除这个备份吗？此操作不可恢复！",
+            message,
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
             QMessageBox.StandardButton.No,
         )
@@ -461,34 +888,214 @@ class MainWindow(QMainWindow):
             return
 
         # 删除备份
-        if self.backup_manager.delete_backup(backup_id):
-            # 从表格中移除
-            self.backup_table.removeRow(current_row)
-            QMessageBox.information(self, "成功", "成功删除备份！")
+        result = self.backup_manager.delete_backups([b for _, b in selected])
+
+        # 从表格中移除，从后往前删除以免行号变化
+        succeeded = set(result["succeeded"])
+        for row, backup_id in reversed(selected):
+            if backup_id in succeeded:
+                self.backup_table.removeRow(row)
+        self.update_undo_actions()
+        self.update_usage_info()
+
+        if result["failed"]:
+            self.show_batch_failures(self, "部分备份删除失败", result["failed"])
         else:
-            QMessageBox.critical(self, "错误", "删除备份失败，请检查日志获取更多信息。")
+            QMessageBox.information(self, "成功", f"成功删除 {len(succeeded)} 个备份！")
+
+    def toggle_pinned(self, pinned):
+        """固定或取消固定选中的备份"""
+        backup_ids = [backup_id for _, backup_id in self.selected_backup_rows()]
+        if not self.backup_manager.set_pinned(backup_ids, pinned):
+            QMessageBox.critical(self, "错误", "更新备份失败，请检查日志获取更多信息。")
+        self.refresh_current_backups()
+
+    def update_undo_actions(self):
+        """根据撤销栈更新撤销/重做按钮"""
+        manager = self.backup_manager
+        undo_text = manager.undo_description() if manager else None
+        redo_text = manager.redo_description() if manager else None
+
+        self.undo_action.setEnabled(undo_text is not None)
+        self.undo_action.setToolTip(f"撤销{undo_text}" if undo_text else "撤销")
+        self.redo_action.setEnabled(redo_text is not None)
+        self.redo_action.setToolTip(f"重做{redo_text}" if redo_text else "重做")
+
+    def undo(self):
+        """撤销最近一次删除、清理或恢复"""
+        description = self.backup_manager.undo_description()
+        if description is None:
+            return
+        if self.backup_manager.undo():
+            self.status_label.setText(f"已撤销: {description}")
+        else:
+            QMessageBox.critical(self, "错误", "撤销失败，请检查日志获取更多信息。")
+        self.refresh_current_backups()
+
+    def redo(self):
+        """重做最近一次撤销的操作"""
+        description = self.backup_manager.redo_description()
+        if description is None:
+            return
+        if self.backup_manager.redo():
+            self.status_label.setText(f"已重做: {description}")
+        else:
+            QMessageBox.critical(self, "错误", "重做失败，请检查日志获取更多信息。")
+        self.refresh_current_backups()
+
+    def choose_export_path(self):
+        """选择导出归档的保存位置"""
+        archive_path, _ = QFileDialog.getSaveFileName(
+            self, "导出备份", "eu4_backups.tar.gz", "备份归档 (*.tar.gz)"
+        )
+        return archive_path
+
+    def export_backups(self):
+        """导出选中的备份"""
+        selected = self.selected_backup_rows()
+        if not selected:
+            QMessageBox.warning(self, "警告", "请先选择要导出的备份！")
+            return
+
+        archive_path = self.choose_export_path()
+        if not archive_path:
+            return
+
+        exported = self.backup_manager.export_backups(
+            archive_path, backup_ids=[backup_id for _, backup_id in selected]
+        )
+        if exported is None:
+            QMessageBox.critical(self, "错误", "导出备份失败，请检查日志获取更多信息。")
+        else:
+            QMessageBox.information(self, "成功", f"成功导出 {len(exported)} 个备份")
+
+    def export_save_backups(self):
+        """导出选中存档的全部备份"""
+        save_names = [
+            os.path.splitext(save_file["name"])[0]
+            for save_file in self.selected_save_files()
+        ]
+        if not save_names:
+            return
+
+        archive_path = self.choose_export_path()
+        if not archive_path:
+            return
+
+        exported = self.backup_manager.export_backups(
+            archive_path, save_names=save_names
+        )
+        if exported is None:
+            QMessageBox.critical(self, "错误", "导出备份失败，请检查日志获取更多信息。")
+        else:
+            QMessageBox.information(self, "成功", f"成功导出 {len(exported)} 个备份")
+
+    def import_backups(self):
+        """从归档文件导入备份"""
+        archive_path, _ = QFileDialog.getOpenFileName(
+            self, "导入备份", "", "备份归档 (*.tar.gz *.tar)"
+        )
+        if not archive_path:
+            return
+
+        result = self.backup_manager.import_backups(archive_path)
+        if result is None:
+            QMessageBox.critical(self, "错误", "导入备份失败，请检查日志获取更多信息。")
+            return
+
+        if result["failed"]:
+            self.show_batch_failures(self, "部分备份导入失败", result["failed"])
+        else:
+            QMessageBox.information(
+                self,
+                "成功",
+                f"导入 {len(result['imported'])} 个备份，"
+                f"跳过 {len(result['skipped'])} 个已存在的备份",
+            )
+
+        # 刷新备份列表
+        current_item = self.save_list.currentItem()
+        if current_item:
+            save_name = os.path.splitext(current_item.data(Qt.UserRole)["name"])[0]
+            self.load_backups_for_save(save_name)
+
+    def diff_backups(self):
+        """比较两个备份的游戏内容"""
+        if self.diff_thread is not None:
+            QMessageBox.information(self, "提示", "正在比较备份，请稍候...")
+            return
+
+        # 表格按时间从新到旧排列，行号大的是较早的备份
+        selected = self.selected_backup_rows()
+        if len(selected) == 2:
+            (new_row, new_id), (old_row, old_id) = selected
+        else:
+            new_row = self.backup_table.currentRow()
+            old_row = new_row + 1
+            if new_row < 0 or old_row >= self.backup_table.rowCount():
+                return
+            new_id = self.backup_table.item(new_row, 0).data(Qt.UserRole)
+            old_id = self.backup_table.item(old_row, 0).data(Qt.UserRole)
+
+        title = (
+            f"{self.backup_table.item(old_row, 0).text()} -> "
+            f"{self.backup_table.item(new_row, 0).text()}"
+        )
+        self.status_label.setText("正在比较备份...")
+
+        # 大存档的比较需要数秒，放到后台线程中进行
+        self.diff_thread = TaskThread(
+            self.backup_manager.diff_backups, old_id, new_id, parent=self
+        )
+        self.diff_thread.result_ready.connect(
+            lambda diff: self.show_diff_result(title, diff)
+        )
+        self.diff_thread.start()
+
+    def show_diff_result(self, title, diff):
+        """显示备份对比结果"""
+        from src.dialogs import DiffDialog
+        from src.save_diff import format_diff
+
+        self.diff_thread = None
+        self.status_label.setText("就绪")
+
+        if diff is None:
+            QMessageBox.critical(
+                self,
+                "错误",
+                "比较备份失败，请检查日志获取更多信息。\n（暂不支持铁人模式的二进制存档）",
+            )
+            return
+
+        DiffDialog(self, title, format_diff(diff)).exec()
 
     def show_settings(self):
         """显示设置对话话框"""
+        from src.dialogs import SettingsDialog
+
         dialog = SettingsDialog(self)
         if dialog.exec() == QDialog.Accepted:
-            # 重新加载配置
+            # 获取最新配置（备份管理器已通过配置服务自动更新）
             self.config = get_config()
 
             # 应用新主�?
             self.apply_theme()
 
+            # 按新的设置启动或停止自动备份
+            self.update_auto_backup()
+
             # 重新加载存档
             self.load_save_files()
 
     def apply_theme(self):
-        """应用主题样式"""
+        """应用主题样式，主题没有变化时不重新设置（设置样式表会重新polish所有控件）"""
         theme = self.config.get("theme", "dark")
+        if theme == self.applied_theme:
+            return
 
-        if theme == "dark":
-            self.setStyleSheet(get_dark_style())
-        else:
-            self.setStyleSheet(get_light_style())
+        apply_theme(QApplication.instance(), self, theme)
+        self.applied_theme = theme
 
     def show_save_context_menu(self, position):
         """显示存档右键菜单"""
@@ -501,6 +1108,9 @@ class MainWindow(QMainWindow):
         backup_action = context_menu.addAction("创建备份")
         backup_action.triggered.connect(self.create_backup)
 
+        export_action = context_menu.addAction("导出全部备份...")
+        export_action.triggered.connect(self.export_save_backups)
+
         context_menu.exec(self.save_list.mapToGlobal(position))
 
     def show_backup_context_menu(self, position):
@@ -517,6 +1127,26 @@ class MainWindow(QMainWindow):
         edit_action = context_menu.addAction("编辑信息")
         edit_action.triggered.connect(self.edit_backup)
 
+        export_action = context_menu.addAction("导出...")
+        export_action.triggered.connect(self.export_backups)
+
+        pin_action = context_menu.addAction("固定（不按容量清理）")
+        pin_action.setCheckable(True)
+        pin_action.setChecked(
+            bool(self.backup_table.item(current_row, 0).data(Qt.UserRole + 1))
+        )
+        pin_action.triggered.connect(self.toggle_pinned)
+
+        context_menu.addSeparator()
+
+        # 选中两个备份时比较它们，否则与更早的一个备份比较
+        if len(self.selected_backup_rows()) == 2:
+            diff_action = context_menu.addAction("比较选中的两个备份")
+        else:
+            diff_action = context_menu.addAction("与上一个备份比较")
+            diff_action.setEnabled(current_row + 1 < self.backup_table.rowCount())
+        diff_action.triggered.connect(self.diff_backups)
+
         context_menu.addSeparator()
 
         delete_action = context_menu.addAction("删除")
@@ -524,262 +1154,32 @@ class MainWindow(QMainWindow):
 
         context_menu.exec(self.backup_table.mapToGlobal(position))
 
+    def update_auto_backup(self):
+        """按配置启动或停止自动备份线程"""
+        enabled = self.config["auto_backup"] and self.backup_manager is not None
+        if enabled and self.auto_backup_thread is None:
+            self.auto_backup_thread = AutoBackupThread(self.backup_manager, parent=self)
+            self.auto_backup_thread.backups_created.connect(self.on_auto_backups_created)
+            self.auto_backup_thread.start()
+        elif not enabled and self.auto_backup_thread is not None:
+            self.auto_backup_thread.stop()
+            self.auto_backup_thread = None
+
+    def on_auto_backups_created(self, backup_ids):
+        """自动备份完成后刷新备份列表"""
+        self.status_label.setText(f"已自动备份 {len(backup_ids)} 个存档")
+        self.refresh_current_backups()
+
+    def closeEvent(self, event):
+        """关闭窗口前停止自动备份线程，等待后台清理完成（游戏正在写入存档时不等待）"""
+        if self.auto_backup_thread is not None:
+            self.auto_backup_thread.stop()
+            self.auto_backup_thread = None
+        io_scheduler.shutdown()
+        super().closeEvent(event)
+
+    @profiler.profiled("ui.auto_refresh")
+    @metrics.timed("ui_refresh_seconds", view="auto_refresh")
     def auto_refresh(self):
-        """自动刷新存档列表"""
-        # 保存当前选择的存档名
-        current_save_name = None
-        current_item = self.save_list.currentItem()
-        if current_item:
-            current_save = current_item.data(Qt.UserRole)
-            current_save_name = current_save["name"]
-
-        # 重新加载存档
+        """自动刷新存档列表，刷新后保持之前选中的存档"""
         self.load_save_files()
-
-        # 恢复之前的选择
-        if current_save_name:
-            for i in range(self.save_list.count()):
-                item = self.save_list.item(i)
-                save_data = item.data(Qt.UserRole)
-                if save_data["name"] == current_save_name:
-                    self.save_list.setCurrentItem(item)
-                    break
-
-
-class BackupDialog(QDialog):
-    """备份对话框"""
-
-    def __init__(self, parent=None, save_name=""):
-        super().__init__(parent)
-
-        self.setWindowTitle(f"创建备份 - {save_name}")
-        self.setMinimumWidth(400)
-
-        layout = QVBoxLayout(self)
-
-        # 游戏时间
-        game_date_group = QGroupBox("游戏进度")
-        game_date_layout = QVBoxLayout(game_date_group)
-
-        self.game_date_edit = QLineEdit()
-        self.game_date_edit.setPlaceholderText("输入游戏内日期，例如 1456.8.15")
-        game_date_layout.addWidget(self.game_date_edit)
-
-        layout.addWidget(game_date_group)
-
-        # 描述
-        description_group = QGroupBox("备份描述")
-        description_layout = QVBoxLayout(description_group)
-
-        self.description_edit = QTextEdit()
-        self.description_edit.setPlaceholderText("输入备份的描述信息...")
-        description_layout.addWidget(self.description_edit)
-
-        layout.addWidget(description_group)
-
-        # 标签
-        tags_group = QGroupBox("标签")
-        tags_layout = QVBoxLayout(tags_group)
-
-        self.tags_edit = QLineEdit()
-        self.tags_edit.setPlaceholderText("输入标签，用逗号分隔...")
-        tags_layout.addWidget(self.tags_edit)
-
-        layout.addWidget(tags_group)
-
-        # 按钮
-        button_box = QDialogButtonBox(
-            QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel
-        )
-        button_box.accepted.connect(self.accept)
-        button_box.rejected.connect(self.reject)
-        layout.addWidget(button_box)
-
-
-class EditBackupDialog(QDialog):
-    """编辑备份对话框"""
-
-    def __init__(self, parent=None, backup_id="", current_desc=""):
-        super().__init__(parent)
-
-        self.setWindowTitle(f"编辑备份信息")
-        self.setMinimumWidth(400)
-
-        layout = QVBoxLayout(self)
-
-        # 显示备份ID
-        id_label = QLabel(f"备份ID: {backup_id}")
-        layout.addWidget(id_label)
-
-        # 游戏日期
-        date_group = QGroupBox("游戏进度")
-        date_layout = QVBoxLayout(date_group)
-
-        self.game_date_edit = QLineEdit()
-        self.game_date_edit.setPlaceholderText("输入游戏内日期，例如 1456.8.15")
-        date_layout.addWidget(self.game_date_edit)
-
-        layout.addWidget(date_group)
-
-        # 描述
-        description_group = QGroupBox("备份描述")
-        description_layout = QVBoxLayout(description_group)
-
-        self.description_edit = QTextEdit()
-        self.description_edit.setPlaceholderText("输入备份的描述信息...")
-        self.description_edit.setText(current_desc)
-        description_layout.addWidget(self.description_edit)
-
-        layout.addWidget(description_group)
-
-        # 标签
-        tags_group = QGroupBox("标签")
-        tags_layout = QVBoxLayout(tags_group)
-
-        self.tags_edit = QLineEdit()
-        self.tags_edit.setPlaceholderText("输入标签，用逗号分隔...")
-        tags_layout.addWidget(self.tags_edit)
-
-        layout.addWidget(tags_group)
-
-        # 按钮
-        button_box = QDialogButtonBox(
-            QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel
-        )
-        button_box.accepted.connect(self.accept)
-        button_box.rejected.connect(self.reject)
-        layout.addWidget(button_box)
-
-
-class SettingsDialog(QDialog):
-    """设置对话框"""
-
-    def __init__(self, parent=None):
-        super().__init__(parent)
-
-        self.config = get_config()
-
-        self.setWindowTitle("设置")
-        self.setMinimumWidth(500)
-
-        layout = QVBoxLayout(self)
-
-        # 创建选项
-        self.tab_widget = QTabWidget()
-        layout.addWidget(self.tab_widget)
-
-        # 常规设置选项
-        self.general_tab = QWidget()
-        self.tab_widget.addTab(self.general_tab, "常规")
-        self.setup_general_tab()
-
-        # 外观选项
-        self.appearance_tab = QWidget()
-        self.tab_widget.addTab(self.appearance_tab, "外观")
-        self.setup_appearance_tab()
-
-        # 按钮
-        button_box = QDialogButtonBox(
-            QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel
-        )
-        button_box.accepted.connect(self.save_settings)
-        button_box.rejected.connect(self.reject)
-        layout.addWidget(button_box)
-
-    def setup_general_tab(self):
-        """设置常规选项"""
-        layout = QFormLayout(self.general_tab)
-
-        # 存档目录
-        self.save_dir_edit = QLineEdit(self.config["eu4_save_dir"])
-        self.save_dir_edit.setReadOnly(True)
-        save_dir_layout = QHBoxLayout()
-        save_dir_layout.addWidget(self.save_dir_edit)
-        save_dir_btn = QPushButton("浏览...")
-        save_dir_btn.clicked.connect(self.choose_save_dir)
-        save_dir_layout.addWidget(save_dir_btn)
-        layout.addRow("存档目录:", save_dir_layout)
-
-        # 备份目录
-        self.backup_dir_edit = QLineEdit(self.config["backup_dir"])
-        self.backup_dir_edit.setReadOnly(True)
-        backup_dir_layout = QHBoxLayout()
-        backup_dir_layout.addWidget(self.backup_dir_edit)
-        backup_dir_btn = QPushButton("浏览...")
-        backup_dir_btn.clicked.connect(self.choose_backup_dir)
-        backup_dir_layout.addWidget(backup_dir_btn)
-        layout.addRow("备份目录:", backup_dir_layout)
-
-        # 自动备份间隔
-        self.backup_interval = QSpinBox()
-        self.backup_interval.setRange(5, 120)
-        self.backup_interval.setValue(self.config["auto_backup_interval"])
-        self.backup_interval.setSuffix(" 分钟")
-        layout.addRow("自动备份间隔:", self.backup_interval)
-
-        # 每存档最大备份数
-        self.max_backups = QSpinBox()
-        self.max_backups.setRange(1, 100)
-        self.max_backups.setValue(self.config["max_backups_per_save"])
-        layout.addRow("每存档最大备份数:", self.max_backups)
-
-    def setup_appearance_tab(self):
-        """设置外观选项"""
-        layout = QVBoxLayout(self.appearance_tab)
-
-        # 主题选择
-        theme_group = QGroupBox("主题")
-        theme_layout = QVBoxLayout(theme_group)
-
-        self.dark_theme_rb = QCheckBox("暗色主题")
-        self.light_theme_rb = QCheckBox("亮色主题")
-
-        self.dark_theme_rb.setChecked(self.config["theme"] == "dark")
-        self.light_theme_rb.setChecked(self.config["theme"] == "light")
-
-        # 互斥选择
-        self.dark_theme_rb.clicked.connect(
-            lambda: self.light_theme_rb.setChecked(not self.dark_theme_rb.isChecked())
-        )
-        self.light_theme_rb.clicked.connect(
-            lambda: self.dark_theme_rb.setChecked(not self.light_theme_rb.isChecked())
-        )
-
-        theme_layout.addWidget(self.dark_theme_rb)
-        theme_layout.addWidget(self.light_theme_rb)
-
-        layout.addWidget(theme_group)
-        layout.addStretch()
-
-    def choose_save_dir(self):
-        """选择存档目录"""
-        directory = QFileDialog.getExistingDirectory(
-            self, "选择存档目录", self.save_dir_edit.text()
-        )
-        if directory:
-            self.save_dir_edit.setText(directory)
-
-    def choose_backup_dir(self):
-        """选择备份目录"""
-        directory = QFileDialog.getExistingDirectory(
-            self, "选择备份目录", self.backup_dir_edit.text()
-        )
-        if directory:
-            self.backup_dir_edit.setText(directory)
-
-    def save_settings(self):
-        """保存设置"""
-        self.config["eu4_save_dir"] = self.save_dir_edit.text()
-        self.config["backup_dir"] = self.backup_dir_edit.text()
-        self.config["auto_backup_interval"] = self.backup_interval.value()
-        self.config["max_backups_per_save"] = self.max_backups.value()
-
-        if self.dark_theme_rb.isChecked():
-            self.config["theme"] = "dark"
-        else:
-            self.config["theme"] = "light"
-
-        if save_config(self.config):
-            self.accept()
-        else:
-            QMessageBox.critical(self, "错误", "保存设置失败，请检查日志获取更多信息。")
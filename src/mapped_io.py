@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+共享的文件读取模块
+
+计算校验值、解析存档和分块压缩都需要读取整个文件。逐段read时每段数据都要复制到
+新的bytes对象中，多个步骤各读一遍时还会重复读取。本模块用mmap把文件映射到内存，
+以memoryview切片的形式把内容交给哈希、解析和压缩，不复制数据；多个使用者可以
+共用同一个映射，在一次遍历中同时处理（read_pass）。
+
+文件系统不支持mmap（部分网络共享和虚拟文件系统）或文件为空时，改为普通的分段
+读取，接口不变。本模块不依赖Qt。
+"""
+
+import os
+import mmap
+import hashlib
+import logging
+
+# 分段处理时每段的字节数
+CHUNK_SIZE = 4 * 1024 * 1024
+
+
+class MappedFile:
+    """
+    只读的文件映射类
+
+    参数:
+        path: 文件路径
+
+    属性:
+        size: 文件大小
+        buffer: mmap对象（支持find和正则匹配），不能映射时为None
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self.size = os.fstat(self._file.fileno()).st_size
+        self.buffer = None
+        self._view = None
+        if self.size:
+            try:
+                self.buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError) as e:
+                logging.debug(f"无法映射文件，改为分段读取: {path}（{e}）")
+        if self.buffer is not None:
+            if hasattr(self.buffer, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                self.buffer.madvise(mmap.MADV_SEQUENTIAL)
+            self._view = memoryview(self.buffer)
+
+    @property
+    def mapped(self):
+        """文件是否已映射到内存"""
+        return self.buffer is not None
+
+    def view(self, offset=0, length=None):
+        """
+        读取一段内容
+
+        返回:
+            已映射时返回不复制数据的memoryview切片，否则返回读取的bytes
+        """
+        end = self.size if length is None else min(self.size, offset + length)
+        if self._view is not None:
+            return self._view[offset:end]
+        self._file.seek(offset)
+        return self._file.read(max(0, end - offset))
+
+    def chunks(self, chunk_size=CHUNK_SIZE):
+        """按顺序产出文件内容，每段为view的返回值"""
+        for offset in range(0, self.size, chunk_size):
+            yield self.view(offset, chunk_size)
+
+    def close(self):
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self.buffer is not None:
+            try:
+                self.buffer.close()
+            except BufferError:
+                # 仍有使用者持有切片，映射在切片被释放后由垃圾回收关闭
+                pass
+            self.buffer = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_pass(source, consumers, chunk_size=CHUNK_SIZE):
+    """
+    遍历一次文件，把每段内容依次交给所有使用者
+
+    参数:
+        source: MappedFile对象
+        consumers: 具有update(data)方法的对象列表，例如hashlib的哈希对象
+        chunk_size: 每段的字节数
+    """
+    for data in source.chunks(chunk_size):
+        for consumer in consumers:
+            consumer.update(data)
+
+
+def hash_file(path):
+    """文件内容（按存储的原样）的SHA-256校验值"""
+    digest = hashlib.sha256()
+    with MappedFile(path) as source:
+        read_pass(source, [digest])
+    return digest.hexdigest()
@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+运行指标模块
+
+在进程内记录各项操作的耗时分布（直方图）和计数器（复制的字节数、去重命中等），
+可以导出为JSON，或以Prometheus文本格式由守护进程通过HTTP提供。本模块不依赖Qt。
+
+一次备份的耗时会同时记录在 operation_seconds{op="create"} 和各阶段的
+stage_seconds{stage="copy|parse|hash|meta"} 中，备份变慢时可以看出是哪个阶段慢。
+
+用法:
+    from src.metrics import metrics
+
+    with metrics.timer("stage_seconds", stage="copy"):
+        ...
+    metrics.inc("bytes_copied_total", size)
+
+    @metrics.timed("operation_seconds", op="create")
+    def create_backup(...): ...
+"""
+
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+# Prometheus指标名前缀
+PREFIX = "eu4_backup_"
+
+# 直方图的桶上限（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# 已知指标的说明
+HELP = {
+    "operation_seconds": "备份管理器各操作的耗时",
+    "stage_seconds": "创建备份各阶段的耗时",
+    "index_write_seconds": "写入备份索引的耗时",
+    "scan_seconds": "扫描存档目录的耗时",
+    "parse_seconds": "解析存档的耗时",
+    "ui_refresh_seconds": "界面刷新的耗时",
+    "bytes_copied_total": "复制到备份目录的字节数",
+    "bytes_deduplicated_total": "因内容相同而无需复制的字节数",
+    "dedup_checks_total": "恢复前检查当前存档是否已有相同备份的次数",
+    "dedup_hits_total": "恢复前发现当前存档已有相同备份的次数",
+    "operation_errors_total": "失败的操作数",
+}
+
+
+class Histogram:
+    """耗时直方图类"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def to_dict(self):
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        buckets["+Inf"] = self.count
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "max": self.max,
+            "avg": self.sum / self.count if self.count else 0.0,
+            "buckets": buckets,
+        }
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key, extra=None):
+    items = list(key) + list((extra or {}).items())
+    if not items:
+        return ""
+    body = ",".join(f'{name}="{_escape(value)}"' for name, value in items)
+    return "{" + body + "}"
+
+
+class MetricsRegistry:
+    """进程内指标注册表类（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 指标名 -> {标签元组: Histogram}
+        self._histograms = {}
+        # 指标名 -> {标签元组: 数值}
+        self._counters = {}
+
+    def observe(self, name, seconds, **labels):
+        """记录一次耗时"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name, value=1, **labels):
+        """增加计数器"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """统计一个代码块的耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def timed(self, name, failed=None, **labels):
+        """
+        装饰器：统计函数每次调用的耗时，失败时计入operation_errors_total
+
+        参数:
+            name: 耗时指标名
+            failed: 判断返回值是否表示失败的函数。捕获异常后返回None或False的操作
+                需要提供，否则只有抛出的异常计为失败
+            labels: 指标标签
+        """
+
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    result = func(*args, **kwargs)
+                except Exception:
+                    self.inc("operation_errors_total", **labels)
+                    raise
+                finally:
+                    self.observe(name, time.perf_counter() - start, **labels)
+                if failed is not None and failed(result):
+                    self.inc("operation_errors_total", **labels)
+                return result
+
+            return wrapper
+
+        return decorator
+
+    def reset(self):
+        """清空所有指标"""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def _dedup_ratio(self):
+        """去重比例：无需复制的字节数占需要保存的总字节数的比例"""
+        copied = sum(self._counters.get("bytes_copied_total", {}).values())
+        saved = sum(self._counters.get("bytes_deduplicated_total", {}).values())
+        return saved / (copied + saved) if copied + saved else 0.0
+
+    def to_dict(self):
+        """
+        导出为可序列化的字典
+
+        返回:
+            {"histograms": {指标名: [{"labels", "count", "sum", ...}]},
+             "counters": {指标名: [{"labels", "value"}]}, "dedup_ratio": 比例}
+        """
+        with self._lock:
+            return {
+                "histograms": {
+                    name: [
+                        dict(histogram.to_dict(), labels=dict(key))
+                        for key, histogram in series.items()
+                    ]
+                    for name, series in self._histograms.items()
+                },
+                "counters": {
+                    name: [
+                        {"labels": dict(key), "value": value}
+                        for key, value in series.items()
+                    ]
+                    for name, series in self._counters.items()
+                },
+                "dedup_ratio": self._dedup_ratio(),
+            }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+
+    def write_json(self, path):
+        """把指标写入JSON文件，失败时返回False"""
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(self.to_json())
+            return True
+        except Exception as e:
+            logging.error(f"保存运行指标失败: {e}")
+            return False
+
+    def to_prometheus(self):
+        """导出为Prometheus文本格式"""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                full_name = PREFIX + name
+                if name in HELP:
+                    lines.append(f"# HELP {full_name} {HELP[name]}")
+                lines.append(f"# TYPE {full_name} histogram")
+                for key, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        labels = _format_labels(key, {"le": bound})
+                        lines.append(f"{full_name}_bucket{labels} {cumulative}")
+                    labels = _format_labels(key, {"le": "+Inf"})
+                    lines.append(f"{full_name}_bucket{labels} {histogram.count}")
+                    lines.append(f"{full_name}_sum{_format_labels(key)} {histogram.sum}")
+                    lines.append(f"{full_name}_count{_format_labels(key)} {histogram.count}")
+
+            for name, series in sorted(self._counters.items()):
+                full_name = PREFIX + name
+                if name in HELP:
+                    lines.append(f"# HELP {full_name} {HELP[name]}")
+                lines.append(f"# TYPE {full_name} counter")
+                for key, value in series.items():
+                    lines.append(f"{full_name}{_format_labels(key)} {value}")
+
+            lines.append(f"# TYPE {PREFIX}dedup_ratio gauge")
+            lines.append(f"{PREFIX}dedup_ratio {self._dedup_ratio()}")
+        return "\n".join(lines) + "\n"
+
+
+# 全局指标注册表
+metrics = MetricsRegistry()
+
+
+def serve_metrics(port, host="127.0.0.1", registry=None):
+    """
+    在后台线程中通过HTTP提供指标
+
+    /metrics 返回Prometheus文本格式，/metrics.json 返回JSON。
+
+    返回:
+        HTTP服务器对象，调用shutdown()停止
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    registry = registry or metrics
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body = registry.to_prometheus().encode("utf-8")
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            elif self.path == "/metrics.json":
+                body = registry.to_json().encode("utf-8")
+                content_type = "application/json; charset=utf-8"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # 不把每次抓取写入日志
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    thread = threading.Thread(
+        target=server.serve_forever, name="metrics-server", daemon=True
+    )
+    thread.start()
+    logging.info(f"运行指标服务已启动: http://{host}:{server.server_port}/metrics")
+    return server
@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+性能分析模块
+
+界面卡顿时往往无法在用户的机器上挂调试器。本模块提供一个可以在运行时开关的
+性能分析钩子：开启后，被 @profiler.profiled 装饰的操作（备份管理器的各项操作、
+主窗口的刷新处理函数）会用 cProfile 记录调用耗时、用 tracemalloc 记录内存分配，
+每次操作的结果写入 logs/profiles 目录：
+
+- <时间>_<操作>.prof: cProfile原始数据，可以用pstats或snakeviz查看；
+- <时间>_<操作>.txt: 累计耗时最多的函数和新增内存最多的代码行。
+
+开启方式（不在设置对话框中显示）:
+- 配置文件中的 "profiling": "cpu" | "memory" | "all"（"off"为关闭），
+  修改配置文件后立即生效；"profiling_sample_every": N 表示每个操作每N次调用分析一次；
+- 命令行 --profile cpu|memory|all，对图形界面和所有子命令都有效。
+
+关闭时装饰器只多一次属性判断，不启动cProfile和tracemalloc。
+同一时间只分析一个操作，嵌套的操作和其他线程中同时进行的操作直接执行。
+本模块不依赖Qt。
+"""
+
+import os
+import io
+import time
+import pstats
+import logging
+import threading
+from datetime import datetime
+from functools import wraps
+
+from src.config import LOG_DIR
+
+# 分析结果目录
+PROFILE_DIR = os.path.join(LOG_DIR, "profiles")
+# 支持的分析模式
+PROFILE_MODES = ("cpu", "memory", "all")
+# 最多保留的分析结果数（每次操作最多两个文件），超出时删除最早的
+MAX_PROFILE_FILES = 200
+# 报告中列出的函数数和内存分配位置数
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 20
+# tracemalloc记录的调用栈深度
+TRACEMALLOC_FRAMES = 10
+
+
+class OperationProfiler:
+    """操作性能分析器类"""
+
+    def __init__(self, output_dir=PROFILE_DIR):
+        self.output_dir = output_dir
+        # None表示关闭，否则为PROFILE_MODES之一
+        self.mode = None
+        self.sample_every = 1
+        self._calls = {}
+        self._active = threading.Lock()
+        self._local = threading.local()
+        self._started_tracemalloc = False
+        self._watching = False
+
+    @property
+    def enabled(self):
+        return self.mode is not None
+
+    def configure(self, mode, sample_every=1):
+        """
+        开启或关闭性能分析
+
+        参数:
+            mode: "cpu"、"memory"、"all"，None或"off"表示关闭
+            sample_every: 每个操作每几次调用分析一次
+        """
+        mode = None if mode in (None, "off") else mode
+        if mode is not None and mode not in PROFILE_MODES:
+            logging.error(f"不支持的性能分析模式: {mode}")
+            return
+        if mode == self.mode and sample_every == self.sample_every:
+            return
+
+        import tracemalloc
+
+        if mode in ("memory", "all"):
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+                self._started_tracemalloc = True
+        elif self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+        self.sample_every = max(1, sample_every)
+        self._calls = {}
+        self.mode = mode
+        if mode:
+            logging.info(f"性能分析已开启（{mode}），结果保存在: {self.output_dir}")
+        else:
+            logging.info("性能分析已关闭")
+
+    def watch_config(self):
+        """按配置中的profiling设置开关性能分析，配置修改后立即生效"""
+        from src.config import get_config_service
+
+        service = get_config_service()
+        if not self._watching:
+            service.subscribe(self._on_config_changed)
+            self._watching = True
+        self._apply_config(service.get())
+
+    def _on_config_changed(self, changes):
+        if "profiling" in changes or "profiling_sample_every" in changes:
+            from src.config import get_config_service
+
+            self._apply_config(get_config_service().get())
+
+    def _apply_config(self, config):
+        self.configure(config.get("profiling"), config.get("profiling_sample_every", 1))
+
+    def profiled(self, name):
+        """
+        装饰器：性能分析开启时分析函数的每次调用
+
+        参数:
+            name: 操作名称，用于结果文件名
+        """
+
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if self.mode is None:
+                    return func(*args, **kwargs)
+                return self._run(name, func, args, kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def _should_sample(self, name):
+        count = self._calls.get(name, 0) + 1
+        self._calls[name] = count
+        return (count - 1) % self.sample_every == 0
+
+    def _run(self, name, func, args, kwargs):
+        # 只分析最外层的操作，且同一时间只分析一个
+        if getattr(self._local, "busy", False) or not self._should_sample(name):
+            return func(*args, **kwargs)
+        if not self._active.acquire(blocking=False):
+            return func(*args, **kwargs)
+
+        self._local.busy = True
+        mode = self.mode
+        profile = before = None
+        try:
+            if mode in ("memory", "all"):
+                import tracemalloc
+
+                tracemalloc.reset_peak()
+                before = tracemalloc.take_snapshot()
+            if mode in ("cpu", "all"):
+                import cProfile
+
+                profile = cProfile.Profile()
+
+            start = time.perf_counter()
+            if profile is not None:
+                profile.enable()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                if profile is not None:
+                    profile.disable()
+                elapsed = time.perf_counter() - start
+                # 在生成报告之前取快照，报告本身的内存分配不计入
+                memory = self._memory_diff(before) if before is not None else None
+                self._write_report(name, elapsed, profile, memory)
+        finally:
+            self._local.busy = False
+            self._active.release()
+
+    def _write_report(self, name, elapsed, profile, memory):
+        """保存一次操作的分析结果，失败时只记录日志"""
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+            base = os.path.join(self.output_dir, f"{stamp}_{name}")
+
+            lines = [f"操作: {name}", f"耗时: {elapsed * 1000:.1f} ms", ""]
+            if profile is not None:
+                profile.dump_stats(base + ".prof")
+                lines += self._format_profile(profile)
+            if memory is not None:
+                lines += self._format_allocations(*memory)
+
+            with open(base + ".txt", "w", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            logging.info(f"已保存性能分析结果: {base}.txt（{elapsed * 1000:.1f} ms）")
+            self._cleanup()
+        except Exception as e:
+            logging.error(f"保存性能分析结果失败: {e}")
+
+    @staticmethod
+    def _format_profile(profile):
+        stream = io.StringIO()
+        stats = pstats.Stats(profile, stream=stream)
+        stats.strip_dirs().sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        return ["== 累计耗时最多的函数 ==", stream.getvalue().strip(), ""]
+
+    @staticmethod
+    def _memory_diff(before):
+        """
+        比较操作前后的内存快照
+
+        返回:
+            (操作期间的内存峰值, 按代码行统计的差异列表)
+        """
+        import tracemalloc
+
+        _, peak = tracemalloc.get_traced_memory()
+        ignore = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ]
+        after = tracemalloc.take_snapshot().filter_traces(ignore)
+        return peak, after.compare_to(before.filter_traces(ignore), "lineno")
+
+    @staticmethod
+    def _format_allocations(peak, diff):
+        lines = [
+            "== 新增内存最多的代码行 ==",
+            f"操作期间内存峰值: {peak / (1024 * 1024):.1f} MB",
+        ]
+        lines += [str(stat) for stat in diff[:TOP_ALLOCATIONS]]
+        lines.append("")
+        return lines
+
+    def _cleanup(self):
+        """删除超出数量限制的最早的分析结果"""
+        files = sorted(
+            entry.path for entry in os.scandir(self.output_dir) if entry.is_file()
+        )
+        for path in files[: max(0, len(files) - MAX_PROFILE_FILES)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+# 全局性能分析器
+profiler = OperationProfiler()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+存档对比模块
+
+在国家、省份、战争和国库等游戏层面比较两个存档，而不是逐字节比较。
+
+对比分两步进行，两个存档各用一个线程并行处理：
+1. 快速扫描两个存档的顶层条目并计算哈希，哈希相同的条目直接跳过
+   （未压缩的存档映射到内存后直接扫描，不复制存档内容）；
+2. 只对发生变化且需要关心的条目（countries、provinces、active_war等）逐行解析。
+解析结果只保留需要比较的字段，内存占用与存档大小无关。
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from src.metrics import metrics
+from src.mapped_io import MappedFile
+
+from src.save_parser import (
+    TEXT_MAGIC,
+    open_gamestate,
+    scan_buffer,
+    scan_sections,
+    iter_section_lines,
+    iter_entries,
+    iter_block_fields,
+    parse_assignment,
+)
+
+# 需要比较的国家字段
+COUNTRY_FIELDS = {
+    "treasury",
+    "stability",
+    "prestige",
+    "manpower",
+    "max_manpower",
+    "inflation",
+    "government_rank",
+    "num_of_cities",
+}
+# 需要比较的省份字段
+PROVINCE_FIELDS = {
+    "name",
+    "owner",
+    "controller",
+    "religion",
+    "culture",
+    "base_tax",
+    "base_production",
+    "base_manpower",
+}
+# 需要比较的顶层标量字段
+HEADER_FIELDS = ("date", "player", "campaign_id")
+WAR_SECTIONS = ("active_war",)
+
+
+@metrics.timed("parse_seconds", stage="scan")
+def _scan(save_path):
+    """扫描存档的顶层条目"""
+    with MappedFile(save_path) as source:
+        if source.mapped and source.view(0, len(TEXT_MAGIC)) == TEXT_MAGIC:
+            return scan_buffer(source.buffer)
+    with open_gamestate(save_path) as stream:
+        return scan_sections(stream)
+
+
+@metrics.timed("parse_seconds", stage="summarize")
+def _summarize(save_path, sections, wanted):
+    """
+    逐行解析存档中发生变化的顶层条目，只保留需要比较的字段
+
+    参数:
+        save_path: 存档文件路径
+        sections: scan_sections的返回值
+        wanted: 需要解析的顶层条目键的集合
+
+    返回:
+        {"header": {...}, "countries": {...}, "provinces": {...}, "wars": set()}
+    """
+    summary = {"header": {}, "countries": {}, "provinces": {}, "wars": set()}
+    with open_gamestate(save_path) as stream:
+        # 条目按偏移顺序处理，压缩存档只需要向前seek
+        for section in sections:
+            if section["key"] not in wanted:
+                continue
+            lines = iter_section_lines(stream, section["offset"], section["length"])
+            name = section["name"]
+
+            if name in ("countries", "provinces"):
+                fields = COUNTRY_FIELDS if name == "countries" else PROVINCE_FIELDS
+                summary[name] = {
+                    entry: {"hash": entry_hash, "values": values}
+                    for entry, entry_hash, values in iter_entries(lines, fields)
+                }
+            elif name in WAR_SECTIONS:
+                war = iter_block_fields(lines, {"name"})
+                summary["wars"].add(war.get("name", section["key"]))
+            elif name in HEADER_FIELDS:
+                assignment = parse_assignment(next(lines, b""))
+                if assignment:
+                    summary["header"][name] = assignment[1]
+    return summary
+
+
+def _diff_entries(old, new, label_field=None):
+    """
+    比较两组条目，只比较内容哈希不同的条目
+
+    参数:
+        label_field: 用于显示的名称字段，例如省份的name
+    """
+    result = {
+        "added": sorted(set(new) - set(old)),
+        "removed": sorted(set(old) - set(new)),
+        "changed": {},
+    }
+    for name in old.keys() & new.keys():
+        if old[name]["hash"] == new[name]["hash"]:
+            continue
+        old_values, new_values = old[name]["values"], new[name]["values"]
+        changes = {
+            field: (old_values.get(field), new_values.get(field))
+            for field in old_values.keys() | new_values.keys()
+            if old_values.get(field) != new_values.get(field)
+        }
+        if changes:
+            label = name
+            if label_field and new_values.get(label_field):
+                label = f"{name} ({new_values[label_field]})"
+            result["changed"][label] = changes
+    return result
+
+
+def diff_saves(old_path, new_path):
+    """
+    比较两个存档
+
+    参数:
+        old_path: 较早的存档路径
+        new_path: 较新的存档路径
+
+    返回:
+        {
+            "header": {字段: (旧值, 新值)},
+            "countries": {"added": [...], "removed": [...], "changed": {国家: {字段: (旧, 新)}}},
+            "provinces": {同上},
+            "wars": {"started": [...], "ended": [...]},
+            "changed_sections": [...],
+            "skipped_sections": 哈希相同而跳过的顶层条目数,
+        }
+
+    异常:
+        UnsupportedSaveError: 存档格式不支持
+    """
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        # 第一步：并行扫描顶层条目
+        old_sections, new_sections = executor.map(_scan, (old_path, new_path))
+        old_hashes = {s["key"]: s["hash"] for s in old_sections}
+        new_hashes = {s["key"]: s["hash"] for s in new_sections}
+
+        all_keys = old_hashes.keys() | new_hashes.keys()
+        changed = [key for key in all_keys if old_hashes.get(key) != new_hashes.get(key)]
+        skipped = len(all_keys) - len(changed)
+
+        # 只解析需要比较的条目
+        wanted = {
+            key
+            for key in changed
+            if key in ("countries", "provinces") or key in HEADER_FIELDS
+        }
+        # 战争条目的编号会随着战争的开始和结束而错位，只要有变化就全部重新解析
+        if any(key.split("#")[0] in WAR_SECTIONS for key in changed):
+            wanted |= {key for key in all_keys if key.split("#")[0] in WAR_SECTIONS}
+
+        # 第二步：并行解析发生变化的条目
+        old, new = executor.map(
+            _summarize,
+            (old_path, new_path),
+            (old_sections, new_sections),
+            (wanted, wanted),
+        )
+
+    return {
+        "header": {
+            field: (old["header"].get(field), new["header"].get(field))
+            for field in HEADER_FIELDS
+            if old["header"].get(field) != new["header"].get(field)
+        },
+        "countries": _diff_entries(old["countries"], new["countries"]),
+        "provinces": _diff_entries(old["provinces"], new["provinces"], "name"),
+        "wars": {
+            "started": sorted(new["wars"] - old["wars"]),
+            "ended": sorted(old["wars"] - new["wars"]),
+        },
+        "changed_sections": sorted(changed),
+        "skipped_sections": skipped,
+    }
+
+
+def format_diff(diff, player=None):
+    """
+    将对比结果格式化为文本
+
+    参数:
+        diff: diff_saves的返回值
+        player: 玩家国家代码，其变化排在最前面
+    """
+    lines = []
+    field_names = {"date": "游戏日期", "player": "玩家国家", "campaign_id": "战役ID"}
+    for field, (old, new) in diff["header"].items():
+        lines.append(f"{field_names.get(field, field)}: {old} -> {new}")
+
+    wars = diff["wars"]
+    if wars["started"] or wars["ended"]:
+        lines.append("")
+        lines.append("战争:")
+        lines.extend(f"  + {name}" for name in wars["started"])
+        lines.extend(f"  - {name}" for name in wars["ended"])
+
+    for key, title in (("countries", "国家"), ("provinces", "省份")):
+        entries = diff[key]
+        if not (entries["added"] or entries["removed"] or entries["changed"]):
+            continue
+        lines.append("")
+        lines.append(f"{title}:")
+        lines.extend(f"  + {name}" for name in entries["added"])
+        lines.extend(f"  - {name}" for name in entries["removed"])
+
+        names = sorted(entries["changed"], key=lambda n: (n != player, n))
+        for name in names:
+            changes = entries["changed"][name]
+            details = ", ".join(
+                f"{field}: {old} -> {new}"
+                for field, (old, new) in sorted(changes.items())
+            )
+            lines.append(f"  * {name}: {details}")
+
+    if not lines:
+        lines.append("两个存档的国家、省份和战争没有差异")
+
+    lines.append("")
+    lines.append(
+        f"共 {len(diff['changed_sections'])} 个顶层条目发生变化，"
+        f"跳过 {diff['skipped_sections']} 个未变化的条目"
+    )
+    return "\n".join(lines)
@@ -0,0 +1,333 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+存档解析模块
+
+解析EU4文本格式（EU4txt）的存档，支持未压缩的存档和zip压缩的存档
+（读取其中的gamestate），以及备份中分块压缩的存档（见block_codec）。铁人模式使用的二进制格式（EU4bin）需要游戏的
+令牌表才能解码，目前不支持。
+
+EU4文本存档的顶层条目从行首开始，嵌套内容用制表符缩进，顶层块的右括号
+位于行首。解析时利用这一结构按行流式处理，不会把整个存档读入内存：
+
+    date=1444.11.11
+    countries={
+    	FRA={
+    		treasury=100.000
+    	}
+    }
+"""
+
+import io
+import re
+import hashlib
+import zipfile
+
+from src.block_codec import is_block_file, open_block_file
+
+# 流式读取时每次读取的字节数
+READ_CHUNK_SIZE = 4 * 1024 * 1024
+# 从映射中读取存档开头信息时使用的数据量
+HEADER_SCAN_BYTES = 64 * 1024
+
+TEXT_MAGIC = b"EU4txt"
+BINARY_MAGIC = b"EU4bin"
+
+# 顶层条目的起始位置：行首且不是空白或右括号
+_TOP_LEVEL_RE = re.compile(rb"^(?=[^\s}])", re.M)
+
+
+class UnsupportedSaveError(Exception):
+    """不支持的存档格式"""
+
+
+def open_gamestate(save_path):
+    """
+    打开存档中的游戏状态数据
+
+    参数:
+        save_path: 存档文件路径
+
+    返回:
+        可读取、可向前seek的二进制流，内容以EU4txt开头
+    """
+    if is_block_file(save_path):
+        # 备份中分块压缩的存档或存档条目，按需解压读取的块
+        stream = open_block_file(save_path)
+    elif zipfile.is_zipfile(save_path):
+        # zip文件在成员流关闭后才会真正关闭
+        with zipfile.ZipFile(save_path) as archive:
+            try:
+                stream = archive.open("gamestate")
+            except KeyError:
+                raise UnsupportedSaveError("压缩存档中缺少gamestate")
+    else:
+        stream = open(save_path, "rb")
+
+    magic = stream.read(len(TEXT_MAGIC))
+    if magic != TEXT_MAGIC:
+        stream.close()
+        if magic == BINARY_MAGIC:
+            raise UnsupportedSaveError("暂不支持二进制（铁人模式）存档")
+        raise UnsupportedSaveError("无法识别的存档格式")
+    stream.seek(0)
+    return stream
+
+
+def _section_name(buf, start):
+    """读取从start开始的顶层条目的键名"""
+    line_end = buf.find(b"\n", start)
+    if line_end < 0:
+        line_end = len(buf)
+    eq = buf.find(b"=", start, line_end)
+    end = eq if eq >= 0 else line_end
+    return buf[start:end].strip().decode("utf-8", "replace")
+
+
+def scan_sections(stream):
+    """
+    扫描顶层条目
+
+    只做正则匹配和哈希计算，不逐行解析，用于快速判断哪些条目发生了变化。
+    同名的顶层条目（例如多个active_war）按出现顺序依次编号。
+
+    返回:
+        条目列表，每项为 {"key", "name", "offset", "length", "hash"}
+    """
+    sections = []
+    counts = {}
+    current = None
+    base = 0  # buf[0]在流中的偏移
+    carry = b""
+
+    def close(end):
+        current["length"] = end - current["offset"]
+        current["hash"] = current.pop("hasher").hexdigest()
+        sections.append(current)
+
+    while True:
+        chunk = stream.read(READ_CHUNK_SIZE)
+        if chunk:
+            buf = carry + chunk
+            # 只处理完整的行，最后不完整的一行留到下一次
+            cut = buf.rfind(b"\n") + 1
+            buf, carry = buf[:cut], buf[cut:]
+        else:
+            buf, carry = carry, b""
+        if not buf:
+            if not chunk:
+                break
+            continue
+
+        pos = 0
+        for match in _TOP_LEVEL_RE.finditer(buf):
+            start = match.start()
+            if current is not None:
+                current["hasher"].update(buf[pos:start])
+                close(base + start)
+            name = _section_name(buf, start)
+            counts[name] = counts.get(name, 0) + 1
+            current = {
+                "key": name if counts[name] == 1 else f"{name}#{counts[name]}",
+                "name": name,
+                "offset": base + start,
+                "hasher": hashlib.sha1(),
+            }
+            pos = start
+        if current is not None:
+            current["hasher"].update(buf[pos:])
+        base += len(buf)
+
+        if not chunk:
+            break
+
+    if current is not None:
+        close(base)
+    return sections
+
+
+def scan_buffer(buf):
+    """
+    扫描映射到内存的文本存档的顶层条目，结果与scan_sections相同
+
+    直接在映射上匹配，并把memoryview切片交给哈希对象，不复制存档内容。
+
+    参数:
+        buf: mmap对象（见mapped_io.MappedFile.buffer）
+    """
+    sections = []
+    counts = {}
+    view = memoryview(buf)
+    try:
+        current = None
+        for match in _TOP_LEVEL_RE.finditer(buf):
+            start = match.start()
+            if current is not None:
+                current["length"] = start - current["offset"]
+            name = _section_name(buf, start)
+            counts[name] = counts.get(name, 0) + 1
+            current = {
+                "key": name if counts[name] == 1 else f"{name}#{counts[name]}",
+                "name": name,
+                "offset": start,
+            }
+            sections.append(current)
+        if current is not None:
+            current["length"] = len(buf) - current["offset"]
+        for section in sections:
+            start = section["offset"]
+            section["hash"] = hashlib.sha1(view[start : start + section["length"]]).hexdigest()
+    finally:
+        view.release()
+    return sections
+
+
+def iter_section_lines(stream, offset, length):
+    """按行读取流中指定范围的内容（不含行尾换行符）"""
+    stream.seek(offset)
+    remaining = length
+    carry = b""
+    while remaining > 0:
+        chunk = stream.read(min(READ_CHUNK_SIZE, remaining))
+        if not chunk:
+            break
+        remaining -= len(chunk)
+        lines = (carry + chunk).split(b"\n")
+        carry = lines.pop()
+        yield from lines
+    if carry:
+        yield carry
+
+
+def parse_value(raw):
+    """解析标量值：去掉字符串的引号，数字转换为int或float"""
+    raw = raw.strip()
+    if len(raw) >= 2 and raw.startswith(b'"') and raw.endswith(b'"'):
+        return raw[1:-1].decode("utf-8", "replace")
+    text = raw.decode("utf-8", "replace")
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+def parse_assignment(line):
+    """
+    解析一行 key=value 形式的标量赋值
+
+    返回:
+        (键, 值)，不是标量赋值（例如块的开始）时返回None
+    """
+    eq = line.find(b"=")
+    if eq <= 0:
+        return None
+    value = line[eq + 1 :]
+    if b"{" in value or b"}" in value:
+        return None
+    return line[:eq].strip().decode("utf-8", "replace"), parse_value(value)
+
+
+def iter_entries(lines, fields):
+    """
+    拆分顶层块中的一级条目（例如countries中的每个国家）
+
+    参数:
+        lines: 顶层块的行迭代器
+        fields: 需要提取的二级标量字段名集合
+
+    返回:
+        生成器，每项为 (条目名, 条目内容哈希, {字段: 值})
+    """
+    name = None
+    hasher = None
+    values = None
+    for line in lines:
+        if line.startswith(b"\t\t"):
+            if name is None:
+                continue
+            hasher.update(line)
+            if not line.startswith(b"\t\t\t"):
+                assignment = parse_assignment(line)
+                if assignment and assignment[0] in fields:
+                    values[assignment[0]] = assignment[1]
+        elif line.startswith(b"\t") and not line.startswith(b"\t}"):
+            if name is not None:
+                yield name, hasher.hexdigest(), values
+            eq = line.find(b"=")
+            name = line[1 : eq if eq > 0 else len(line)].strip().decode(
+                "utf-8", "replace"
+            )
+            hasher = hashlib.sha1(line)
+            values = {}
+        elif name is not None:
+            hasher.update(line)
+    if name is not None:
+        yield name, hasher.hexdigest(), values
+
+
+def iter_block_fields(lines, fields):
+    """
+    读取顶层块中的一级标量字段
+
+    返回:
+        {字段: 值}，同名字段只保留第一个
+    """
+    values = {}
+    for line in lines:
+        if line.startswith(b"\t") and not line.startswith(b"\t\t"):
+            assignment = parse_assignment(line[1:])
+            if assignment and assignment[0] in fields:
+                values.setdefault(assignment[0], assignment[1])
+    return values
+
+
+def read_header(save_path, fields=("date", "player", "campaign_id"), max_lines=200, source=None):
+    """
+    读取存档开头的顶层标量字段（游戏日期、玩家国家等）
+
+    只读取存档开头的少量行，不会扫描整个存档。未压缩的文本存档直接从映射中读取。
+
+    参数:
+        save_path: 存档文件路径
+        fields: 需要读取的字段
+        max_lines: 最多读取的行数
+        source: 已经打开的该存档的MappedFile，与计算校验值等步骤共用同一个映射
+
+    返回:
+        {字段: 值}，不支持的存档格式返回空字典
+    """
+    if source is not None and source.view(0, len(TEXT_MAGIC)) == TEXT_MAGIC:
+        data = bytes(source.view(0, HEADER_SCAN_BYTES))
+        if source.size > len(data):
+            # 去掉被截断的最后一行
+            data = data[: data.rfind(b"\n") + 1]
+        return _read_header_lines(io.BytesIO(data), fields, max_lines)
+
+    try:
+        stream = open_gamestate(save_path)
+    except (UnsupportedSaveError, OSError):
+        return {}
+    with stream:
+        return _read_header_lines(stream, fields, max_lines)
+
+
+def _read_header_lines(stream, fields, max_lines):
+    """从流的开头逐行读取顶层标量字段"""
+    values = {}
+    for _ in range(max_lines):
+        line = stream.readline()
+        if not line:
+            break
+        if line[:1].isspace():
+            continue
+        assignment = parse_assignment(line.rstrip(b"\r\n"))
+        if assignment and assignment[0] in fields:
+            values.setdefault(assignment[0], assignment[1])
+        if len(values) == len(fields):
+            break
+    return values
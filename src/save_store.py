@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+zip存档的规范化存储模块
+
+压缩存档（.eu4）是包含 meta、gamestate 和 ai 的zip文件。deflate压缩会打乱字节：
+两次备份之间即使只有少量内容变化，压缩后的文件也几乎完全不同，按字节或分块
+去重、增量同步都找不到可以复用的部分。
+
+规范化存储把zip中的每个条目解压后保存为单独的普通文件，同时记录重建zip所需的
+布局参数（条目顺序、压缩方式和压缩级别、时间、属性、注释等）以及每个条目的
+SHA-256。恢复时按布局重新压缩出zip存档，写入过程中校验每个条目的内容。
+读写都按块流式进行，不会把整个条目读入内存。条目文件可以再用block_codec分块压缩
+（compress_entries），读取时自动按原始内容解压。
+
+重建的存档与原存档的内容完全相同；压缩后的字节通常也相同，但这取决于zlib的
+版本，不作保证。本模块不依赖Qt。
+"""
+
+import os
+import re
+import zlib
+import struct
+import hashlib
+import zipfile
+
+from src.block_codec import BLOCK_SUFFIX, compress_file, iter_chunks
+
+# 流式读写时每次处理的字节数
+COPY_CHUNK_SIZE = 1024 * 1024
+# 试探压缩级别时使用的条目开头数据量
+LEVEL_PROBE_SIZE = 1024 * 1024
+# 试探压缩级别时至少需要比较的压缩数据量
+LEVEL_PROBE_MIN_OUTPUT = 4096
+# 试探的deflate压缩级别，zlib默认级别优先
+LEVEL_CANDIDATES = (6, 9, 1, 2, 3, 4, 5, 7, 8)
+# 布局格式版本
+LAYOUT_VERSION = 1
+
+# zip本地文件头的签名和长度
+_LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+_LOCAL_HEADER_SIZE = 30
+# zip64扩展字段的标识，重建时由zipfile按需要重新生成
+_ZIP64_EXTRA_ID = 0x0001
+
+
+def is_zip_save(path):
+    """判断存档是否是zip压缩存档"""
+    return zipfile.is_zipfile(path)
+
+
+def entry_file_name(index, name):
+    """条目在备份目录中的文件名（单层文件名，不含路径分隔符）"""
+    return f"zipentry{index}_{re.sub(r'[^0-9A-Za-z._-]', '_', name)}"
+
+
+def _split_extra(extra):
+    """把扩展字段拆分为 (标识, 完整记录) 列表"""
+    records = []
+    pos = 0
+    while pos + 4 <= len(extra):
+        header_id, size = struct.unpack("<HH", extra[pos : pos + 4])
+        records.append((header_id, extra[pos : pos + 4 + size]))
+        pos += 4 + size
+    return records
+
+
+def _strip_zip64_extra(extra):
+    """去掉扩展字段中的zip64记录，其他记录原样保留"""
+    return b"".join(
+        record for header_id, record in _split_extra(extra) if header_id != _ZIP64_EXTRA_ID
+    )
+
+
+def _read_local_header(f, info):
+    """
+    读取条目的本地文件头
+
+    返回:
+        (压缩数据在zip文件中的起始位置, 本地文件头中的扩展字段)
+    """
+    f.seek(info.header_offset)
+    header = f.read(_LOCAL_HEADER_SIZE)
+    if len(header) < _LOCAL_HEADER_SIZE or header[:4] != _LOCAL_HEADER_SIGNATURE:
+        raise zipfile.BadZipFile(f"条目的本地文件头损坏: {info.filename}")
+    name_length, extra_length = struct.unpack("<HH", header[26:30])
+    f.seek(name_length, os.SEEK_CUR)
+    extra = f.read(extra_length)
+    return info.header_offset + _LOCAL_HEADER_SIZE + name_length + extra_length, extra
+
+
+def _detect_level(archive, raw_file, info, data_offset):
+    """
+    试探条目使用的deflate压缩级别
+
+    用各个级别压缩条目开头的数据，与原文件中的压缩数据比较，
+    得到相同输出的级别即为原存档使用的级别。
+
+    返回:
+        压缩级别，不是deflate压缩或无法确定时返回None
+    """
+    if info.compress_type != zipfile.ZIP_DEFLATED or not info.file_size:
+        return None
+
+    with archive.open(info) as src:
+        data = src.read(LEVEL_PROBE_SIZE)
+    raw_file.seek(data_offset)
+    raw = raw_file.read(min(info.compress_size, LEVEL_PROBE_SIZE))
+
+    for level in LEVEL_CANDIDATES:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        output = compressor.compress(data)
+        if len(data) == info.file_size:
+            # 整个条目都在试探数据中，可以比较完整的压缩结果
+            output += compressor.flush()
+        elif len(output) < LEVEL_PROBE_MIN_OUTPUT:
+            # 输出太少，无法区分各个级别
+            return None
+        length = min(len(output), len(raw))
+        if length and output[:length] == raw[:length]:
+            return level
+    return None
+
+
+def _set_compress_level(info, level):
+    # Python 3.13起为公开属性compress_level，之前的版本为_compresslevel
+    if hasattr(info, "compress_level"):
+        info.compress_level = level
+    else:
+        info._compresslevel = level
+
+
+def normalize_zip(save_path, dest_dir):
+    """
+    把zip存档的各个条目解压保存到dest_dir中
+
+    读取条目时zipfile会校验CRC，损坏的存档会抛出异常。
+
+    参数:
+        save_path: zip存档路径
+        dest_dir: 保存条目文件的目录（通常是备份目录）
+
+    返回:
+        布局字典 {"version", "comment", "entries": [...]}，每个条目记录文件名、
+        大小、SHA-256以及重建zip所需的参数
+    """
+    entries = []
+    with zipfile.ZipFile(save_path) as archive, open(save_path, "rb") as raw_file:
+        for index, info in enumerate(archive.infolist()):
+            file_name = entry_file_name(index, info.filename)
+            data_offset, local_extra = _read_local_header(raw_file, info)
+            digest = hashlib.sha256()
+            with archive.open(info) as src, open(
+                os.path.join(dest_dir, file_name), "wb"
+            ) as dst:
+                for chunk in iter(lambda: src.read(COPY_CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    dst.write(chunk)
+
+            entries.append(
+                {
+                    "name": info.filename,
+                    "file": file_name,
+                    "size": info.file_size,
+                    "sha256": digest.hexdigest(),
+                    "compress_type": info.compress_type,
+                    "compress_level": _detect_level(archive, raw_file, info, data_offset),
+                    # 小条目也可能使用了zip64格式（例如流式写入的存档）
+                    "zip64": any(
+                        header_id == _ZIP64_EXTRA_ID
+                        for header_id, _ in _split_extra(local_extra)
+                    ),
+                    "date_time": list(info.date_time),
+                    "comment": info.comment.hex(),
+                    "extra": _strip_zip64_extra(info.extra).hex(),
+                    "create_system": info.create_system,
+                    "create_version": info.create_version,
+                    "extract_version": info.extract_version,
+                    "internal_attr": info.internal_attr,
+                    "external_attr": info.external_attr,
+                }
+            )
+        comment = archive.comment
+
+    return {"version": LAYOUT_VERSION, "comment": comment.hex(), "entries": entries}
+
+
+def restore_zip(layout, source_dir, dest_path, workers=None):
+    """
+    按布局把条目文件重新压缩为zip存档
+
+    参数:
+        layout: normalize_zip返回的布局
+        source_dir: 条目文件所在的目录
+        dest_path: 输出的zip存档路径
+        workers: 解压分块压缩的条目文件时使用的线程数，为None时使用CPU核数
+
+    异常:
+        条目文件缺失时抛出OSError，条目内容与记录的校验值不一致或条目文件损坏时抛出ValueError
+        （dest_path中可能留下不完整的文件，由调用方删除）
+    """
+    with zipfile.ZipFile(dest_path, "w") as archive:
+        archive.comment = bytes.fromhex(layout["comment"])
+        for entry in layout["entries"]:
+            info = zipfile.ZipInfo(entry["name"], tuple(entry["date_time"]))
+            info.compress_type = entry["compress_type"]
+            if entry["compress_level"] is not None:
+                _set_compress_level(info, entry["compress_level"])
+            info.comment = bytes.fromhex(entry["comment"])
+            info.extra = bytes.fromhex(entry["extra"])
+            info.create_system = entry["create_system"]
+            info.create_version = entry["create_version"]
+            info.extract_version = entry["extract_version"]
+            info.internal_attr = entry["internal_attr"]
+            info.external_attr = entry["external_attr"]
+            # 预先告诉zipfile条目的大小，由它决定是否需要zip64
+            info.file_size = entry["size"]
+
+            digest = hashlib.sha256()
+            path = os.path.join(source_dir, entry["file"])
+            with archive.open(info, "w", force_zip64=entry.get("zip64", False)) as dst:
+                for chunk in iter_chunks(path, workers):
+                    digest.update(chunk)
+                    dst.write(chunk)
+            if digest.hexdigest() != entry["sha256"]:
+                raise ValueError(f"备份中的存档条目已损坏: {entry['name']}")
+
+
+def verify_entries(layout, source_dir, workers=None):
+    """
+    校验条目文件的大小和SHA-256（分块压缩的条目文件按解压后的内容校验）
+
+    返回:
+        全部一致时返回None，否则返回错误信息
+    """
+    for entry in layout["entries"]:
+        path = os.path.join(source_dir, entry["file"])
+        if not os.path.exists(path):
+            return f"存档条目缺失: {entry['name']}"
+        if not entry.get("compression") and os.path.getsize(path) != entry["size"]:
+            return f"存档条目大小不一致: {entry['name']}"
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            for chunk in iter_chunks(path, workers):
+                digest.update(chunk)
+                size += len(chunk)
+        except ValueError:
+            return f"存档条目已损坏: {entry['name']}"
+        if size != entry["size"]:
+            return f"存档条目大小不一致: {entry['name']}"
+        if digest.hexdigest() != entry["sha256"]:
+            return f"存档条目校验值不一致: {entry['name']}"
+    return None
+
+
+def gamestate_path(layout, source_dir):
+    """gamestate条目文件的路径（可以直接用save_parser解析），没有时返回None"""
+    for entry in layout["entries"]:
+        if entry["name"] == "gamestate":
+            return os.path.join(source_dir, entry["file"])
+    return None
+
+
+def compress_entries(layout, source_dir, codec, workers=None):
+    """
+    把条目文件分块压缩（见block_codec），并在布局中记录压缩后的文件名和压缩方式
+
+    参数:
+        layout: normalize_zip返回的布局，会被直接修改
+        source_dir: 条目文件所在的目录
+        codec: block_codec.CODECS中的压缩方式
+        workers: 压缩线程数，为None时使用CPU核数
+    """
+    for entry in layout["entries"]:
+        path = os.path.join(source_dir, entry["file"])
+        compress_file(path, path + BLOCK_SUFFIX, codec, workers)
+        os.remove(path)
+        entry["file"] += BLOCK_SUFFIX
+        entry["compression"] = codec
+
+
+def stored_size(layout, source_dir):
+    """条目文件实际占用的总大小（字节）"""
+    return sum(
+        os.path.getsize(os.path.join(source_dir, entry["file"])) for entry in layout["entries"]
+    )
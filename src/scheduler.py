@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+自动备份调度模块
+
+存档监视器（watcher）报告写入完成的存档后，由调度器决定何时、按什么顺序备份:
+
+- 合并：游戏自动存档时会在几秒内轮换并写入多个存档（autosave、old_autosave ...），
+  同一存档也可能连续写入多次。同一战役的存档变化合并为一个任务，只备份其中最新
+  的存档；每次变化后等待 backup_coalesce_seconds 秒，期间再有变化时重新计时，
+  但从第一次变化起最多等待 COALESCE_MAX_FACTOR 倍的时间；
+- 现实时间间隔：距离该存档上次备份超过 auto_backup_interval 分钟才备份，未到间隔的
+  任务推迟到间隔结束时（或下一次变化时）再判断，届时备份最新的存档，不会丢掉
+  最后一次变化；
+- 游戏内周期：auto_backup_game_months 不为0时，游戏日期比上次备份前进了这么多个月
+  也会备份（例如每10年一次），不受现实时间间隔的限制，这类备份作为时间线上的
+  里程碑保留（标签为milestone）；
+- save_schedules 可以按存档名覆盖以上两个间隔，并指定优先级；
+- 优先级队列：到期的任务按存档的优先级（越大越先）、再按触发原因（游戏内周期优先）
+  排序，每轮最多启动 max_jobs 个，其余留到下一轮；
+- 休眠恢复：两轮检查之间的现实时间远大于正常的轮询间隔时（电脑休眠或进程被挂起），
+  积压的任务不会同时启动，而是按优先级依次错开。
+
+本模块不依赖Qt，由守护进程和图形界面共用。
+"""
+
+import os
+import time
+import heapq
+import logging
+import itertools
+from datetime import datetime
+
+from src.campaign import CAMPAIGN_FIELDS, campaign_key
+from src.metrics import metrics
+from src.save_parser import read_header
+from src.timeline import parse_game_date
+
+# 合并等待时间的上限（相对于backup_coalesce_seconds的倍数）
+COALESCE_MAX_FACTOR = 4
+# 两轮检查的现实时间间隔超过该值（秒）时视为从休眠中恢复
+RESUME_GAP_SECONDS = 300
+# 休眠恢复后积压任务之间的间隔（秒）
+RESUME_STAGGER_SECONDS = 30
+# 每轮最多启动的备份数
+MAX_JOBS_PER_TICK = 4
+
+# 触发原因，数值越小越先执行
+REASON_MILESTONE = 0
+REASON_FIRST = 1
+REASON_INTERVAL = 2
+
+
+def game_months_between(old_date, new_date):
+    """两个游戏日期之间相差的月数（不足一个月的部分不计）"""
+    months = (new_date[0] - old_date[0]) * 12 + new_date[1] - old_date[1]
+    if new_date[2] < old_date[2]:
+        months -= 1
+    return months
+
+
+class BackupScheduler:
+    """
+    自动备份调度器类
+
+    参数:
+        backup_manager: 备份管理器，用于读取配置和各存档上次备份的时间、游戏日期
+        max_jobs: 每轮最多启动的备份数
+        clock: 计算合并等待时间的时钟（单调时钟）
+        wall_clock: 判断休眠恢复和现实时间间隔的现实时钟
+    """
+
+    def __init__(
+        self,
+        backup_manager,
+        max_jobs=MAX_JOBS_PER_TICK,
+        clock=time.monotonic,
+        wall_clock=time.time,
+    ):
+        self.backup_manager = backup_manager
+        self.max_jobs = max_jobs
+        self.clock = clock
+        self.wall_clock = wall_clock
+        # 等待中的任务: 合并键 -> 任务
+        self._jobs = {}
+        # 到期时间的最小堆: (到期时间, 序号, 合并键)，任务更新后旧记录按序号作废
+        self._heap = []
+        self._seq = itertools.count()
+        self._last_tick = None
+
+    @property
+    def config(self):
+        return self.backup_manager.config
+
+    def pending_count(self):
+        """等待中的任务数"""
+        return len(self._jobs)
+
+    def _settings(self, save_name):
+        """存档的调度设置: {"interval": 分钟, "game_months": 月数, "priority": 优先级}"""
+        settings = {
+            "interval": self.config["auto_backup_interval"],
+            "game_months": self.config["auto_backup_game_months"],
+            "priority": 0,
+        }
+        override = self.config["save_schedules"].get(save_name)
+        if isinstance(override, dict):
+            for key in settings:
+                value = override.get(key)
+                if isinstance(value, int) and not isinstance(value, bool) and value >= 0:
+                    settings[key] = value
+        return settings
+
+    def _push(self, key, job):
+        job["seq"] = next(self._seq)
+        heapq.heappush(self._heap, (job["due"], job["seq"], key))
+
+    def notify(self, save_file):
+        """
+        报告写入完成的存档
+
+        参数:
+            save_file: 存档信息（与get_save_files的元素格式相同）
+        """
+        now = self.clock()
+        save_name = os.path.splitext(save_file["name"])[0]
+        header = read_header(save_file["path"], CAMPAIGN_FIELDS)
+        key = campaign_key(header, save_name)
+        window = self.config["backup_coalesce_seconds"]
+
+        job = self._jobs.get(key)
+        if job is None:
+            job = {"save_file": save_file, "first": now}
+            self._jobs[key] = job
+        else:
+            metrics.inc("scheduler_coalesced_total")
+            # 合并后备份同一战役中最新写入的存档
+            if save_file["modified"] >= job["save_file"]["modified"]:
+                job["save_file"], save_file = save_file, job["save_file"]
+            if save_file["path"] != job["save_file"]["path"]:
+                logging.info(f"合并存档变化: {save_file['name']} -> {job['save_file']['name']}")
+        job["due"] = min(job["first"] + window * COALESCE_MAX_FACTOR, now + window)
+        self._push(key, job)
+
+    def _last_backup(self, save_name):
+        """存档最近一次备份的 (备份时间, 游戏日期)，没有备份时返回(None, None)"""
+        with self.backup_manager._reading():
+            backups = list(self.backup_manager.backup_index.get(save_name, []))
+        if not backups:
+            return None, None
+        latest = max(backups, key=lambda b: b["time"])
+        return datetime.fromisoformat(latest["time"]), parse_game_date(latest.get("game_date"))
+
+    def _decide(self, save_file):
+        """
+        判断到期的任务是否需要备份
+
+        返回:
+            ((排序键, 触发原因, 描述, 标签), None)，还不需要备份时返回
+            (None, 距离间隔结束的秒数)
+        """
+        save_name = os.path.splitext(save_file["name"])[0]
+        settings = self._settings(save_name)
+        last_time, last_date = self._last_backup(save_name)
+
+        reason = None
+        if last_time is None:
+            reason = REASON_FIRST
+        else:
+            if settings["game_months"] and last_date:
+                date = parse_game_date(read_header(save_file["path"], ("date",)).get("date"))
+                if date and game_months_between(last_date, date) >= settings["game_months"]:
+                    reason = REASON_MILESTONE
+            elapsed = datetime.fromtimestamp(self.wall_clock()) - last_time
+            remaining = settings["interval"] * 60 - elapsed.total_seconds()
+            if reason is None:
+                if remaining > 0:
+                    return None, remaining
+                reason = REASON_INTERVAL
+
+        if reason == REASON_MILESTONE:
+            description = f"自动备份（每 {settings['game_months']} 个游戏月）"
+            tags = ["milestone"]
+        else:
+            description, tags = "自动备份", ["auto"]
+        return ((-settings["priority"], reason), reason, description, tags), None
+
+    def _detect_resume(self):
+        """两轮检查之间的现实时间间隔过长时，把积压的任务按优先级错开"""
+        wall = self.wall_clock()
+        last, self._last_tick = self._last_tick, wall
+        if last is None or wall - last < RESUME_GAP_SECONDS:
+            return False
+
+        now = self.clock()
+        overdue = [(key, job) for key, job in self._jobs.items() if job["due"] <= now]
+        if not overdue:
+            return True
+        logging.info(f"检测到休眠或挂起 {int(wall - last)} 秒，{len(overdue)} 个积压的备份将依次执行")
+        overdue.sort(
+            key=lambda item: (
+                -self._settings(os.path.splitext(item[1]["save_file"]["name"])[0])["priority"],
+                item[1]["first"],
+            )
+        )
+        for i, (key, job) in enumerate(overdue):
+            job["due"] = now + i * RESUME_STAGGER_SECONDS
+            self._push(key, job)
+        return True
+
+    def due_jobs(self):
+        """
+        取出已经到期、需要备份的任务
+
+        返回:
+            [{"save_file", "description", "tags"}]，按优先级排列，最多max_jobs个
+        """
+        self._detect_resume()
+        now = self.clock()
+
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, seq, key = heapq.heappop(self._heap)
+            job = self._jobs.get(key)
+            if job is not None and job["seq"] == seq:
+                due.append((key, job))
+
+        ready = []
+        for key, job in due:
+            decision, wait = self._decide(job["save_file"])
+            if decision is None:
+                # 推迟期间有新的变化时重新判断（游戏内周期可能已经到了），
+                # 从那次变化开始重新计算合并等待时间
+                job["due"] = job["first"] = now + wait
+                self._push(key, job)
+                logging.info(f"未到自动备份间隔，推迟 {int(wait)} 秒: {job['save_file']['name']}")
+                continue
+            ready.append((decision, key, job))
+        ready.sort(key=lambda item: (item[0][0], item[2]["due"]))
+
+        jobs = []
+        for (_, _, description, tags), key, job in ready[: self.max_jobs]:
+            del self._jobs[key]
+            jobs.append({"save_file": job["save_file"], "description": description, "tags": tags})
+        # 超出本轮上限的任务留到下一轮，仍按原来的到期时间排序
+        for _, key, job in ready[self.max_jobs :]:
+            self._push(key, job)
+        return jobs
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+启动耗时统计模块
+
+记录程序启动各阶段（模块导入、窗口创建、首次绘制、后台加载等）的耗时，
+以类似 `python -X importtime` 的格式输出报告，并可与基准报告比较以发现性能退化。
+本模块不依赖Qt。
+
+用法:
+    python main.py --startup-report
+    python -m src.startup <当前报告.json> <基准报告.json> [--tolerance 0.2]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+from contextlib import contextmanager
+
+
+class StartupTimer:
+    """启动阶段计时器类"""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        # 已完成的阶段: (名称, 耗时[秒], 嵌套深度)
+        self.phases = []
+        self._depth = 0
+        self._marks = {}
+
+    @contextmanager
+    def phase(self, name):
+        """统计一个代码块的耗时，可以嵌套使用"""
+        depth = self._depth
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            self.phases.append((name, time.perf_counter() - start, depth))
+
+    def mark(self, name):
+        """记录一个时间点（相对于计时器创建的时间）"""
+        self._marks[name] = time.perf_counter() - self.origin
+
+    def to_dict(self):
+        """导出为可序列化的字典"""
+        return {
+            "phases": [
+                {"name": name, "seconds": seconds, "depth": depth}
+                for name, seconds, depth in self.phases
+            ],
+            "marks": dict(self._marks),
+        }
+
+    def format_report(self):
+        """生成类似 -X importtime 格式的文本报告"""
+        lines = ["startup: self [us] | cumulative | phase"]
+
+        # 嵌套阶段先结束，按结束顺序输出，与 -X importtime 一致
+        for i, (name, seconds, depth) in enumerate(self.phases):
+            children = 0.0
+            for child_name, child_seconds, child_depth in reversed(self.phases[:i]):
+                if child_depth <= depth:
+                    break
+                if child_depth == depth + 1:
+                    children += child_seconds
+            cumulative = int(seconds * 1e6)
+            own = int((seconds - children) * 1e6)
+            lines.append(f"startup: {own:>9} | {cumulative:>10} | {'  ' * depth}{name}")
+
+        for name, seconds in self._marks.items():
+            lines.append(f"startup: {'':>9} | {int(seconds * 1e6):>10} | @{name}")
+        return "\n".join(lines)
+
+    def write_report(self, report_path):
+        """将报告写入JSON文件"""
+        try:
+            os.makedirs(os.path.dirname(report_path), exist_ok=True)
+            with open(report_path, "w", encoding="utf-8") as f:
+                json.dump(self.to_dict(), f, ensure_ascii=False, indent=4)
+            return True
+        except Exception as e:
+            logging.error(f"保存启动耗时报告失败: {e}")
+            return False
+
+
+# 全局计时器，在导入本模块时开始计时
+startup_timer = StartupTimer()
+
+
+def compare_reports(current, baseline, tolerance=0.2, min_seconds=0.005):
+    """
+    比较两份启动报告
+
+    参数:
+        current: 当前报告字典
+        baseline: 基准报告字典
+        tolerance: 允许的相对增长比例
+        min_seconds: 忽略基准耗时低于此值的阶段，避免噪声
+
+    返回:
+        退化的阶段列表，每项为(名称, 基准耗时, 当前耗时)
+    """
+
+    def collect(report):
+        values = {p["name"]: p["seconds"] for p in report.get("phases", [])}
+        values.update({f"@{k}": v for k, v in report.get("marks", {}).items()})
+        return values
+
+    current_values = collect(current)
+    regressions = []
+    for name, base in collect(baseline).items():
+        if name not in current_values or base < min_seconds:
+            continue
+        if current_values[name] > base * (1 + tolerance):
+            regressions.append((name, base, current_values[name]))
+    return regressions
+
+
+def main(argv=None):
+    """比较启动报告，发现退化时返回非零值"""
+    parser = argparse.ArgumentParser(description="比较启动耗时报告")
+    parser.add_argument("current", help="当前报告文件")
+    parser.add_argument("baseline", help="基准报告文件")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的相对增长比例")
+    args = parser.parse_args(argv)
+
+    with open(args.current, "r", encoding="utf-8") as f:
+        current = json.load(f)
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    regressions = compare_reports(current, baseline, args.tolerance)
+    for name, base, value in regressions:
+        print(f"{name}: {base * 1000:.1f} ms -> {value * 1000:.1f} ms")
+    if not regressions:
+        print("未发现启动耗时退化")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,340 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+备份目录的跨进程锁模块
+
+图形界面、命令行和后台守护进程可以同时使用同一个备份目录。本模块用备份目录下
+.locks 目录中的租约文件实现建议性的读写锁，保护备份索引等记录文件的读取和提交:
+
+- 写租约 write.lease 用独占创建获得，同一时间只有一个写者；写者拿到写租约后
+  再等待已有的读者离开，之后到达的读者会等待写者完成，写者不会被读者饿死；
+- 每个读者创建自己的 read-<编号>.lease，多个读者可以同时读取；
+- 租约文件记录持有者的主机、进程号和到期时间。持有者崩溃或卡住时，其他进程在
+  租约到期后把它清除（同一台电脑上的进程已经退出时立即清除），不会一直等待；
+- 持有写锁期间，后台线程每隔三分之一个有效期续租一次，写锁持有得再久也不会被
+  当作过期的租约清除；
+- 清除过期租约时先把它改名为只属于自己的文件，确认内容仍是判断为过期的那份后
+  再删除。判断和清除之间租约已被其他进程清除并重新创建时，把新租约放回原处。
+
+锁只在读取或提交记录文件的短暂过程中持有，复制存档等耗时操作都在锁外进行。
+同一进程内的写锁可以重入，读锁在持有写锁的线程中直接通过。
+本模块不依赖Qt。
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import logging
+import threading
+from contextlib import contextmanager
+
+# 锁文件所在的子目录名
+LOCK_DIR_NAME = ".locks"
+# 租约有效期（秒），超过后其他进程可以清除该租约
+LEASE_SECONDS = 30
+# 获取锁的最长等待时间（秒）
+ACQUIRE_TIMEOUT = 15
+# 等待锁时的轮询间隔（秒），从最小值开始逐次加倍
+POLL_MIN = 0.005
+POLL_MAX = 0.1
+
+
+class StoreLockTimeout(TimeoutError):
+    """在限定时间内没有获得备份目录的锁"""
+
+
+def _pid_alive(pid):
+    """判断本机上的进程是否仍在运行，无法判断时按仍在运行处理"""
+    if os.name == "nt" or not pid:
+        # Windows上os.kill会结束目标进程，只依靠租约到期
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+class StoreLock:
+    """
+    备份目录读写锁类
+
+    参数:
+        directory: 备份目录
+        lease_seconds: 租约有效期（秒）
+        timeout: 获取锁的最长等待时间（秒）
+    """
+
+    def __init__(self, directory, lease_seconds=LEASE_SECONDS, timeout=ACQUIRE_TIMEOUT):
+        self.lock_dir = os.path.join(directory, LOCK_DIR_NAME)
+        self.lease_seconds = lease_seconds
+        self.timeout = timeout
+        self._write_path = os.path.join(self.lock_dir, "write.lease")
+        self._host = socket.gethostname()
+        # 进程内的线程之间也通过这个锁互斥，写锁的嵌套层数为_depth
+        self._mutex = threading.RLock()
+        self._depth = 0
+        self._write_owner = None
+
+    @contextmanager
+    def write(self):
+        """获取写锁（独占），可以重入"""
+        with self._mutex:
+            if self._depth:
+                self._depth += 1
+                try:
+                    yield
+                finally:
+                    self._depth -= 1
+                return
+
+            self._write_owner = self._acquire_write()
+            self._depth = 1
+            try:
+                with self._heartbeat(self._write_path, self._write_owner):
+                    yield
+            finally:
+                self._depth = 0
+                self._release(self._write_path, self._write_owner)
+                self._write_owner = None
+
+    @contextmanager
+    def read(self):
+        """获取读锁（与其他进程的读者共享），持有写锁时直接通过"""
+        with self._mutex:
+            if self._depth:
+                yield
+                return
+            path, owner = self._acquire_read()
+            try:
+                yield
+            finally:
+                self._release(path, owner)
+
+    def _acquire_write(self):
+        """
+        创建写租约并等待已有的读者离开
+
+        返回:
+            租约的持有者标识
+
+        异常:
+            超时抛出StoreLockTimeout
+        """
+        os.makedirs(self.lock_dir, exist_ok=True)
+        deadline = time.monotonic() + self.timeout
+        delay = POLL_MIN
+
+        while True:
+            owner = self._create_lease(self._write_path)
+            if owner:
+                break
+            if not self._break_if_stale(self._write_path):
+                delay = self._wait(deadline, delay)
+
+        try:
+            delay = POLL_MIN
+            while any(not self._break_if_stale(path) for path in self._reader_leases()):
+                delay = self._wait(deadline, delay)
+        except BaseException:
+            self._release(self._write_path, owner)
+            raise
+        return owner
+
+    def _acquire_read(self):
+        """
+        在没有写者时创建读租约
+
+        返回:
+            (租约文件路径, 持有者标识)
+
+        异常:
+            超时抛出StoreLockTimeout
+        """
+        os.makedirs(self.lock_dir, exist_ok=True)
+        deadline = time.monotonic() + self.timeout
+        delay = POLL_MIN
+        path = os.path.join(self.lock_dir, f"read-{uuid.uuid4().hex}.lease")
+
+        while True:
+            if os.path.exists(self._write_path):
+                if not self._break_if_stale(self._write_path):
+                    delay = self._wait(deadline, delay)
+                continue
+
+            owner = self._create_lease(path)
+            # 创建读租约的同时可能有写者到达，此时让写者先完成
+            if not os.path.exists(self._write_path):
+                return path, owner
+            self._release(path, owner)
+            delay = self._wait(deadline, delay)
+
+    def _create_lease(self, path):
+        """
+        独占创建租约文件
+
+        返回:
+            成功返回持有者标识，文件已存在时返回None
+        """
+        owner = uuid.uuid4().hex
+        data = {
+            "owner": owner,
+            "host": self._host,
+            "pid": os.getpid(),
+            "expires": time.time() + self.lease_seconds,
+        }
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            return None
+        try:
+            os.write(fd, json.dumps(data).encode("utf-8"))
+        finally:
+            os.close(fd)
+        return owner
+
+    @contextmanager
+    def _heartbeat(self, path, owner):
+        """持有租约期间在后台线程中定期续租"""
+        stop = threading.Event()
+
+        def renew():
+            while not stop.wait(self.lease_seconds / 3):
+                if not self._renew(path, owner):
+                    return
+
+        thread = threading.Thread(target=renew, name="store-lock-heartbeat", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def _renew(self, path, owner):
+        """
+        延长自己的租约的到期时间
+
+        返回:
+            续租成功返回True，租约已不属于自己时返回False
+        """
+        data = self._read_lease(path)
+        if not data or data.get("owner") != owner:
+            logging.warning(f"锁的租约已不属于本进程，停止续租: {path}")
+            return False
+        data["expires"] = time.time() + self.lease_seconds
+        tmp_path = f"{path}.{owner}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # 下一次续租时重试
+            logging.error(f"续租失败: {e}")
+        return True
+
+    def _read_lease(self, path):
+        """读取租约内容，文件不存在返回None，内容还没写完时返回{}"""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            return {}
+
+    def _break_if_stale(self, path):
+        """
+        租约已到期或持有者已经退出时清除租约
+
+        返回:
+            租约已不存在（包括被清除）时返回True
+        """
+        data = self._read_lease(path)
+        if data is None:
+            return True
+
+        if not data:
+            # 刚创建还没写入内容的租约，按文件时间判断
+            try:
+                stale = time.time() - os.path.getmtime(path) > self.lease_seconds
+            except OSError:
+                return True
+        else:
+            stale = data.get("expires", 0) < time.time() or (
+                data.get("host") == self._host and not _pid_alive(data.get("pid"))
+            )
+        if not stale:
+            return False
+
+        # 先改名取得这份租约，其他进程同时清除同一份租约时只有一个能成功
+        claimed = f"{path}.{uuid.uuid4().hex}.stale"
+        try:
+            os.rename(path, claimed)
+        except FileNotFoundError:
+            return True
+        except OSError as e:
+            logging.error(f"清除过期的锁失败: {e}")
+            return False
+
+        if self._read_lease(claimed) != data:
+            # 判断之后租约已被其他进程清除并重新创建，取得的是仍然有效的租约
+            self._restore_lease(claimed, path)
+            return False
+
+        logging.warning(f"清除过期的锁: {path}（进程 {data.get('pid', '未知')}）")
+        try:
+            os.remove(claimed)
+        except OSError as e:
+            logging.error(f"删除过期的锁文件失败: {e}")
+        return True
+
+    def _restore_lease(self, claimed, path):
+        """把误取得的有效租约放回原处（原处已有新的租约时不覆盖）"""
+        try:
+            if os.name == "nt":
+                # Windows上目标已存在时rename失败，不会覆盖
+                os.rename(claimed, path)
+            else:
+                os.link(claimed, path)
+                os.remove(claimed)
+        except FileExistsError:
+            logging.error(f"无法放回有效的锁租约，原处已有新的租约: {path}")
+            os.remove(claimed)
+        except OSError as e:
+            logging.error(f"放回锁租约失败: {e}")
+
+    def _release(self, path, owner):
+        """删除自己的租约；租约已过期并被其他进程清除时只记录日志"""
+        data = self._read_lease(path)
+        if data is not None and data.get("owner") not in (owner, None):
+            logging.warning(f"锁的租约已过期并被其他进程取得: {path}")
+            return
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            logging.warning(f"锁的租约已过期并被其他进程清除: {path}")
+        except OSError as e:
+            logging.error(f"释放锁失败: {e}")
+
+    def _reader_leases(self):
+        try:
+            return [
+                entry.path
+                for entry in os.scandir(self.lock_dir)
+                if entry.name.startswith("read-") and entry.name.endswith(".lease")
+            ]
+        except FileNotFoundError:
+            return []
+
+    def _wait(self, deadline, delay):
+        """等待一个轮询间隔，超时抛出StoreLockTimeout，返回下一个间隔"""
+        if time.monotonic() >= deadline:
+            raise StoreLockTimeout(f"等待备份目录的锁超时: {self.lock_dir}")
+        time.sleep(delay)
+        return min(delay * 2, POLL_MAX)
@@ -3,566 +3,401 @@
 
 """
 样式表模块
+
+主题由一组颜色组成（THEMES）。只需要颜色的部分（窗口和文字颜色、列表底色、
+选中颜色、提示框等）放在QPalette中，样式表只保留调色板无法表达的规则
+（圆角按钮、边框、滚动条等），并且不再使用匹配所有控件的 QWidget 规则——
+被任何样式表规则匹配的控件都要由样式表引擎绘制，全局规则会让每个控件、
+包括备份表格的每个单元格都走较慢的绘制路径。
+
+列表项的样式只作用于存档列表（#saveList）；备份表格（#backupTable）只有边框和
+网格线颜色，单元格按调色板绘制，数千行时滚动和重绘也不会变慢。
+
+样式表和调色板按主题只生成一次并缓存，切换主题时直接使用缓存。
 """
 
+from functools import lru_cache
+from string import Template
 
-def get_dark_style():
-    """获取暗色主题样式表"""
-    return """
-    /* 全局样式 */
-    QWidget {
-        background-color: #2D2D30;
-        color: #E0E0E0;
-        font-family: "Microsoft YaHei", "Segoe UI", Arial;
-    }
-    
+# 界面字体
+FONT_FAMILIES = ["Microsoft YaHei", "Segoe UI", "Arial"]
+
+# 主题颜色
+THEMES = {
+    "dark": {
+        "window": "#2D2D30",
+        "text": "#E0E0E0",
+        "main_window": "#252526",
+        "panel": "#252526",
+        "alternate": "#2A2A2A",
+        "input": "#1E1E1E",
+        "bar": "#2D2D30",
+        "bar_border": "none",
+        "popup": "#2D2D30",
+        "border": "#3E3E40",
+        "hover": "#3E3E40",
+        "separator": "#3D3D3D",
+        "handle": "#3E3E40",
+        "handle_hover": "#525252",
+        "disabled": "#3D3D3D",
+        "disabled_text": "#787878",
+        "accent": "#0078D7",
+        "accent_hover": "#1C97EA",
+        "accent_pressed": "#00588A",
+        "accent_text": "#FFFFFF",
+    },
+    "light": {
+        "window": "#FAFAFA",
+        "text": "#212121",
+        "main_window": "#F0F0F0",
+        "panel": "#FFFFFF",
+        "alternate": "#F5F5F5",
+        "input": "#FFFFFF",
+        "bar": "#F0F0F0",
+        "bar_border": "1px solid #E0E0E0",
+        "popup": "#FFFFFF",
+        "border": "#E0E0E0",
+        "hover": "#E0E0E0",
+        "separator": "#E0E0E0",
+        "handle": "#CCCCCC",
+        "handle_hover": "#AAAAAA",
+        "disabled": "#CCCCCC",
+        "disabled_text": "#888888",
+        "accent": "#0078D7",
+        "accent_hover": "#1C97EA",
+        "accent_pressed": "#00588A",
+        "accent_text": "#FFFFFF",
+    },
+}
+
+# 样式表模板，$名称 为THEMES中的颜色
+_STYLE_TEMPLATE = Template(
+    """
     /* 主窗口 */
     QMainWindow {
-        background-color: #252526;
+        background-color: $main_window;
     }
-    
+
     /* 按钮样式 */
     QPushButton {
-        background-color: #0078D7;
-        color: white;
+        background-color: $accent;
+        color: $accent_text;
         border: none;
         padding: 6px 12px;
         border-radius: 3px;
     }
-    
+
     QPushButton:hover {
-        background-color: #1C97EA;
+        background-color: $accent_hover;
     }
-    
+
     QPushButton:pressed {
-        background-color: #00588A;
+        background-color: $accent_pressed;
     }
-    
+
     QPushButton:disabled {
-        background-color: #3D3D3D;
-        color: #787878;
+        background-color: $disabled;
+        color: $disabled_text;
     }
-    
+
     /* 工具栏 */
     QToolBar {
-        background-color: #2D2D30;
+        background-color: $bar;
         spacing: 6px;
         padding: 3px;
         border: none;
+        border-bottom: $bar_border;
     }
-    
+
     QToolBar::separator {
-        background-color: #3D3D3D;
+        background-color: $separator;
         width: 1px;
         margin: 4px 8px;
     }
-    
+
     /* 菜单 */
     QMenu {
-        background-color: #2D2D30;
-        border: 1px solid #3E3E40;
+        background-color: $popup;
+        border: 1px solid $border;
     }
-    
+
     QMenu::item {
         padding: 5px 30px 5px 20px;
     }
-    
+
     QMenu::item:selected {
-        background-color: #3E3E40;
+        background-color: $hover;
     }
-    
+
     /* 选项卡 */
     QTabWidget::pane {
-        border: 1px solid #3E3E40;
+        border: 1px solid $border;
     }
-    
+
     QTabBar::tab {
-        background-color: #2D2D30;
+        background-color: $bar;
         padding: 8px 16px;
         margin-right: 2px;
         border: none;
         border-bottom: 2px solid transparent;
     }
-    
+
     QTabBar::tab:selected {
-        background-color: #1E1E1E;
-        border-bottom: 2px solid #0078D7;
+        background-color: $input;
+        border-bottom: 2px solid $accent;
     }
-    
+
     QTabBar::tab:hover:!selected {
-        background-color: #3E3E40;
+        background-color: $hover;
     }
-    
+
     /* 分组框 */
     QGroupBox {
-        background-color: #252526;
-        border: 1px solid #3E3E40;
+        background-color: $panel;
+        border: 1px solid $border;
         border-radius: 5px;
         margin-top: 15px;
         padding-top: 15px;
     }
-    
+
     QGroupBox::title {
         subcontrol-origin: margin;
         subcontrol-position: top left;
         padding: 0 5px;
-        color: #E0E0E0;
     }
-    
-    /* 列表 */
-    QListWidget {
-        background-color: #252526;
-        border: 1px solid #3E3E40;
-        alternate-background-color: #2A2A2A;
+
+    /* 存档列表 */
+    QListWidget#saveList {
+        border: 1px solid $border;
     }
-    
-    QListWidget::item {
+
+    QListWidget#saveList::item {
         padding: 5px;
     }
-    
-    QListWidget::item:selected {
-        background-color: #0078D7;
-        color: white;
-    }
-    
-    QListWidget::item:hover:!selected {
-        background-color: #3E3E40;
-    }
-    
-    /* 表格 */
-    QTableWidget {
-        background-color: #252526;
-        border: 1px solid #3E3E40;
-        gridline-color: #3E3E40;
-    }
-    
-    QTableWidget::item {
-        padding: 5px;
+
+    QListWidget#saveList::item:hover:!selected {
+        background-color: $hover;
     }
-    
-    QTableWidget::item:selected {
-        background-color: #0078D7;
-        color: white;
+
+    /* 备份表格：单元格按调色板绘制，不使用 ::item 规则 */
+    QTableWidget#backupTable {
+        border: 1px solid $border;
+        gridline-color: $border;
     }
-    
+
     QHeaderView::section {
-        background-color: #2D2D30;
+        background-color: $bar;
         padding: 5px;
         border: none;
-        border-bottom: 1px solid #3E3E40;
-        border-right: 1px solid #3E3E40;
+        border-bottom: 1px solid $border;
+        border-right: 1px solid $border;
     }
-    
+
     /* 滚动条 */
     QScrollBar:vertical {
         border: none;
-        background-color: #2D2D30;
+        background-color: $bar;
         width: 10px;
         margin: 0px 0px 0px 0px;
     }
-    
+
     QScrollBar::handle:vertical {
-        background-color: #3E3E40;
+        background-color: $handle;
         min-height: 20px;
         border-radius: 5px;
     }
-    
+
     QScrollBar::handle:vertical:hover {
-        background-color: #525252;
+        background-color: $handle_hover;
     }
-    
+
     QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {
         height: 0px;
     }
-    
+
     QScrollBar:horizontal {
         border: none;
-        background-color: #2D2D30;
+        background-color: $bar;
         height: 10px;
         margin: 0px 0px 0px 0px;
     }
-    
+
     QScrollBar::handle:horizontal {
-        background-color: #3E3E40;
+        background-color: $handle;
         min-width: 20px;
         border-radius: 5px;
     }
-    
+
     QScrollBar::handle:horizontal:hover {
-        background-color: #525252;
+        background-color: $handle_hover;
     }
-    
+
     QScrollBar::add-line:horizontal, QScrollBar::sub-line:horizontal {
         width: 0px;
     }
-    
+
     /* 输入框 */
     QLineEdit, QTextEdit, QPlainTextEdit {
-        background-color: #1E1E1E;
-        color: #E0E0E0;
-        border: 1px solid #3E3E40;
+        background-color: $input;
+        border: 1px solid $border;
         border-radius: 3px;
         padding: 5px;
     }
-    
+
     QLineEdit:focus, QTextEdit:focus, QPlainTextEdit:focus {
-        border: 1px solid #0078D7;
+        border: 1px solid $accent;
     }
-    
+
     /* 组合框和下拉框 */
     QComboBox {
-        background-color: #1E1E1E;
-        color: #E0E0E0;
-        border: 1px solid #3E3E40;
+        background-color: $input;
+        border: 1px solid $border;
         border-radius: 3px;
         padding: 5px;
     }
-    
+
     QComboBox::drop-down {
         width: 20px;
         border: none;
-        background-color: #0078D7;
+        background-color: $accent;
     }
-    
+
     QComboBox::down-arrow {
         image: url(dropdown_arrow.png);
     }
-    
+
     QComboBox QAbstractItemView {
-        background-color: #1E1E1E;
-        color: #E0E0E0;
-        border: 1px solid #3E3E40;
+        background-color: $input;
+        border: 1px solid $border;
     }
-    
+
     /* 单选和复选框 */
     QCheckBox, QRadioButton {
         spacing: 8px;
     }
-    
+
     QCheckBox::indicator, QRadioButton::indicator {
         width: 16px;
         height: 16px;
     }
-    
+
     QCheckBox::indicator:checked, QRadioButton::indicator:checked {
-        background-color: #0078D7;
+        background-color: $accent;
     }
-    
+
     /* 状态栏 */
     QStatusBar {
-        background-color: #2D2D30;
-        color: #E0E0E0;
+        background-color: $bar;
+        border-top: $bar_border;
     }
-    
+
     QStatusBar::item {
         border: none;
     }
-    
+
     /* 分割器 */
     QSplitter::handle {
-        background-color: #3E3E40;
+        background-color: $border;
     }
-    
+
     QSplitter::handle:horizontal {
         width: 2px;
     }
-    
+
     QSplitter::handle:vertical {
         height: 2px;
     }
-    
-    /* 对话框 */
-    QDialog {
-        background-color: #2D2D30;
-    }
-    
-    /* 提示框 */
+
+    /* 提示框（颜色来自调色板） */
     QToolTip {
-        background-color: #2D2D30;
-        color: #E0E0E0;
-        border: 1px solid #3E3E40;
+        border: 1px solid $border;
         padding: 3px;
     }
     """
+)
+
+
+@lru_cache(maxsize=None)
+def build_stylesheet(theme):
+    """
+    生成主题的样式表（结果会被缓存）
+
+    参数:
+        theme: THEMES中的主题名称
+
+    返回:
+        样式表字符串
+    """
+    return _STYLE_TEMPLATE.substitute(THEMES[theme])
+
+
+@lru_cache(maxsize=None)
+def build_palette(theme):
+    """
+    生成主题的调色板（结果会被缓存）
+
+    参数:
+        theme: THEMES中的主题名称
+
+    返回:
+        QPalette对象
+    """
+    from PySide6.QtGui import QColor, QPalette
+
+    colors = {
+        name: QColor(value)
+        for name, value in THEMES[theme].items()
+        if value.startswith("#")
+    }
+    palette = QPalette()
+    roles = {
+        QPalette.Window: "window",
+        QPalette.WindowText: "text",
+        QPalette.Base: "panel",
+        QPalette.AlternateBase: "alternate",
+        QPalette.Text: "text",
+        QPalette.Button: "window",
+        QPalette.ButtonText: "text",
+        QPalette.BrightText: "accent_text",
+        QPalette.Highlight: "accent",
+        QPalette.HighlightedText: "accent_text",
+        QPalette.ToolTipBase: "popup",
+        QPalette.ToolTipText: "text",
+        QPalette.PlaceholderText: "disabled_text",
+        QPalette.Link: "accent",
+    }
+    for role, name in roles.items():
+        palette.setColor(role, colors[name])
+    for role in (QPalette.WindowText, QPalette.Text, QPalette.ButtonText):
+        palette.setColor(QPalette.Disabled, role, colors["disabled_text"])
+    return palette
+
+
+def apply_theme(app, window, theme):
+    """
+    把主题应用到应用程序和主窗口
+
+    调色板设置在应用程序上（对话框、菜单和提示框也会使用），样式表只设置在主窗口上。
+
+    参数:
+        app: QApplication对象
+        window: 主窗口
+        theme: THEMES中的主题名称，未知的主题按暗色主题处理
+    """
+    theme = theme if theme in THEMES else "dark"
+    font = app.font()
+    if font.families() != FONT_FAMILIES:
+        font.setFamilies(FONT_FAMILIES)
+        app.setFont(font)
+    app.setPalette(build_palette(theme))
+    window.setStyleSheet(build_stylesheet(theme))
+
+
+def get_dark_style():
+    """获取暗色主题样式表"""
+    return build_stylesheet("dark")
 
 
 def get_light_style():
     """获取亮色主题样式表"""
-    return """
-    /* 全局样式 */
-    QWidget {
-        background-color: #FAFAFA;
-        color: #212121;
-        font-family: "Microsoft YaHei", "Segoe UI", Arial;
-    }
-    
-    /* 主窗口 */
-    QMainWindow {
-        background-color: #F0F0F0;
-    }
-    
-    /* 按钮样式 */
-    QPushButton {
-        background-color: #0078D7;
-        color: white;
-        border: none;
-        padding: 6px 12px;
-        border-radius: 3px;
-    }
-    
-    QPushButton:hover {
-        background-color: #1C97EA;
-    }
-    
-    QPushButton:pressed {
-        background-color: #00588A;
-    }
-    
-    QPushButton:disabled {
-        background-color: #CCCCCC;
-        color: #888888;
-    }
-    
-    /* 工具栏 */
-    QToolBar {
-        background-color: #F0F0F0;
-        spacing: 6px;
-        padding: 3px;
-        border: none;
-        border-bottom: 1px solid #E0E0E0;
-    }
-    
-    QToolBar::separator {
-        background-color: #E0E0E0;
-        width: 1px;
-        margin: 4px 8px;
-    }
-    
-    /* 菜单 */
-    QMenu {
-        background-color: #FFFFFF;
-        border: 1px solid #E0E0E0;
-    }
-    
-    QMenu::item {
-        padding: 5px 30px 5px 20px;
-    }
-    
-    QMenu::item:selected {
-        background-color: #E0E0E0;
-    }
-    
-    /* 选项卡 */
-    QTabWidget::pane {
-        border: 1px solid #E0E0E0;
-    }
-    
-    QTabBar::tab {
-        background-color: #F0F0F0;
-        padding: 8px 16px;
-        margin-right: 2px;
-        border: none;
-        border-bottom: 2px solid transparent;
-    }
-    
-    QTabBar::tab:selected {
-        background-color: #FFFFFF;
-        border-bottom: 2px solid #0078D7;
-    }
-    
-    QTabBar::tab:hover:!selected {
-        background-color: #E0E0E0;
-    }
-    
-    /* 分组框 */
-    QGroupBox {
-        background-color: #FFFFFF;
-        border: 1px solid #E0E0E0;
-        border-radius: 5px;
-        margin-top: 15px;
-        padding-top: 15px;
-    }
-    
-    QGroupBox::title {
-        subcontrol-origin: margin;
-        subcontrol-position: top left;
-        padding: 0 5px;
-        color: #212121;
-    }
-    
-    /* 列表 */
-    QListWidget {
-        background-color: #FFFFFF;
-        border: 1px solid #E0E0E0;
-        alternate-background-color: #F5F5F5;
-    }
-    
-    QListWidget::item {
-        padding: 5px;
-    }
-    
-    QListWidget::item:selected {
-        background-color: #0078D7;
-        color: white;
-    }
-    
-    QListWidget::item:hover:!selected {
-        background-color: #E0E0E0;
-    }
-    
-    /* 表格 */
-    QTableWidget {
-        background-color: #FFFFFF;
-        border: 1px solid #E0E0E0;
-        gridline-color: #E0E0E0;
-    }
-    
-    QTableWidget::item {
-        padding: 5px;
-    }
-    
-    QTableWidget::item:selected {
-        background-color: #0078D7;
-        color: white;
-    }
-    
-    QHeaderView::section {
-        background-color: #F0F0F0;
-        padding: 5px;
-        border: none;
-        border-bottom: 1px solid #E0E0E0;
-        border-right: 1px solid #E0E0E0;
-    }
-    
-    /* 滚动条 */
-    QScrollBar:vertical {
-        border: none;
-        background-color: #F0F0F0;
-        width: 10px;
-        margin: 0px 0px 0px 0px;
-    }
-    
-    QScrollBar::handle:vertical {
-        background-color: #CCCCCC;
-        min-height: 20px;
-        border-radius: 5px;
-    }
-    
-    QScrollBar::handle:vertical:hover {
-        background-color: #AAAAAA;
-    }
-    
-    QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {
-        height: 0px;
-    }
-    
-    QScrollBar:horizontal {
-        border: none;
-        background-color: #F0F0F0;
-        height: 10px;
-        margin: 0px 0px 0px 0px;
-    }
-    
-    QScrollBar::handle:horizontal {
-        background-color: #CCCCCC;
-        min-width: 20px;
-        border-radius: 5px;
-    }
-    
-    QScrollBar::handle:horizontal:hover {
-        background-color: #AAAAAA;
-    }
-    
-    QScrollBar::add-line:horizontal, QScrollBar::sub-line:horizontal {
-        width: 0px;
-    }
-    
-    /* 输入框 */
-    QLineEdit, QTextEdit, QPlainTextEdit {
-        background-color: #FFFFFF;
-        color: #212121;
-        border: 1px solid #E0E0E0;
-        border-radius: 3px;
-        padding: 5px;
-    }
-    
-    QLineEdit:focus, QTextEdit:focus, QPlainTextEdit:focus {
-        border: 1px solid #0078D7;
-    }
-    
-    /* 组合框和下拉框 */
-    QComboBox {
-        background-color: #FFFFFF;
-        color: #212121;
-        border: 1px solid #E0E0E0;
-        border-radius: 3px;
-        padding: 5px;
-    }
-    
-    QComboBox::drop-down {
-        width: 20px;
-        border: none;
-        background-color: #0078D7;
-    }
-    
-    QComboBox::down-arrow {
-        image: url(dropdown_arrow.png);
-    }
-    
-    QComboBox QAbstractItemView {
-        background-color: #FFFFFF;
-        color: #212121;
-        border: 1px solid #E0E0E0;
-    }
-    
-    /* 单选和复选框 */
-    QCheckBox, QRadioButton {
-        spacing: 8px;
-    }
-    
-    QCheckBox::indicator, QRadioButton::indicator {
-        width: 16px;
-        height: 16px;
-    }
-    
-    QCheckBox::indicator:checked, QRadioButton::indicator:checked {
-        background-color: #0078D7;
-    }
-    
-    /* 状态栏 */
-    QStatusBar {
-        background-color: #F0F0F0;
-        color: #212121;
-        border-top: 1px solid #E0E0E0;
-    }
-    
-    QStatusBar::item {
-        border: none;
-    }
-    
-    /* 分割器 */
-    QSplitter::handle {
-        background-color: #E0E0E0;
-    }
-    
-    QSplitter::handle:horizontal {
-        width: 2px;
-    }
-    
-    QSplitter::handle:vertical {
-        height: 2px;
-    }
-    
-    /* 对话框 */
-    QDialog {
-        background-color: #FAFAFA;
-    }
-    
-    /* 提示框 */
-    QToolTip {
-        background-color: #FFFFFF;
-        color: #212121;
-        border: 1px solid #E0E0E0;
-        padding: 3px;
-    }
-    """
+    return build_stylesheet("light")
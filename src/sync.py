@@ -0,0 +1,399 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+备份同步模块
+
+把备份目录增量同步到镜像目标（例如NAS上的目录）。本地和目标各有一份清单，
+记录每个文件的大小和校验值，同步时只比较清单，只上传新增或变化的文件，
+因此备份没有变化时同步几乎不产生I/O。同步属于后台维护任务，游戏正在写入存档时
+在两个文件之间暂停（见io_scheduler）。
+
+本地清单直接取自备份索引中记录的数据文件校验值，不需要读取备份文件。续传的文件
+在可见之前按清单中的校验值检查，已上传的部分来自旧版本时重新上传。
+
+目标通过后端访问，目前内置本地目录后端和内存中的对象存储替身（memory://）；
+其他后端（SFTP、对象存储等）实现 SyncBackend 接口并注册到 BACKENDS 即可使用。
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from src.io_scheduler import checkpoint, enter_background
+from src.mapped_io import hash_file
+
+# 清单文件名（本地缓存和目标上使用同一个名字）
+MANIFEST_NAME = ".sync_manifest.json"
+# 上传未完成的文件后缀，下次同步时从已上传的位置继续
+PARTIAL_SUFFIX = ".part"
+COPY_CHUNK_SIZE = 1024 * 1024
+# 每上传这么多文件保存一次目标清单，中断后已完成的部分不必重传
+MANIFEST_FLUSH_INTERVAL = 50
+
+
+class PartialUploadMismatch(ValueError):
+    """续传后的文件与清单中的校验值不一致"""
+
+
+def _check_resumed(data_digest, sha256, rel_path):
+    if sha256 is not None and data_digest != sha256:
+        raise PartialUploadMismatch(f"续传的文件校验失败: {rel_path}")
+
+
+class SyncBackend:
+    """
+    同步目标后端接口
+
+    文件路径均为相对于备份目录的、以"/"分隔的路径。
+    """
+
+    def read_manifest(self):
+        """读取目标上的清单，不存在时返回空字典"""
+        raise NotImplementedError
+
+    def write_manifest(self, manifest):
+        """保存目标上的清单"""
+        raise NotImplementedError
+
+    def partial_size(self, rel_path):
+        """返回上次中断时该文件已上传的字节数"""
+        raise NotImplementedError
+
+    def upload(self, local_path, rel_path, offset=0, sha256=None):
+        """
+        从offset处继续上传文件，完成后使其在目标上可见
+
+        续传（offset不为0）时，已上传的部分可能来自文件的旧版本。sha256不为None时，
+        后端在使文件可见之前校验拼接出的完整内容，不一致时丢弃已上传的部分并抛出
+        PartialUploadMismatch。
+        """
+        raise NotImplementedError
+
+    def delete(self, rel_path):
+        """删除目标上的文件"""
+        raise NotImplementedError
+
+
+class DirectoryBackend(SyncBackend):
+    """本地目录（包括挂载的网络共享）后端"""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, rel_path):
+        return os.path.join(self.root, *rel_path.split("/"))
+
+    def read_manifest(self):
+        manifest_path = self._path(MANIFEST_NAME)
+        if not os.path.exists(manifest_path):
+            return {}
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logging.warning(f"读取同步目标清单失败，将重新比较所有文件: {e}")
+            return {}
+
+    def write_manifest(self, manifest):
+        manifest_path = self._path(MANIFEST_NAME)
+        tmp_path = manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, manifest_path)
+
+    def partial_size(self, rel_path):
+        try:
+            return os.path.getsize(self._path(rel_path) + PARTIAL_SUFFIX)
+        except OSError:
+            return 0
+
+    def upload(self, local_path, rel_path, offset=0, sha256=None):
+        dest_path = self._path(rel_path)
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        partial_path = dest_path + PARTIAL_SUFFIX
+
+        with open(local_path, "rb") as src, open(
+            partial_path, "r+b" if offset else "wb"
+        ) as dst:
+            src.seek(offset)
+            dst.seek(offset)
+            dst.truncate()
+            for chunk in iter(lambda: src.read(COPY_CHUNK_SIZE), b""):
+                dst.write(chunk)
+        if offset:
+            try:
+                _check_resumed(hash_file(partial_path), sha256, rel_path)
+            except PartialUploadMismatch:
+                os.remove(partial_path)
+                raise
+        os.replace(partial_path, dest_path)
+
+    def delete(self, rel_path):
+        path = self._path(rel_path)
+        if os.path.exists(path):
+            os.remove(path)
+        # 删除空的备份目录
+        parent = os.path.dirname(path)
+        if parent != self.root and os.path.isdir(parent) and not os.listdir(parent):
+            os.rmdir(parent)
+
+
+class MemoryBackend(SyncBackend):
+    """
+    内存中的对象存储后端
+
+    按对象存储的方式工作（对象按键整体可见，未完成的上传单独保存），作为开发和
+    测试SFTP、对象存储等远程后端时的本地替身。同名的目标（memory://名称）在同一
+    进程中共用数据。
+    """
+
+    stores = {}
+
+    def __init__(self, name=""):
+        store = self.stores.setdefault(name, {"objects": {}, "partials": {}})
+        self.objects = store["objects"]
+        self.partials = store["partials"]
+
+    def read_manifest(self):
+        data = self.objects.get(MANIFEST_NAME)
+        return json.loads(data) if data else {}
+
+    def write_manifest(self, manifest):
+        self.objects[MANIFEST_NAME] = json.dumps(manifest, ensure_ascii=False).encode("utf-8")
+
+    def partial_size(self, rel_path):
+        return len(self.partials.get(rel_path, b""))
+
+    def upload(self, local_path, rel_path, offset=0, sha256=None):
+        partial = self.partials.setdefault(rel_path, bytearray())
+        del partial[offset:]
+        with open(local_path, "rb") as src:
+            src.seek(offset)
+            for chunk in iter(lambda: src.read(COPY_CHUNK_SIZE), b""):
+                partial.extend(chunk)
+        if offset:
+            try:
+                _check_resumed(hashlib.sha256(partial).hexdigest(), sha256, rel_path)
+            except PartialUploadMismatch:
+                del self.partials[rel_path]
+                raise
+        self.objects[rel_path] = bytes(self.partials.pop(rel_path))
+
+    def delete(self, rel_path):
+        self.objects.pop(rel_path, None)
+
+
+# 同步后端注册表: URL前缀 -> 后端类，没有前缀的目标视为本地目录
+BACKENDS = {"file://": DirectoryBackend, "memory://": MemoryBackend}
+
+
+def get_backend(target):
+    """根据目标地址创建同步后端"""
+    for prefix, backend_class in BACKENDS.items():
+        if target.startswith(prefix):
+            return backend_class(target[len(prefix) :])
+    if "://" in target:
+        raise ValueError(f"不支持的同步目标: {target}")
+    return DirectoryBackend(target)
+
+
+class SyncEngine:
+    """备份同步引擎类"""
+
+    def __init__(self, backup_manager, backend, concurrency=4):
+        self.backup_manager = backup_manager
+        self.backend = backend
+        self.concurrency = max(1, concurrency)
+        self.local_manifest_file = os.path.join(
+            backup_manager.backup_dir, MANIFEST_NAME
+        )
+
+    def _load_local_cache(self):
+        if not os.path.exists(self.local_manifest_file):
+            return {}
+        try:
+            with open(self.local_manifest_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def _catalog_files(self):
+        """需要同步的记录文件，按上传顺序排列：时间线分支记录在前，备份索引最后"""
+        return [self.backup_manager.timeline_file, self.backup_manager.backup_index_file]
+
+    def build_local_manifest(self):
+        """
+        根据备份索引生成本地清单
+
+        索引条目中记录了数据文件大小和校验值（files）的备份直接使用这些记录，
+        不读取也不列出备份目录；只有meta.json（修改描述、标签时会被改写）和旧版本
+        创建的没有记录的备份需要检查文件，大小和修改时间与缓存一致时直接使用缓存中
+        的校验值，不重新读取文件。
+
+        返回:
+            {相对路径: {"size": 大小, "sha256": 校验值}}
+        """
+        cache = self._load_local_cache()
+        manifest = {}
+        backup_dir = self.backup_manager.backup_dir
+
+        def add(rel_path, file_path):
+            stat = os.stat(file_path)
+            cached = cache.get(rel_path)
+            if (
+                cached
+                and cached["size"] == stat.st_size
+                and cached.get("mtime_ns") == stat.st_mtime_ns
+            ):
+                manifest[rel_path] = cached
+                return
+            checkpoint()
+            manifest[rel_path] = {
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "sha256": hash_file(file_path),
+            }
+
+        for backup in self.backup_manager.get_all_backups():
+            backup_path = os.path.join(backup_dir, backup["id"])
+            files = backup.get("files")
+            if files:
+                try:
+                    add(f"{backup['id']}/meta.json", os.path.join(backup_path, "meta.json"))
+                except FileNotFoundError:
+                    # 备份目录已不存在
+                    continue
+                for name, info in files.items():
+                    manifest[f"{backup['id']}/{name}"] = {
+                        "size": info["size"],
+                        "sha256": info["sha256"],
+                    }
+                continue
+
+            if not os.path.isdir(backup_path):
+                continue
+            for name in os.listdir(backup_path):
+                file_path = os.path.join(backup_path, name)
+                if os.path.isfile(file_path):
+                    add(f"{backup['id']}/{name}", file_path)
+
+        for catalog_file in self._catalog_files():
+            if os.path.exists(catalog_file):
+                add(os.path.basename(catalog_file), catalog_file)
+
+        try:
+            with open(self.local_manifest_file, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False)
+        except Exception as e:
+            logging.warning(f"保存本地同步清单失败: {e}")
+
+        return manifest
+
+    def sync(self, delete=True):
+        """
+        执行一次同步
+
+        参数:
+            delete: 是否删除目标上已不存在于本地的文件
+
+        返回:
+            {"uploaded": [...], "deleted": [...], "failed": {相对路径: 错误信息}}
+        """
+        local = self.build_local_manifest()
+        remote = self.backend.read_manifest()
+
+        def same(rel_path):
+            r = remote.get(rel_path)
+            return (
+                r is not None
+                and r["size"] == local[rel_path]["size"]
+                and r["sha256"] == local[rel_path]["sha256"]
+            )
+
+        catalog_names = [os.path.basename(path) for path in self._catalog_files()]
+        to_upload = [p for p in local if p not in catalog_names and not same(p)]
+        catalog_upload = [p for p in catalog_names if p in local and not same(p)]
+        to_delete = [p for p in remote if p not in local] if delete else []
+
+        uploaded, deleted, failed = [], [], {}
+        lock = threading.Lock()
+
+        def upload(rel_path):
+            local_path = os.path.join(
+                self.backup_manager.backup_dir, *rel_path.split("/")
+            )
+            checkpoint()
+            offset = self.backend.partial_size(rel_path)
+            if offset > local[rel_path]["size"]:
+                offset = 0
+            sha256 = local[rel_path]["sha256"]
+            try:
+                self.backend.upload(local_path, rel_path, offset, sha256)
+            except PartialUploadMismatch as e:
+                # 已上传的部分来自文件的旧版本，重新上传整个文件
+                logging.warning(f"{e}，重新上传")
+                self.backend.upload(local_path, rel_path, 0, sha256)
+
+        if to_upload or catalog_upload:
+            logging.info(f"开始同步: 需要上传 {len(to_upload) + len(catalog_upload)} 个文件")
+            # 上传线程降低优先级，游戏正在写入存档时在两个文件之间暂停
+            with ThreadPoolExecutor(
+                max_workers=self.concurrency, initializer=enter_background
+            ) as executor:
+                futures = {executor.submit(upload, p): p for p in to_upload}
+                for future in as_completed(futures):
+                    rel_path = futures[future]
+                    try:
+                        future.result()
+                    except Exception as e:
+                        logging.error(f"上传文件失败: {rel_path}: {e}")
+                        failed[rel_path] = str(e)
+                        continue
+
+                    with lock:
+                        remote[rel_path] = {
+                            "size": local[rel_path]["size"],
+                            "sha256": local[rel_path]["sha256"],
+                        }
+                        uploaded.append(rel_path)
+                        if len(uploaded) % MANIFEST_FLUSH_INTERVAL == 0:
+                            self.backend.write_manifest(remote)
+
+        # 备份文件全部上传成功后再上传时间线分支记录和索引，保证目标上的记录
+        # 不会引用缺失的备份
+        for rel_path in catalog_upload:
+            if failed:
+                break
+            try:
+                upload(rel_path)
+                remote[rel_path] = {
+                    "size": local[rel_path]["size"],
+                    "sha256": local[rel_path]["sha256"],
+                }
+                uploaded.append(rel_path)
+            except Exception as e:
+                logging.error(f"上传记录文件失败: {rel_path}: {e}")
+                failed[rel_path] = str(e)
+
+        for rel_path in to_delete:
+            try:
+                self.backend.delete(rel_path)
+                del remote[rel_path]
+                deleted.append(rel_path)
+            except Exception as e:
+                logging.error(f"删除同步目标上的文件失败: {rel_path}: {e}")
+                failed[rel_path] = str(e)
+
+        if uploaded or deleted:
+            self.backend.write_manifest(remote)
+
+        logging.info(
+            f"同步完成: 上传 {len(uploaded)} 个，删除 {len(deleted)} 个，"
+            f"失败 {len(failed)} 个"
+        )
+        return {"uploaded": uploaded, "deleted": deleted, "failed": failed}
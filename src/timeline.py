@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+战役时间线模块
+
+按游戏内日期组织一个存档的所有备份。每次从备份恢复都会产生一个新的分支，
+分支从被恢复的备份处分叉，之后创建的备份都属于新分支。
+
+时间线内部为每个分支维护按游戏日期排序的数组，查询某个日期之前最近的备份
+和取出某个日期范围内的备份都通过二分查找完成，复杂度为 O(log n)。
+"""
+
+from bisect import bisect_left, bisect_right
+
+# 比任何备份时间（ISO格式字符串）都大的值，用于二分查找的上界
+_MAX_TIME = "\uffff"
+
+# EU4日历各月的天数（没有闰年）
+MONTH_DAYS = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+DAYS_PER_YEAR = sum(MONTH_DAYS)
+# 各月第一天在一年中的序号（从0开始）
+_MONTH_STARTS = [sum(MONTH_DAYS[:i]) for i in range(12)]
+
+
+def parse_game_date(text):
+    """
+    解析游戏日期
+
+    参数:
+        text: 形如 1650.3.1 的日期字符串
+
+    返回:
+        (年, 月, 日)，无法解析时返回None
+    """
+    try:
+        parts = [int(part) for part in str(text).strip().split(".")]
+    except ValueError:
+        return None
+    if len(parts) != 3:
+        return None
+    return tuple(parts)
+
+
+def format_game_date(date):
+    """将(年, 月, 日)格式化为 1650.3.1 形式"""
+    return ".".join(str(part) for part in date)
+
+
+def date_ordinal(date):
+    """
+    将游戏日期换算为从0年1月1日起的天数（用于排序和绘图）
+
+    EU4的日历每年365天、没有闰年，各月天数固定。超出当月天数的日期按当月最后一天计算，
+    不会与下个月的日期重叠。
+    """
+    year, month, day = date
+    month = min(max(month, 1), 12)
+    day = min(max(day, 1), MONTH_DAYS[month - 1])
+    return year * DAYS_PER_YEAR + _MONTH_STARTS[month - 1] + day - 1
+
+
+def ordinal_to_date(ordinal):
+    """date_ordinal的逆运算"""
+    year, rest = divmod(int(ordinal), DAYS_PER_YEAR)
+    month = bisect_right(_MONTH_STARTS, rest)
+    return (year, month, rest - _MONTH_STARTS[month - 1] + 1)
+
+
+class CampaignTimeline:
+    """
+    战役时间线类
+
+    参数:
+        backups: 索引条目列表，条目需要包含 id、time、game_date，可选 branch
+        branches: {分支编号: {"parent": 分叉处的备份ID或None, "time": 创建时间}}
+    """
+
+    def __init__(self, backups, branches=None):
+        self.branches = {0: {"parent": None, "time": None}}
+        self.branches.update(branches or {})
+
+        # 每个分支按(游戏日期, 备份时间)排序的条目
+        self._keys = {branch: [] for branch in self.branches}
+        self._entries = {branch: [] for branch in self.branches}
+        self._by_id = {}
+        # 没有游戏日期的备份无法放入时间线
+        self.undated = []
+
+        dated = []
+        for backup in backups:
+            date = parse_game_date(backup.get("game_date", ""))
+            if date is None:
+                self.undated.append(backup)
+                continue
+            branch = backup.get("branch", 0)
+            if branch not in self.branches:
+                branch = 0
+            dated.append(((date, backup["time"]), branch, backup))
+
+        dated.sort(key=lambda item: item[0])
+        for key, branch, backup in dated:
+            self._keys[branch].append(key)
+            self._entries[branch].append(backup)
+            self._by_id[backup["id"]] = (key, branch)
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def branch_of(self, backup_id):
+        """获取备份所属的分支，不在时间线中时返回None"""
+        location = self._by_id.get(backup_id)
+        return location[1] if location else None
+
+    def _lineage(self, branch):
+        """
+        获取分支及其所有祖先分支
+
+        返回:
+            [(分支, 日期上限)]，日期上限是子分支分叉处的键，当前分支没有上限
+        """
+        lineage = []
+        bound = None
+        while branch is not None:
+            lineage.append((branch, bound))
+            parent = self.branches.get(branch, {}).get("parent")
+            location = self._by_id.get(parent) if parent else None
+            if location is None:
+                break
+            bound, branch = location
+        return lineage
+
+    def nearest_before(self, date, branch=None, inclusive=True):
+        """
+        查找指定游戏日期之前最近的备份
+
+        参数:
+            date: 游戏日期字符串或(年, 月, 日)
+            branch: 分支编号；指定时会沿着分叉关系查找祖先分支，为None时查找所有分支
+            inclusive: 是否包含恰好在该日期的备份
+
+        返回:
+            索引条目，没有符合条件的备份时返回None
+        """
+        if isinstance(date, str):
+            date = parse_game_date(date)
+            if date is None:
+                return None
+
+        if branch is None:
+            candidates = [(b, None) for b in self._keys]
+        else:
+            candidates = self._lineage(branch)
+
+        best_key, best = None, None
+        for b, bound in candidates:
+            keys = self._keys.get(b, [])
+            if inclusive:
+                i = bisect_right(keys, (date, _MAX_TIME))
+            else:
+                i = bisect_left(keys, (date, ""))
+            # 祖先分支只能取到分叉处的备份为止
+            if bound is not None:
+                i = min(i, bisect_right(keys, bound))
+            i -= 1
+            if i >= 0 and (best_key is None or keys[i] > best_key):
+                best_key, best = keys[i], self._entries[b][i]
+        return best
+
+    def range(self, start, end, branch=None):
+        """
+        获取游戏日期在[start, end]之间的备份
+
+        参数:
+            start, end: (年, 月, 日)
+            branch: 只返回该分支的备份，为None时返回所有分支
+
+        返回:
+            [(分支, 索引条目)]，按游戏日期排序
+        """
+        result = []
+        branches = [branch] if branch is not None else list(self._keys)
+        for b in branches:
+            keys = self._keys.get(b, [])
+            lo = bisect_left(keys, (start, ""))
+            hi = bisect_right(keys, (end, _MAX_TIME))
+            result.extend((b, entry) for entry in self._entries[b][lo:hi])
+        result.sort(key=lambda item: self._by_id[item[1]["id"]][0])
+        return result
+
+    def date_span(self):
+        """
+        获取时间线覆盖的游戏日期范围
+
+        返回:
+            (最早日期, 最晚日期)，时间线为空时返回None
+        """
+        firsts = [keys[0][0] for keys in self._keys.values() if keys]
+        lasts = [keys[-1][0] for keys in self._keys.values() if keys]
+        if not firsts:
+            return None
+        return min(firsts), max(lasts)
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+时间线控件模块
+
+按游戏日期横向绘制一个存档的备份，每个时间线分支占一行。
+只查询并绘制当前可见日期范围内的备份，备份数量很多时也能流畅缩放和拖动。
+"""
+
+from PySide6.QtWidgets import QWidget
+from PySide6.QtCore import Qt, Signal, QPointF
+from PySide6.QtGui import QPainter, QPen
+
+from src.timeline import date_ordinal, ordinal_to_date, parse_game_date
+
+# 日期边距（天），避免最早和最晚的备份贴在控件边缘
+VIEW_MARGIN_DAYS = 365
+# 最小可见范围（天）
+MIN_VIEW_DAYS = 62
+LANE_HEIGHT = 22
+AXIS_HEIGHT = 18
+MARKER_RADIUS = 5
+
+
+class TimelineWidget(QWidget):
+    """战役时间线控件类"""
+
+    # 点击备份时发出，参数为备份ID
+    backup_clicked = Signal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+        self.timeline = None
+        self.view_start = 0.0
+        self.view_end = 1.0
+        self.selected_id = None
+
+        # 最近一次绘制的标记位置，用于点击检测: [(中心点, 备份ID)]
+        self._markers = []
+        self._drag_x = None
+
+        self.setMinimumHeight(AXIS_HEIGHT + LANE_HEIGHT * 2)
+        self.setMouseTracking(True)
+
+    def set_timeline(self, timeline):
+        """设置要显示的时间线，并缩放到显示全部备份"""
+        self.timeline = timeline
+        self.selected_id = None
+        span = timeline.date_span() if timeline else None
+        if span:
+            self.view_start = date_ordinal(span[0]) - VIEW_MARGIN_DAYS
+            self.view_end = date_ordinal(span[1]) + VIEW_MARGIN_DAYS
+        lanes = len(timeline.branches) if timeline else 1
+        self.setMinimumHeight(AXIS_HEIGHT + LANE_HEIGHT * max(2, lanes))
+        self.update()
+
+    def set_selected(self, backup_id):
+        """高亮指定的备份"""
+        self.selected_id = backup_id
+        self.update()
+
+    def _x(self, ordinal):
+        width = max(1, self.width() - 2 * MARKER_RADIUS)
+        scale = width / (self.view_end - self.view_start)
+        return MARKER_RADIUS + (ordinal - self.view_start) * scale
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        palette = self.palette()
+        text_color = palette.color(self.foregroundRole())
+        accent = palette.color(palette.ColorRole.Highlight)
+
+        self._markers = []
+        if not self.timeline or not len(self.timeline):
+            painter.setPen(text_color)
+            painter.drawText(self.rect(), Qt.AlignCenter, "没有带游戏日期的备份")
+            return
+
+        # 年份刻度
+        painter.setPen(QPen(text_color, 1))
+        first_year = ordinal_to_date(self.view_start)[0]
+        last_year = ordinal_to_date(self.view_end)[0]
+        max_ticks = max(1, self.width() // 60)
+        for step in (1, 2, 5, 10, 25, 50, 100, 250):
+            if (last_year - first_year) / step <= max_ticks:
+                break
+        for year in range(first_year - first_year % step, last_year + 1, step):
+            x = self._x(date_ordinal((year, 1, 1)))
+            if 0 <= x <= self.width():
+                painter.drawLine(QPointF(x, AXIS_HEIGHT - 4), QPointF(x, AXIS_HEIGHT))
+                painter.drawText(QPointF(x + 2, AXIS_HEIGHT - 6), str(year))
+
+        lanes = {branch: i for i, branch in enumerate(sorted(self.timeline.branches))}
+
+        def lane_y(branch):
+            return AXIS_HEIGHT + LANE_HEIGHT * lanes[branch] + LANE_HEIGHT / 2
+
+        # 只取可见范围内的备份
+        visible = self.timeline.range(
+            ordinal_to_date(self.view_start), ordinal_to_date(self.view_end)
+        )
+        positions = {}
+        for branch, backup in visible:
+            x = self._x(date_ordinal(parse_game_date(backup["game_date"])))
+            positions[backup["id"]] = QPointF(x, lane_y(branch))
+
+        # 分支的分叉线
+        painter.setPen(QPen(text_color, 1, Qt.DashLine))
+        for branch, info in self.timeline.branches.items():
+            parent = positions.get(info.get("parent"))
+            if parent is not None:
+                painter.drawLine(parent, QPointF(parent.x(), lane_y(branch)))
+
+        for backup_id, point in positions.items():
+            selected = backup_id == self.selected_id
+            painter.setPen(QPen(text_color, 2 if selected else 1))
+            painter.setBrush(accent if selected else text_color)
+            painter.drawEllipse(point, MARKER_RADIUS, MARKER_RADIUS)
+            self._markers.append((point, backup_id))
+
+    def _marker_at(self, pos):
+        for point, backup_id in self._markers:
+            if (point - QPointF(pos)).manhattanLength() <= MARKER_RADIUS * 2:
+                return backup_id
+        return None
+
+    def mousePressEvent(self, event):
+        backup_id = self._marker_at(event.position())
+        if backup_id:
+            self.set_selected(backup_id)
+            self.backup_clicked.emit(backup_id)
+        else:
+            self._drag_x = event.position().x()
+
+    def mouseMoveEvent(self, event):
+        backup_id = self._marker_at(event.position())
+        self.setToolTip(self._tooltip(backup_id) if backup_id else "")
+
+        if self._drag_x is None:
+            return
+        # 拖动平移
+        dx = event.position().x() - self._drag_x
+        days = dx * (self.view_end - self.view_start) / max(1, self.width())
+        self.view_start -= days
+        self.view_end -= days
+        self._drag_x = event.position().x()
+        self.update()
+
+    def mouseReleaseEvent(self, event):
+        self._drag_x = None
+
+    def wheelEvent(self, event):
+        # 以鼠标位置为中心缩放
+        factor = 0.8 if event.angleDelta().y() > 0 else 1.25
+        center = self.view_start + (self.view_end - self.view_start) * (
+            event.position().x() / max(1, self.width())
+        )
+        span = max(MIN_VIEW_DAYS, (self.view_end - self.view_start) * factor)
+        ratio = (center - self.view_start) / (self.view_end - self.view_start)
+        self.view_start = center - span * ratio
+        self.view_end = self.view_start + span
+        self.update()
+
+    def _tooltip(self, backup_id):
+        for branch, backup in self.timeline.range(
+            ordinal_to_date(self.view_start), ordinal_to_date(self.view_end)
+        ):
+            if backup["id"] == backup_id:
+                text = f"{backup['game_date']}  {backup.get('description', '')}"
+                return text if branch == 0 else f"[分支 {branch}] {text}"
+        return ""
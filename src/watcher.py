@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+存档目录监视模块
+"""
+
+import time
+import logging
+
+from src.config import get_save_files
+from src.io_scheduler import game_activity
+
+
+class SaveWatcher:
+    """
+    存档监视器类
+
+    通过轮询存档目录检测新建或修改过的存档文件。游戏写入存档需要一段时间，
+    只有当文件的大小和修改时间在 settle_seconds 内保持不变后才会报告变化，
+    避免备份写到一半的存档。
+    """
+
+    def __init__(self, settle_seconds=5):
+        self.settle_seconds = settle_seconds
+
+        # 已报告过的存档状态: 路径 -> (修改时间, 大小)
+        self._known = {}
+        # 正在等待写入完成的存档: 路径 -> (修改时间, 大小, 首次发现时间)
+        self._pending = {}
+        # 存档所在的目录: 路径 -> 目录
+        self._sources = {}
+        # prime时扫描失败或超时的目录，第一次扫描成功时只记录状态，不报告变化
+        self._unprimed = set()
+
+    def prime(self):
+        """记录当前所有存档的状态，之后只报告此后发生的变化"""
+        errors = {}
+        for save_file in get_save_files(errors=errors):
+            self._known[save_file["path"]] = self._signature(save_file)
+            self._sources[save_file["path"]] = save_file["source"]
+        self._unprimed = set(errors)
+
+    @staticmethod
+    def _signature(save_file):
+        return (save_file["modified"].timestamp(), save_file["size"])
+
+    def poll(self):
+        """
+        检查存档目录
+
+        扫描失败或超时的目录中的存档保持原来的状态，不视为已被删除，
+        否则目录恢复后其中没有变化的存档会被当作新存档再次备份。
+
+        返回:
+            已经写入完成且发生变化的存档列表（与get_save_files的元素格式相同）
+        """
+        now = time.monotonic()
+        changed = []
+        seen = set()
+        errors = {}
+
+        for save_file in get_save_files(errors=errors):
+            path = save_file["path"]
+            seen.add(path)
+            self._sources[path] = save_file["source"]
+            signature = self._signature(save_file)
+
+            if save_file["source"] in self._unprimed:
+                self._known[path] = signature
+                continue
+
+            if self._known.get(path) == signature:
+                self._pending.pop(path, None)
+                continue
+
+            pending = self._pending.get(path)
+            if pending is None or pending[:2] != signature:
+                # 新发现的变化，或者文件仍在写入中；后台维护任务在写入平息前暂停
+                self._pending[path] = signature + (now,)
+                game_activity.note_write()
+                continue
+
+            if now - pending[2] >= self.settle_seconds:
+                del self._pending[path]
+                self._known[path] = signature
+                changed.append(save_file)
+                logging.info(f"检测到存档变化: {save_file['name']}")
+
+        self._unprimed &= set(errors)
+
+        # 清理已被删除的存档（跳过本轮扫描失败的目录）
+        for path in set(self._known) | set(self._pending):
+            if path in seen or self._sources.get(path) in errors:
+                continue
+            self._known.pop(path, None)
+            self._pending.pop(path, None)
+            self._sources.pop(path, None)
+
+        return changed
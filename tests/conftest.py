@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+
+"""测试的公共夹具：每个测试使用独立的临时存档目录、备份目录和配置文件"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.run import bench_env  # noqa: E402
+
+
+@pytest.fixture
+def env():
+    """{"root", "save_dir", "backup_dir"}，配置指向这些临时目录"""
+    with bench_env() as paths:
+        yield paths
+
+
+@pytest.fixture
+def make_env():
+    """按给定的配置项创建临时环境: make_env(trash_quota_mb=0)"""
+    contexts = []
+
+    def factory(**overrides):
+        context = bench_env(**overrides)
+        contexts.append(context)
+        return context.__enter__()
+
+    yield factory
+    for context in reversed(contexts):
+        context.__exit__(None, None, None)
+
+
+def write_save(save_dir, name="a.eu4", date="1444.11.11", body="x" * 1000, **fields):
+    """写入一个最小的文本存档，返回路径"""
+    lines = ["EU4txt", f"date={date}"]
+    lines += [f'{key}="{value}"' for key, value in fields.items()]
+    path = os.path.join(save_dir, name)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n" + body + "\n")
+    return path
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+"""备份导出/导入的测试"""
+
+import os
+
+from src.backup_manager import BackupManager
+from conftest import write_save
+
+
+def test_import_skips_orphan_directory(make_env):
+    source = make_env()
+    manager = BackupManager()
+    first = manager.create_backup(write_save(source["save_dir"], date="1444.11.11"), "a")
+    second = manager.create_backup(
+        write_save(source["save_dir"], name="b.eu4", date="1450.1.1"), "b"
+    )
+    archive_path = os.path.join(source["root"], "backups.tar")
+    assert sorted(manager.export_backups(archive_path, [first, second])) == sorted(
+        [first, second]
+    )
+
+    target = make_env()
+    manager = BackupManager()
+    # 备份目录中有与第一个备份同名、但不在索引中的目录
+    orphan = os.path.join(target["backup_dir"], first)
+    os.makedirs(orphan)
+    with open(os.path.join(orphan, "leftover"), "w", encoding="utf-8") as f:
+        f.write("x")
+
+    result = manager.import_backups(archive_path)
+    assert result["imported"] == [second]
+    assert list(result["failed"]) == [first]
+    assert os.listdir(orphan) == ["leftover"]
+    assert [b["id"] for b in manager.backup_index["b"]] == [second]
+    assert not [
+        name for name in os.listdir(target["backup_dir"]) if name.endswith(".importing")
+    ]
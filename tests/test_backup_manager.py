@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+"""备份管理器的测试"""
+
+import os
+import json
+
+from src.backup_manager import BackupManager
+from conftest import write_save
+
+
+def test_backfill_fills_old_entries(env):
+    manager = BackupManager()
+    backup_id = manager.create_backup(write_save(env["save_dir"]), "t")
+    with open(manager.backup_index_file, "r", encoding="utf-8") as f:
+        index = json.load(f)
+    for entry in index["a"]:
+        for key in ("campaign", "sha256", "player"):
+            entry.pop(key, None)
+    with open(manager.backup_index_file, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+
+    entry = BackupManager().backup_index["a"][0]
+    assert entry["id"] == backup_id
+    assert entry["campaign"] and len(entry["sha256"]) == 64
+
+
+def _disk_usage(directory):
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(directory)
+        for name in names
+    )
+
+
+def test_quota_counts_trash_on_disk(make_env):
+    paths = make_env(storage_quota_mb=1, trash_quota_mb=2048)
+    manager = BackupManager()
+    for i in range(6):
+        path = write_save(paths["save_dir"], body=os.urandom(150 * 1024).hex())
+        assert manager.create_backup(path, f"t{i}")
+        if manager._reaper is not None:
+            manager._reaper.result(timeout=30)
+
+    usage = manager.get_usage()
+    assert usage["total"] + usage["trash"] <= 1024 * 1024
+    # 索引、元数据等记录文件之外，磁盘上的备份不超过容量上限
+    assert _disk_usage(paths["backup_dir"]) <= 1024 * 1024 + 64 * 1024
+
+
+def test_batch_create_update_and_delete(env):
+    manager = BackupManager()
+    paths = [write_save(env["save_dir"], f"s{i}.eu4", date=f"14{50 + i}.1.1") for i in range(4)]
+    missing = os.path.join(env["save_dir"], "missing.eu4")
+
+    result = manager.create_backups([*paths, missing], "批量", ["batch"])
+    assert sorted(result["succeeded"]) == sorted(paths)
+    assert list(result["failed"]) == [missing]
+    ids = [result["succeeded"][path] for path in paths]
+
+    # 整批只保存一次备份索引
+    saves = []
+    save_index = manager._save_backup_index
+    manager._save_backup_index = lambda: saves.append(1) or save_index()
+    updates = {backup_id: {"description": f"d{i}"} for i, backup_id in enumerate(ids)}
+    updates["no_such_backup"] = {"description": "x"}
+    result = manager.update_metadata_many(updates)
+    assert sorted(result["succeeded"]) == sorted(ids)
+    assert list(result["failed"]) == ["no_such_backup"]
+    assert len(saves) == 1
+    del manager._save_backup_index
+
+    manager = BackupManager()
+    for i, backup_id in enumerate(ids):
+        meta_path = os.path.join(manager.backup_dir, backup_id, "meta.json")
+        with open(meta_path, "r", encoding="utf-8") as f:
+            assert json.load(f)["description"] == f"d{i}"
+        assert manager.backup_index[f"s{i}"][0]["description"] == f"d{i}"
+
+    result = manager.delete_backups(ids[:2] + ["no_such_backup"])
+    assert result["succeeded"] == ids[:2]
+    assert list(result["failed"]) == ["no_such_backup"]
+    assert {b["id"] for b in manager.get_all_backups()} == set(ids[2:])
+
+
+def test_safety_snapshots_are_pruned_on_restore(make_env):
+    paths = make_env(max_backups_per_save=2)
+    manager = BackupManager()
+    path = write_save(paths["save_dir"], body="first")
+    restored = manager.create_backup(path, "t0")
+
+    for i in range(4):
+        # 每次恢复前的存档内容都不同，都会保存为新的备份
+        write_save(paths["save_dir"], body=f"progress {i}")
+        assert manager.restore_backup(restored)
+        ids = [b["id"] for b in manager.get_all_backups()]
+        assert len(ids) <= 2
+        assert restored in ids and manager.last_restore[1] in ids
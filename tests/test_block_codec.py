@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+"""分块压缩格式的测试"""
+
+import os
+import hashlib
+
+import pytest
+
+from src import block_codec
+from src.block_codec import (
+    BlockFile,
+    compress_file,
+    decompress_file,
+    is_block_file,
+    open_block_file,
+)
+
+BLOCK = 1024
+
+
+def _write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+def _compressed(tmp_path, data, codec="zlib", workers=1):
+    src = _write(tmp_path / "save.eu4", data)
+    dest = str(tmp_path / "save.eu4.blk")
+    assert compress_file(src, dest, codec, workers, block_size=BLOCK) == len(data)
+    return dest
+
+
+@pytest.mark.parametrize("codec", ["zlib", "lzma"])
+@pytest.mark.parametrize("workers", [1, 4])
+@pytest.mark.parametrize("size", [0, 1, BLOCK - 1, BLOCK, BLOCK + 1, BLOCK * 9 + 17])
+def test_round_trip(tmp_path, codec, workers, size):
+    # 前半部分可以压缩，后半部分是随机内容
+    data = (b"date=1444.11.11\n" * size)[: size // 2] + os.urandom(size - size // 2)
+    dest = _compressed(tmp_path, data, codec, workers)
+    assert is_block_file(dest)
+
+    with BlockFile(dest) as blocks:
+        assert blocks.size == size
+        assert len(blocks.blocks) == -(-size // BLOCK)
+
+    out = str(tmp_path / "restored.eu4")
+    assert decompress_file(dest, out, workers) == hashlib.sha256(data).hexdigest()
+    with open(out, "rb") as f:
+        assert f.read() == data
+
+
+def test_random_access_reads_only_covering_blocks(tmp_path, monkeypatch):
+    data = os.urandom(BLOCK * 8 + 100)
+    dest = _compressed(tmp_path, data)
+
+    decoded = []
+    decode = BlockFile._decode
+
+    def recording_decode(self, item):
+        decoded.append(item[0])
+        return decode(self, item)
+
+    monkeypatch.setattr(BlockFile, "_decode", recording_decode)
+    with open_block_file(dest) as stream:
+        # 跨越第3块和第4块的边界
+        stream.seek(BLOCK * 4 - 10)
+        assert stream.read(20) == data[BLOCK * 4 - 10 : BLOCK * 4 + 10]
+        assert sorted(set(decoded)) == [3, 4]
+
+        stream.seek(-50, os.SEEK_END)
+        assert stream.read() == data[-50:]
+        assert stream.read(1) == b""
+        assert 8 in decoded and 0 not in decoded
+
+
+def test_truncated_footer_is_detected(tmp_path):
+    dest = _compressed(tmp_path, os.urandom(BLOCK * 3))
+    with open(dest, "rb") as f:
+        data = f.read()
+    _write(dest, data[:-5])
+
+    with pytest.raises(ValueError):
+        BlockFile(dest)
+    with pytest.raises(ValueError):
+        decompress_file(dest, str(tmp_path / "out"))
+
+
+def test_file_without_index_is_detected(tmp_path):
+    # 只有文件头、没有块索引和文件尾（例如压缩时中断）
+    header = block_codec._HEADER.pack(block_codec.MAGIC, 1, BLOCK)
+    dest = _write(tmp_path / "save.eu4.blk", header)
+    with pytest.raises(ValueError):
+        BlockFile(dest)
+
+
+def test_corrupted_footer_is_detected(tmp_path):
+    data = os.urandom(BLOCK * 3)
+    dest = _compressed(tmp_path, data)
+    with open(dest, "rb") as f:
+        original = f.read()
+    footer = block_codec._FOOTER
+    index_offset, count, size, end_magic = footer.unpack(original[-footer.size :])
+
+    # 原始总大小与块索引不符
+    _write(dest, original[: -footer.size] + footer.pack(index_offset, count, size + 1, end_magic))
+    with pytest.raises(ValueError):
+        BlockFile(dest)
+
+    # 块索引的位置或块数超出文件
+    _write(dest, original[: -footer.size] + footer.pack(index_offset, count + 5, size, end_magic))
+    with pytest.raises(ValueError):
+        BlockFile(dest)
+
+    # 文件尾的标记损坏
+    _write(dest, original[:-1] + b"?")
+    with pytest.raises(ValueError):
+        BlockFile(dest)
+
+
+def test_corrupted_block_is_detected(tmp_path):
+    dest = _compressed(tmp_path, os.urandom(BLOCK * 3))
+    with BlockFile(dest) as blocks:
+        offset, stored, _, _ = blocks.blocks[1]
+    with open(dest, "r+b") as f:
+        f.seek(offset + stored // 2)
+        byte = f.read(1)
+        f.seek(offset + stored // 2)
+        f.write(bytes([byte[0] ^ 0xFF]))
+
+    with pytest.raises(ValueError):
+        decompress_file(dest, str(tmp_path / "out"))
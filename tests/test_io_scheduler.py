@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+"""后台I/O调度的测试"""
+
+import time
+import threading
+
+from src import io_scheduler
+from src.io_scheduler import IO_IDLE, IOScheduler
+from conftest import write_save
+
+
+def _game_writing(monkeypatch):
+    monkeypatch.setattr(io_scheduler.game_activity, "busy", lambda: True)
+
+
+def test_delete_does_not_schedule_reap_under_quota(env, monkeypatch):
+    from src.backup_manager import BackupManager
+
+    manager = BackupManager()
+    backup_id = manager.create_backup(write_save(env["save_dir"]), "t")
+    _game_writing(monkeypatch)
+
+    start = time.monotonic()
+    manager.delete_backups([backup_id])
+    io_scheduler.io_scheduler.shutdown()
+    assert manager._reaper is None
+    assert time.monotonic() - start < 5
+
+
+def test_shutdown_does_not_wait_for_paused_idle_task(env, monkeypatch):
+    _game_writing(monkeypatch)
+    scheduler = IOScheduler()
+    # 代表一个因游戏写入存档而暂停的任务
+    release = threading.Event()
+    future = scheduler.submit(release.wait, 10, priority=IO_IDLE)
+    queued = scheduler.submit(lambda: None, priority=IO_IDLE)
+    deadline = time.monotonic() + 5
+    while not future.running() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    start = time.monotonic()
+    scheduler.shutdown()
+    assert time.monotonic() - start < 5
+    assert queued.cancelled()
+    assert not future.done()
+    assert scheduler._workers[IO_IDLE].daemon
+    release.set()
+    assert future.result(timeout=5)
+
+
+def test_tasks_do_not_wait_before_starting(env, monkeypatch):
+    _game_writing(monkeypatch)
+    scheduler = IOScheduler()
+    future = scheduler.submit(lambda: 42, priority=IO_IDLE)
+    assert future.result(timeout=5) == 42
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+"""运行指标的测试"""
+
+import os
+
+from src.backup_manager import BackupManager
+from src.metrics import metrics
+from conftest import write_save
+
+
+def _errors(op):
+    for series in metrics.to_dict()["counters"].get("operation_errors_total", []):
+        if series["labels"].get("op") == op:
+            return series["value"]
+    return 0
+
+
+def test_failed_backup_counts_as_error(env):
+    manager = BackupManager()
+    before = _errors("create")
+    assert manager.create_backup(os.path.join(env["save_dir"], "missing.eu4")) is None
+    assert _errors("create") == before + 1
+    assert 'operation_errors_total{op="create"}' in metrics.to_prometheus()
+
+
+def test_failed_items_in_batch_count_as_error(env):
+    manager = BackupManager()
+    before = _errors("delete")
+    result = manager.delete_backups(["no_such_backup"])
+    assert result["failed"]
+    assert _errors("delete") == before + 1
+
+
+def test_failed_metadata_updates_count_as_error(env):
+    manager = BackupManager()
+    backup_id = manager.create_backup(write_save(env["save_dir"]), "t")
+    before = _errors("update_many")
+    result = manager.update_metadata_many(
+        {backup_id: {"description": "新描述"}, "no_such_backup": {"description": "x"}}
+    )
+    assert result["succeeded"] == [backup_id]
+    assert _errors("update_many") == before + 1
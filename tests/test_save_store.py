@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+"""zip存档规范化存储的测试"""
+
+import os
+import random
+import zipfile
+
+import pytest
+
+from src import save_store
+from src.save_store import compress_entries, normalize_zip, restore_zip, verify_entries
+
+
+def _text(size, seed):
+    """类似存档内容的文本：可以压缩，但各压缩级别的结果不同"""
+    rng = random.Random(seed)
+    data = bytearray()
+    while len(data) < size:
+        data += f"province={rng.randint(1, 4000)} owner=T{rng.randint(0, 99):02d}\n".encode()
+    return bytes(data)
+
+
+def _write_zip(path, entries, comment=b""):
+    """entries: [(条目名, 内容, 压缩方式, 压缩级别)]"""
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.comment = comment
+        for name, data, compress_type, level in entries:
+            info = zipfile.ZipInfo(name, (2026, 1, 2, 3, 4, 6))
+            info.compress_type = compress_type
+            archive.writestr(info, data, compresslevel=level)
+    return str(path)
+
+
+def _round_trip(tmp_path, save_path, compression=None):
+    store_dir = tmp_path / "store"
+    store_dir.mkdir()
+    layout = normalize_zip(save_path, str(store_dir))
+    if compression:
+        compress_entries(layout, str(store_dir), compression, workers=2)
+    assert verify_entries(layout, str(store_dir)) is None
+    restored = str(tmp_path / "restored.eu4")
+    restore_zip(layout, str(store_dir), restored, workers=2)
+    return layout, restored
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("level", [1, 9])
+def test_deflate_levels_restore_byte_identical(tmp_path, level):
+    save_path = _write_zip(
+        tmp_path / "save.eu4",
+        [
+            ("meta", _text(2000, 1), zipfile.ZIP_DEFLATED, level),
+            ("gamestate", _text(120 * 1024, 2), zipfile.ZIP_DEFLATED, level),
+            ("ai", _text(50 * 1024, 3), zipfile.ZIP_DEFLATED, level),
+        ],
+    )
+    layout, restored = _round_trip(tmp_path, save_path)
+    assert [entry["compress_level"] for entry in layout["entries"]] == [level] * 3
+    assert _read(restored) == _read(save_path)
+
+
+@pytest.mark.parametrize("compression", [None, "zlib"])
+def test_stored_and_lzma_entries_restore_byte_identical(tmp_path, compression):
+    save_path = _write_zip(
+        tmp_path / "save.eu4",
+        [
+            ("meta", _text(2000, 1), zipfile.ZIP_STORED, None),
+            ("gamestate", _text(120 * 1024, 2), zipfile.ZIP_LZMA, None),
+            ("ai", b"", zipfile.ZIP_DEFLATED, None),
+        ],
+        comment=b"EU4",
+    )
+    layout, restored = _round_trip(tmp_path, save_path, compression)
+    assert [entry["compress_level"] for entry in layout["entries"]] == [None] * 3
+    assert _read(restored) == _read(save_path)
+
+
+def test_unknown_deflate_level_falls_back_to_default(tmp_path, monkeypatch):
+    data = _text(120 * 1024, 2)
+    save_path = _write_zip(tmp_path / "save.eu4", [("gamestate", data, zipfile.ZIP_DEFLATED, 1)])
+    # 原存档使用的级别不在试探范围内（例如由其他deflate实现压缩）
+    monkeypatch.setattr(save_store, "LEVEL_CANDIDATES", (9,))
+
+    layout, restored = _round_trip(tmp_path, save_path)
+    assert layout["entries"][0]["compress_level"] is None
+    # 压缩后的字节不同，但条目内容和元数据与原存档相同
+    assert _read(restored) != _read(save_path)
+    with zipfile.ZipFile(save_path) as original, zipfile.ZipFile(restored) as archive:
+        assert archive.read("gamestate") == data
+        old, new = original.getinfo("gamestate"), archive.getinfo("gamestate")
+        assert (new.date_time, new.compress_type) == (old.date_time, old.compress_type)
+
+
+def test_damaged_entry_is_detected(tmp_path):
+    save_path = _write_zip(
+        tmp_path / "save.eu4", [("gamestate", _text(10 * 1024, 2), zipfile.ZIP_DEFLATED, 6)]
+    )
+    store_dir = tmp_path / "store"
+    store_dir.mkdir()
+    layout = normalize_zip(save_path, str(store_dir))
+    entry_path = os.path.join(str(store_dir), layout["entries"][0]["file"])
+    with open(entry_path, "r+b") as f:
+        f.write(b"X")
+
+    assert verify_entries(layout, str(store_dir))
+    with pytest.raises(ValueError):
+        restore_zip(layout, str(store_dir), str(tmp_path / "restored.eu4"))
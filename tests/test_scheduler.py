@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+
+"""自动备份调度器的测试"""
+
+import os
+import time
+
+from src.backup_manager import BackupManager
+from src.scheduler import BackupScheduler
+from conftest import write_save
+
+
+def _save_file(path):
+    return {"name": os.path.basename(path), "path": path, "modified": os.path.getmtime(path)}
+
+
+def test_interval_uses_wall_clock(make_env):
+    paths = make_env(auto_backup_interval=60, auto_backup_game_months=0, backup_coalesce_seconds=0)
+    manager = BackupManager()
+    path = write_save(paths["save_dir"])
+    assert manager.create_backup(path, "t")
+
+    wall = [time.time() + 10 * 60]
+    scheduler = BackupScheduler(manager, clock=lambda: 0.0, wall_clock=lambda: wall[0])
+    scheduler.notify(_save_file(path))
+    # 距离上次备份10分钟，还没到60分钟的间隔
+    assert scheduler.due_jobs() == []
+    assert scheduler.pending_count() == 1
+    job = next(iter(scheduler._jobs.values()))
+    assert 49 * 60 < job["due"] <= 50 * 60
+
+    scheduler = BackupScheduler(manager, clock=lambda: 0.0, wall_clock=lambda: wall[0])
+    wall[0] = time.time() + 61 * 60
+    scheduler.notify(_save_file(path))
+    jobs = scheduler.due_jobs()
+    assert [job["tags"] for job in jobs] == [["auto"]]
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+"""备份目录跨进程锁的测试"""
+
+import json
+import time
+
+import pytest
+
+from src.store_lock import StoreLock, StoreLockTimeout
+
+
+def _write_lease(path, **data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+def _lock_files(tmp_path):
+    return sorted((tmp_path / ".locks").iterdir())
+
+
+def test_break_does_not_remove_lease_recreated_after_check(tmp_path):
+    lock = StoreLock(str(tmp_path))
+    (tmp_path / ".locks").mkdir()
+    path = lock._write_path
+    stale = {"owner": "old", "host": "elsewhere", "pid": 1, "expires": 0}
+    live = {"owner": "new", "host": "elsewhere", "pid": 1, "expires": time.time() + 60}
+    _write_lease(path, **live)
+
+    # 读到的还是旧租约，之后租约被其他进程清除并重新创建
+    read_lease = lock._read_lease
+    calls = []
+
+    def first_read_stale(p):
+        calls.append(p)
+        return dict(stale) if len(calls) == 1 else read_lease(p)
+
+    lock._read_lease = first_read_stale
+    assert lock._break_if_stale(path) is False
+    assert read_lease(path)["owner"] == "new"
+    assert [p.name for p in _lock_files(tmp_path)] == ["write.lease"]
+
+
+def test_break_removes_stale_lease(tmp_path):
+    lock = StoreLock(str(tmp_path))
+    (tmp_path / ".locks").mkdir()
+    _write_lease(lock._write_path, owner="old", host="elsewhere", pid=1, expires=0)
+    assert lock._break_if_stale(lock._write_path) is True
+    assert _lock_files(tmp_path) == []
+
+
+def test_write_lease_is_renewed_while_held(tmp_path):
+    holder = StoreLock(str(tmp_path), lease_seconds=0.3)
+    # 另一台电脑上的写者只能依靠租约到期判断
+    other = StoreLock(str(tmp_path), lease_seconds=0.3, timeout=1)
+    other._host = "elsewhere"
+
+    with holder.write():
+        with pytest.raises(StoreLockTimeout):
+            with other.write():
+                pass
+
+    with other.write():
+        pass
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+"""备份同步的测试，使用内存中的对象存储替身作为目标"""
+
+import os
+import uuid
+
+import pytest
+
+from src import sync
+from src.backup_manager import BackupManager
+from src.sync import MANIFEST_NAME, MemoryBackend
+from conftest import write_save
+
+
+@pytest.fixture
+def manager(env):
+    manager = BackupManager()
+    for i in range(3):
+        path = write_save(env["save_dir"], f"s{i}.eu4", body=os.urandom(4096).hex())
+        assert manager.create_backup(path, f"t{i}")
+    return manager
+
+
+@pytest.fixture
+def target():
+    name = uuid.uuid4().hex
+    yield f"memory://{name}"
+    MemoryBackend.stores.pop(name, None)
+
+
+def _local_files(manager):
+    files = {}
+    for root, _, names in os.walk(manager.backup_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            rel_path = os.path.relpath(path, manager.backup_dir).replace(os.sep, "/")
+            if rel_path.split("/")[0] in {b["id"] for b in manager.get_all_backups()}:
+                with open(path, "rb") as f:
+                    files[rel_path] = f.read()
+    return files
+
+
+def _backend(target):
+    return MemoryBackend(target[len("memory://") :])
+
+
+def test_first_sync_uploads_everything(manager, target):
+    result = manager.sync_to_mirror(target)
+    assert result["failed"] == {}
+
+    backend = _backend(target)
+    local = _local_files(manager)
+    assert set(local) | {"backup_index.json"} == set(result["uploaded"])
+    for rel_path, data in local.items():
+        assert backend.objects[rel_path] == data
+    assert set(backend.read_manifest()) == set(result["uploaded"])
+
+
+def test_second_sync_uploads_nothing_and_reads_no_backup_files(manager, target, monkeypatch):
+    manager.sync_to_mirror(target)
+
+    hashed = []
+    monkeypatch.setattr(sync, "hash_file", lambda path: hashed.append(path))
+    result = manager.sync_to_mirror(target)
+    assert result == {"uploaded": [], "deleted": [], "failed": {}}
+    assert hashed == []
+
+
+def test_conflicting_target_files_are_replaced(manager, target):
+    manager.sync_to_mirror(target)
+    backend = _backend(target)
+    rel_path = next(p for p in backend.objects if p.endswith(".eu4"))
+    original = backend.objects[rel_path]
+
+    # 目标上的文件被改动，清单记录了不同的内容；目标上还有本地没有的文件
+    backend.objects[rel_path] = b"changed"
+    manifest = backend.read_manifest()
+    manifest[rel_path] = {"size": 7, "sha256": "0" * 64}
+    manifest["gone/meta.json"] = {"size": 1, "sha256": "1" * 64}
+    backend.objects["gone/meta.json"] = b"x"
+    backend.write_manifest(manifest)
+
+    result = manager.sync_to_mirror(target, delete=False)
+    assert result["uploaded"] == [rel_path]
+    assert backend.objects[rel_path] == original
+    assert "gone/meta.json" in backend.objects
+
+    result = manager.sync_to_mirror(target)
+    assert result["deleted"] == ["gone/meta.json"]
+    assert "gone/meta.json" not in backend.objects
+
+
+def test_interrupted_upload_resumes(manager, target, monkeypatch):
+    backend = _backend(target)
+    rel_path, data = next(
+        (p, d) for p, d in _local_files(manager).items() if p.endswith(".eu4")
+    )
+    backend.partials[rel_path] = bytearray(data[:1000])
+
+    offsets = []
+    upload = MemoryBackend.upload
+
+    def recording_upload(self, local_path, path, offset=0, sha256=None):
+        if path == rel_path:
+            offsets.append(offset)
+        return upload(self, local_path, path, offset, sha256)
+
+    monkeypatch.setattr(MemoryBackend, "upload", recording_upload)
+    result = manager.sync_to_mirror(target)
+    assert result["failed"] == {}
+    assert offsets == [1000]
+    assert backend.objects[rel_path] == data
+
+
+def test_stale_partial_upload_is_restarted(manager, target):
+    backend = _backend(target)
+    rel_path, data = next(
+        (p, d) for p, d in _local_files(manager).items() if p.endswith(".eu4")
+    )
+    # 已上传的部分来自文件的另一个版本，大小不超过现在的文件
+    backend.partials[rel_path] = bytearray(b"?" * 1000)
+
+    result = manager.sync_to_mirror(target)
+    assert result["failed"] == {}
+    assert backend.objects[rel_path] == data
+    assert rel_path not in backend.partials
+    assert MANIFEST_NAME in backend.objects
+
+
+def _record_uploads(monkeypatch, fail=None):
+    order = []
+    upload = MemoryBackend.upload
+
+    def recording_upload(self, local_path, rel_path, offset=0, sha256=None):
+        if rel_path == fail:
+            raise OSError("上传失败")
+        order.append(rel_path)
+        return upload(self, local_path, rel_path, offset, sha256)
+
+    monkeypatch.setattr(MemoryBackend, "upload", recording_upload)
+    return order
+
+
+def test_timeline_is_uploaded_last_with_the_index(manager, target, monkeypatch):
+    backup_id = manager.get_all_backups()[0]["id"]
+    assert manager.restore_backup(backup_id)
+
+    order = _record_uploads(monkeypatch)
+    result = manager.sync_to_mirror(target)
+    assert result["failed"] == {}
+    assert order[-2:] == ["timeline.json", "backup_index.json"]
+    with open(manager.timeline_file, "rb") as f:
+        assert _backend(target).objects["timeline.json"] == f.read()
+
+
+def test_records_are_not_uploaded_when_a_backup_fails(manager, target, monkeypatch):
+    assert manager.restore_backup(manager.get_all_backups()[0]["id"])
+    rel_path = next(p for p in _local_files(manager) if p.endswith(".eu4"))
+
+    order = _record_uploads(monkeypatch, fail=rel_path)
+    result = manager.sync_to_mirror(target)
+    assert list(result["failed"]) == [rel_path]
+    assert "timeline.json" not in order and "backup_index.json" not in order
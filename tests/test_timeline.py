@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+"""战役时间线的测试"""
+
+import json
+
+from src.backup_manager import BackupManager
+from src.timeline import CampaignTimeline, date_ordinal, ordinal_to_date
+from conftest import write_save
+
+
+def test_ordinals_increase_across_year_boundary():
+    dates = [(1444, 12, 6), (1444, 12, 31), (1445, 1, 1), (1445, 1, 26)]
+    ordinals = [date_ordinal(date) for date in dates]
+    assert ordinals == sorted(ordinals)
+    assert len(set(ordinals)) == len(ordinals)
+    assert date_ordinal((1445, 1, 1)) - date_ordinal((1444, 12, 31)) == 1
+
+
+def test_ordinal_round_trip():
+    for date in [(1444, 11, 11), (1444, 12, 31), (1445, 1, 1), (1600, 2, 28), (1821, 3, 1)]:
+        assert ordinal_to_date(date_ordinal(date)) == date
+
+
+def test_visible_range_across_year_boundary():
+    backups = [
+        {"id": "dec", "time": "2026-01-01T00:00:00", "game_date": "1444.12.31"},
+        {"id": "jan", "time": "2026-01-01T00:01:00", "game_date": "1445.1.10"},
+    ]
+    timeline = CampaignTimeline(backups)
+    # 时间线控件按天数计算可见范围，再换算回日期查询
+    start = ordinal_to_date(date_ordinal((1444, 12, 20)))
+    end = ordinal_to_date(date_ordinal((1445, 1, 5)))
+    assert [backup["id"] for _, backup in timeline.range(start, end)] == ["dec"]
+
+
+def test_timeline_follows_renamed_saves(env):
+    manager = BackupManager()
+    first = manager.create_backup(
+        write_save(env["save_dir"], date="1444.11.11", campaign_id="C1"), "a"
+    )
+    assert manager.restore_backup(first)
+    renamed = manager.create_backup(
+        write_save(env["save_dir"], name="renamed.eu4", date="1450.1.1", campaign_id="C1"),
+        "b",
+    )
+
+    campaign = manager.get_campaign_of_save("a")
+    assert campaign == manager.get_campaign_of_save("renamed") == "C1"
+    timeline = manager.get_timeline(campaign)
+    # 重命名后的备份在恢复产生的分支上
+    assert timeline.branch_of(first) == 0
+    assert timeline.branch_of(renamed) == 1
+    assert timeline.branches[1]["parent"] == first
+
+
+def test_legacy_timeline_records_are_migrated(env):
+    manager = BackupManager()
+    first = manager.create_backup(
+        write_save(env["save_dir"], date="1444.11.11", campaign_id="C1"), "a"
+    )
+    with open(manager.timeline_file, "w", encoding="utf-8") as f:
+        json.dump(
+            {"a": {"current": 1, "branches": {"1": {"parent": first, "time": "2026-01-01"}}}},
+            f,
+        )
+
+    manager = BackupManager()
+    assert manager.timeline_branches["C1"]["current"] == 1
+    assert manager.get_timeline("C1").branches[1]["parent"] == first
+    with open(manager.timeline_file, "r", encoding="utf-8") as f:
+        assert list(json.load(f)) == ["campaigns"]
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+"""撤销/重做记录的测试"""
+
+import os
+
+from src.backup_manager import BackupManager
+from conftest import write_save
+
+
+def _ids(manager):
+    return {b["id"] for b in manager.get_all_backups()}
+
+
+def _read(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _dir_size(directory):
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(directory)
+        for name in names
+    )
+
+
+def test_delete_undo_redo(env):
+    manager = BackupManager()
+    ids = [
+        manager.create_backup(write_save(env["save_dir"], f"s{i}.eu4"), f"t{i}")
+        for i in range(3)
+    ]
+
+    result = manager.delete_backups(ids[:2])
+    assert result["succeeded"] == ids[:2]
+    assert _ids(manager) == {ids[2]}
+    assert set(manager.trash) == set(ids[:2])
+    assert manager.undo_description()
+
+    assert manager.undo()
+    assert _ids(manager) == set(ids)
+    assert not manager.trash
+    for backup_id in ids[:2]:
+        assert os.path.exists(os.path.join(manager.backup_dir, backup_id, "meta.json"))
+    assert manager.undo_description() is None and manager.redo_description()
+
+    assert manager.redo()
+    assert _ids(manager) == {ids[2]}
+    assert set(manager.trash) == set(ids[:2])
+    assert manager.redo_description() is None and manager.undo_description()
+
+    # 新的操作清空重做记录
+    assert manager.undo()
+    assert manager.delete_backup(ids[2])
+    assert manager.redo_description() is None and not manager.redo()
+
+
+def test_undo_restore(env):
+    manager = BackupManager()
+    path = write_save(env["save_dir"], date="1444.11.11", body="before")
+    backup_id = manager.create_backup(path, "t")
+    write_save(env["save_dir"], date="1450.1.1", body="after")
+    played = _read(path)
+
+    assert manager.restore_backup(backup_id)
+    assert "before" in _read(path)
+    safety_id = manager.last_restore[1]
+    assert safety_id in _ids(manager)
+
+    assert manager.undo()
+    assert _read(path) == played
+    assert manager.redo()
+    assert "before" in _read(path)
+
+
+def test_reaper_keeps_trash_within_quota(make_env):
+    paths = make_env(trash_quota_mb=1, storage_quota_mb=0)
+    manager = BackupManager()
+    ids = []
+    for i in range(6):
+        path = write_save(paths["save_dir"], f"s{i}.eu4", body=os.urandom(200 * 1024).hex())
+        ids.append(manager.create_backup(path, f"t{i}"))
+
+    for backup_id in ids:
+        assert manager.delete_backup(backup_id)
+    assert manager._reaper is not None
+    manager._reaper.result(timeout=30)
+
+    assert manager.get_usage()["trash"] <= 1024 * 1024
+    assert _dir_size(manager.trash_dir) <= 1024 * 1024 + 64 * 1024
+    # 最早删除的备份先被真正删除，只有仍在回收站中的备份可以撤销删除
+    kept = set(manager.trash)
+    assert ids[-1] in kept and ids[0] not in kept
+    assert manager.undo()
+    assert _ids(manager) == {ids[-1]}
+    while manager.undo_description():
+        manager.undo()
+    assert _ids(manager) == kept
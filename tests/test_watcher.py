@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+"""存档目录扫描和监视器的测试"""
+
+import time
+import threading
+
+from src import config
+from src.watcher import SaveWatcher
+from conftest import write_save
+
+
+def _block_scans(monkeypatch):
+    """让扫描线程在release被设置前阻塞，返回 (started, release)"""
+    started, release = threading.Event(), threading.Event()
+    scan = config._scan_save_dir
+
+    def blocking_scan(save_dir):
+        started.set()
+        release.wait(10)
+        return scan(save_dir)
+
+    monkeypatch.setattr(config, "_scan_save_dir", blocking_scan)
+    return started, release
+
+
+def test_overlapping_scan_shares_result(env, monkeypatch):
+    write_save(env["save_dir"])
+    started, release = _block_scans(monkeypatch)
+
+    first = {}
+    scanner = threading.Thread(target=lambda: first.update(files=config.get_save_files()))
+    scanner.start()
+    assert started.wait(5)
+
+    second = {}
+    errors = {}
+    overlapping = threading.Thread(
+        target=lambda: second.update(files=config.get_save_files(errors=errors))
+    )
+    overlapping.start()
+    time.sleep(0.2)
+    release.set()
+    scanner.join(5)
+    overlapping.join(5)
+
+    assert [f["name"] for f in first["files"]] == ["a.eu4"]
+    assert [f["name"] for f in second["files"]] == ["a.eu4"]
+    assert errors == {}
+
+
+def test_overlapping_scan_does_not_rebackup_unchanged_saves(env, monkeypatch):
+    write_save(env["save_dir"])
+    watcher = SaveWatcher(settle_seconds=0)
+    watcher.prime()
+
+    started, release = _block_scans(monkeypatch)
+    scanner = threading.Thread(target=config.get_save_files)
+    scanner.start()
+    assert started.wait(5)
+
+    result = {}
+    poller = threading.Thread(target=lambda: result.update(changed=watcher.poll()))
+    poller.start()
+    time.sleep(0.2)
+    release.set()
+    scanner.join(5)
+    poller.join(5)
+
+    assert result["changed"] == []
+    assert watcher.poll() == []
+    assert watcher.poll() == []
+
+
+def test_scan_timeout_keeps_known_saves(make_env, monkeypatch):
+    paths = make_env(save_scan_timeout=1)
+    write_save(paths["save_dir"])
+    watcher = SaveWatcher(settle_seconds=0)
+    watcher.prime()
+
+    started, release = _block_scans(monkeypatch)
+    assert watcher.poll() == []
+    release.set()
+    # 等待被放弃的扫描线程结束
+    deadline = time.monotonic() + 5
+    while config._scans_in_flight and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    monkeypatch.undo()
+    assert watcher.poll() == []
+    assert watcher.poll() == []